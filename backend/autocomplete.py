@@ -0,0 +1,188 @@
+"""
+Address autocomplete over active spots.
+
+AddressIndex tokenizes street, city and postal_code of every active spot and
+keeps:
+
+- a sorted list of distinct tokens with postings (token -> spot ids); every
+  query word is a prefix range found with two bisects
+- a trigram index over the same tokens, used for words that match no token
+  prefix, so "chestnut" still finds "Chestnut" and "stnut" finds it too,
+  matching the old `ilike '%...%'` behaviour without scanning rows
+
+A spot matches when every query word matches one of its tokens. Results are
+ranked by how each word matched (exact token, prefix, substring), which field
+it matched (street first), then by address length, and cut to the limit.
+
+The index is a SpotCatalog observer, so it is rebuilt with the catalog and
+updated with every spot insert, update and delete.
+"""
+import bisect
+import heapq
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+FIELDS = ("street", "city", "postal_code")
+# Lower is better
+FIELD_RANK = {"street": 0, "city": 1, "postal_code": 2}
+EXACT, PREFIX, SUBSTRING = 0, 1, 2
+
+_WORD = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _WORD.findall((text or "").casefold())
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AddressIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs: Dict[str, dict] = {}
+        # token -> {spot_id: best field rank for that token}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._tokens: List[str] = []
+        self._trigrams: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @staticmethod
+    def _fields(spot: dict) -> Dict[str, int]:
+        tokens: Dict[str, int] = {}
+        for field in FIELDS:
+            words = tokenize(spot.get(field))
+            if field == "postal_code" and len(words) > 1:
+                # "V6B 1A1" is often typed without the space
+                words.append("".join(words))
+            for word in words:
+                tokens[word] = min(tokens.get(word, FIELD_RANK[field]), FIELD_RANK[field])
+        return tokens
+
+    def _add_token(self, token: str) -> Dict[str, int]:
+        postings = self._postings.get(token)
+        if postings is None:
+            postings = self._postings[token] = {}
+            bisect.insort(self._tokens, token)
+            for gram in trigrams(token):
+                self._trigrams.setdefault(gram, set()).add(token)
+        return postings
+
+    def _drop_token(self, token: str) -> None:
+        del self._postings[token]
+        i = bisect.bisect_left(self._tokens, token)
+        if i < len(self._tokens) and self._tokens[i] == token:
+            del self._tokens[i]
+        for gram in trigrams(token):
+            tokens = self._trigrams.get(gram)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._trigrams[gram]
+
+    # Observer interface used by SpotCatalog
+
+    def rebuild(self, spots: Iterable[dict]) -> None:
+        with self._lock:
+            self._docs = {}
+            self._postings = {}
+            self._tokens = []
+            self._trigrams = {}
+            for spot in spots:
+                self.upsert(spot)
+
+    def upsert(self, spot: dict) -> None:
+        with self._lock:
+            self.remove(spot["id"])
+            if not spot.get("is_active"):
+                return
+            tokens = self._fields(spot)
+            self._docs[spot["id"]] = {
+                "spot_id": spot["id"],
+                "street": spot.get("street"),
+                "city": spot.get("city"),
+                "postal_code": spot.get("postal_code"),
+                "_tokens": tokens,
+                "_length": sum(len(str(spot.get(f) or "")) for f in FIELDS),
+            }
+            for token, rank in tokens.items():
+                self._add_token(token)[spot["id"]] = rank
+
+    def remove(self, spot_id: str) -> None:
+        with self._lock:
+            doc = self._docs.pop(spot_id, None)
+            if doc is None:
+                return
+            for token in doc["_tokens"]:
+                postings = self._postings.get(token)
+                if postings is None:
+                    continue
+                postings.pop(spot_id, None)
+                if not postings:
+                    self._drop_token(token)
+
+    # Queries
+
+    def _prefix_tokens(self, word: str) -> List[str]:
+        lo = bisect.bisect_left(self._tokens, word)
+        hi = bisect.bisect_left(self._tokens, word + "\uffff")
+        return self._tokens[lo:hi]
+
+    def _substring_tokens(self, word: str) -> List[str]:
+        grams = [g for g in trigrams(word) if not g.startswith(" ") and not g.endswith(" ")]
+        if not grams:
+            return [t for t in self._tokens if word in t]
+        candidates: Optional[Set[str]] = None
+        for gram in sorted(grams, key=lambda g: len(self._trigrams.get(g, ()))):
+            tokens = self._trigrams.get(gram, set())
+            candidates = set(tokens) if candidates is None else candidates & tokens
+            if not candidates:
+                return []
+        return [t for t in candidates if word in t]
+
+    def _word_matches(self, word: str) -> Dict[str, Tuple[int, int]]:
+        """spot_id -> (match kind, field rank) for the best token matching word"""
+        matches: Dict[str, Tuple[int, int]] = {}
+        tokens = self._prefix_tokens(word)
+        kind_of = lambda token: EXACT if token == word else PREFIX
+        if not tokens:
+            tokens = self._substring_tokens(word)
+            kind_of = lambda token: SUBSTRING
+        for token in tokens:
+            kind = kind_of(token)
+            for spot_id, field_rank in self._postings[token].items():
+                score = (kind, field_rank)
+                if spot_id not in matches or score < matches[spot_id]:
+                    matches[spot_id] = score
+        return matches
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        words = tokenize(query)
+        if not words:
+            return []
+        with self._lock:
+            per_word = [self._word_matches(word) for word in words]
+            per_word.sort(key=len)
+            ranked = []
+            for spot_id, score in per_word[0].items():
+                total = [score]
+                for matches in per_word[1:]:
+                    other = matches.get(spot_id)
+                    if other is None:
+                        break
+                    total.append(other)
+                else:
+                    doc = self._docs[spot_id]
+                    kinds = sum(kind for kind, _ in total)
+                    fields = min(field for _, field in total)
+                    ranked.append(((kinds, fields, doc["_length"], spot_id), doc))
+            best = heapq.nsmallest(limit, ranked, key=lambda item: item[0])
+            return [
+                {key: value for key, value in doc.items() if not key.startswith("_")}
+                for _, doc in best
+            ]
@@ -0,0 +1,134 @@
+"""
+Availability math shared by the API endpoints and the benchmarks.
+Times are handled as minutes since midnight.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from processor import IntervalCalendar
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def parse_time_to_minutes(time_str: str) -> int:
+    """
+    Robust parser that handles '9:00am', '5:00 PM', and '17:00'.
+    Raises ValueError if format is invalid.
+    """
+    if not time_str:
+        raise ValueError("Time string cannot be empty")
+
+    # Normalize string: remove spaces, lowercase
+    clean_str = time_str.lower().replace(" ", "")
+
+    try:
+        # Try 12-hour format with am/pm (e.g., "9:00am")
+        if "am" in clean_str or "pm" in clean_str:
+            time_obj = datetime.strptime(clean_str, "%I:%M%p")
+        # Try 24-hour format (e.g., "17:00")
+        else:
+            time_obj = datetime.strptime(clean_str, "%H:%M")
+
+        return time_obj.hour * 60 + time_obj.minute
+    except ValueError:
+        raise ValueError(f"Invalid time format: {time_str}")
+
+
+def minutes_to_time_str(minutes: int) -> str:
+    """
+    Converts minutes back to clean 12-hour format for frontend display
+    e.g., 900 -> "3:00 PM"
+    """
+    hours = minutes // 60
+    mins = minutes % 60
+
+    # Python's datetime can handle the formatting for us
+    # Create a dummy date with this time
+    dummy_time = datetime.now().replace(hour=hours, minute=mins)
+    # Return in 12h format (change to %H:%M for 24h)
+    return dummy_time.strftime("%I:%M %p").lstrip("0")
+
+
+def subtract_bookings(
+    base_intervals: Iterable[Tuple[int, int]],
+    bookings: Iterable[Tuple[int, int]],
+) -> List[Tuple[int, int]]:
+    """
+    Subtract booked (start, end) minute ranges from each base interval.
+    Free ranges are returned per base interval, in the order the base intervals were given.
+    """
+    sorted_bookings = sorted(bookings)
+    free: List[Tuple[int, int]] = []
+
+    for base_start, base_end in base_intervals:
+        current_cursor = base_start
+
+        for book_start, book_end in sorted_bookings:
+            # Skip if booking doesn't overlap current check area
+            # (e.g. Booking is 8-9, Base is 9-5) OR (Booking is 6-7, Base is 9-5)
+            if book_end <= current_cursor or book_start >= base_end:
+                continue
+
+            # If there is a gap between cursor and booking start, that is a free slot
+            # Clamp booking to window start so we never return a time before the window
+            effective_book_start = max(book_start, base_start)
+            if current_cursor < effective_book_start:
+                free.append((current_cursor, effective_book_start))
+
+            # Move cursor to end of this booking
+            current_cursor = max(current_cursor, book_end)
+
+            # If cursor passed the window end, stop checking this interval
+            if current_cursor >= base_end:
+                break
+
+        # If there is still time left after the last booking
+        if current_cursor < base_end:
+            free.append((current_cursor, base_end))
+
+    return free
+
+
+def row_minutes(row: dict) -> Tuple[int, int]:
+    """
+    (start, end) minutes of an interval or booking row: the stored
+    start_minute/end_minute columns when present, otherwise parsed from the
+    time strings. Raises ValueError like parse_time_to_minutes.
+    """
+    start, end = row.get("start_minute"), row.get("end_minute")
+    if start is not None and end is not None:
+        return start, end
+    return parse_time_to_minutes(row["start_time"]), parse_time_to_minutes(row["end_time"])
+
+
+def normalize_intervals(intervals: Iterable[dict]) -> List[dict]:
+    """
+    Canonical weekly intervals: per weekday, overlapping and touching
+    intervals merged into the minimal sorted set, with integer
+    start_minute/end_minute next to display strings. Raises ValueError for an
+    unknown day, an unparseable time or an interval that ends before it starts.
+    """
+    calendars: Dict[str, IntervalCalendar] = {}
+    for interval in intervals:
+        day = str(interval["day"]).strip().capitalize()
+        if day not in WEEKDAYS:
+            raise ValueError(f"Invalid day: {interval['day']}")
+        start = parse_time_to_minutes(interval["start_time"])
+        end = parse_time_to_minutes(interval["end_time"])
+        if end <= start:
+            raise ValueError(
+                f"Interval end must be after start: {interval['start_time']} - {interval['end_time']}"
+            )
+        calendars.setdefault(day, IntervalCalendar()).addAvailable(start, end)
+
+    return [
+        {
+            "day": day,
+            "start_time": minutes_to_time_str(start),
+            "end_time": minutes_to_time_str(end),
+            "start_minute": start,
+            "end_minute": end,
+        }
+        for day in WEEKDAYS if day in calendars
+        for start, end in calendars[day].intervals
+    ]
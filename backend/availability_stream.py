@@ -0,0 +1,153 @@
+"""
+Server-sent availability updates.
+
+Clients subscribe to a (spot, date) and get a snapshot, then a delta event
+whenever a booking change alters the free slots. Writers only call
+notify_changed() (safe from threadpool handlers, and driven by the realtime
+change feed for writes made on other workers); the hub recomputes the
+availability once per change on the event loop's side, coalescing bursts,
+and fans the same pre-serialized event out to every subscriber queue.
+
+Idle subscribers cost one small bounded queue each. A slow consumer whose
+queue is full loses its oldest pending event, never blocks the fan-out.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from metrics import REGISTRY, Gauge
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "8"))
+HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+STREAM_SUBSCRIBERS = REGISTRY.register(Gauge(
+    "availability_stream_subscribers",
+    "Open availability event streams in this worker",
+))
+
+Key = Tuple[str, str]
+
+
+def format_event(event: str, data: dict, event_id: Optional[str] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(data, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+def slot_delta(previous: List[dict], current: List[dict]) -> Tuple[List[dict], List[dict]]:
+    """(added, removed) slots between two slot lists"""
+    before = {(s["start_time"], s["end_time"]) for s in previous}
+    after = {(s["start_time"], s["end_time"]) for s in current}
+    added = [s for s in current if (s["start_time"], s["end_time"]) not in before]
+    removed = [s for s in previous if (s["start_time"], s["end_time"]) not in after]
+    return added, removed
+
+
+class AvailabilityHub:
+    def __init__(self, compute: Callable[[str, str], dict], queue_size: int = QUEUE_SIZE):
+        # compute(spot_id, date) -> availability payload with "available_slots"; blocking
+        self.compute = compute
+        self.queue_size = queue_size
+        self._subscribers: Dict[Key, Set[asyncio.Queue]] = {}
+        self._snapshots: Dict[Key, List[dict]] = {}
+        # key -> "changed again while refreshing"
+        self._refreshing: Dict[Key, bool] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, key: Key) -> asyncio.Queue:
+        """
+        Register before computing the snapshot, so a change that lands while the
+        snapshot is being computed still produces an event instead of being lost.
+        """
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(key, set()).add(queue)
+        STREAM_SUBSCRIBERS.inc()
+        return queue
+
+    def unsubscribe(self, key: Key, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(key)
+        if subscribers is None or queue not in subscribers:
+            return
+        subscribers.discard(queue)
+        STREAM_SUBSCRIBERS.dec()
+        if not subscribers:
+            del self._subscribers[key]
+            self._snapshots.pop(key, None)
+
+    def subscriber_count(self, key: Key) -> int:
+        return len(self._subscribers.get(key, ()))
+
+    def notify_changed(self, spot_id: str, date: str) -> None:
+        """Thread-safe; a no-op unless someone in this worker watches the (spot, date)"""
+        key = (spot_id, date)
+        loop = self._loop
+        if loop is None or key not in self._subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self._schedule_refresh, key)
+        except RuntimeError as e:
+            # Loop closed (shutdown); subscribers are gone with it
+            logger.debug("Dropping availability notification for %s: %s", key, e)
+
+    def _schedule_refresh(self, key: Key) -> None:
+        if key in self._refreshing:
+            self._refreshing[key] = True
+            return
+        self._refreshing[key] = False
+        asyncio.ensure_future(self._refresh(key))
+
+    async def _refresh(self, key: Key) -> None:
+        try:
+            while key in self._subscribers:
+                try:
+                    payload = await asyncio.to_thread(self.compute, *key)
+                except Exception as e:
+                    logger.warning("Availability refresh for %s failed: %s", key, e)
+                    return
+                self._publish(key, payload)
+                if not self._refreshing.get(key):
+                    return
+                self._refreshing[key] = False
+        finally:
+            self._refreshing.pop(key, None)
+
+    def _publish(self, key: Key, payload: dict) -> None:
+        if key not in self._subscribers:
+            return
+        current = payload["available_slots"]
+        added, removed = slot_delta(self._snapshots.get(key, []), current)
+        if not added and not removed:
+            return
+        self._snapshots[key] = current
+        message = format_event("availability", {
+            "spot_id": key[0],
+            "date": key[1],
+            "available_slots": current,
+            "added": added,
+            "removed": removed,
+        })
+        for queue in self._subscribers[key]:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    async def stream(self, key: Key, queue: asyncio.Queue, snapshot: dict, heartbeat: float = HEARTBEAT_SECONDS):
+        """Async generator of SSE frames for a queue returned by subscribe()"""
+        self._snapshots.setdefault(key, snapshot["available_slots"])
+        try:
+            yield format_event("snapshot", snapshot)
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    # Comment frame keeps proxies from closing idle connections
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(key, queue)
@@ -0,0 +1,302 @@
+"""
+In-memory spot catalog for GET /spots.
+
+Holds every spot row with its availability intervals and answers the listing
+filters without a round trip:
+
+- price: parallel sorted arrays (price, spot id); a range is two bisects
+- city: postings per normalized city name; the filter keeps the existing
+  substring semantics (`ilike '%city%'`) by scanning the distinct city keys,
+  which are few, instead of every spot
+- active: a set of active spot ids
+
+The smallest candidate set is chosen first and the other filters are checked
+against it, so a combined query touches only the spots that can match.
+
+The catalog is loaded in two paged reads at startup (see main.lifespan) and kept
+current by create_parking_spot and the realtime change feed. When writes from
+other workers can't be seen it is reloaded every CATALOG_REFRESH_SECONDS.
+Until the first load succeeds callers fall back to the database.
+
+Secondary indexes (address autocomplete, ...) register with add_observer()
+and receive rebuild(spots), upsert(spot) and remove(spot_id) calls, so they
+follow the catalog through loads and incremental updates.
+"""
+import asyncio
+import bisect
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import db
+from metrics import REGISTRY, Gauge
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "30"))
+
+SORT_FIELDS = ("price_per_hour", "created_at")
+
+CATALOG_SPOTS = REGISTRY.register(Gauge(
+    "spot_catalog_spots",
+    "Spots held in the in-memory catalog",
+))
+CATALOG_AGE = REGISTRY.register(Gauge(
+    "spot_catalog_age_seconds",
+    "Seconds since the spot catalog was last fully loaded",
+))
+
+
+def normalize_city(city: Optional[str]) -> str:
+    return " ".join((city or "").casefold().split())
+
+
+def interval_key(interval: dict) -> tuple:
+    return (interval["day"], interval["start_time"], interval["end_time"])
+
+
+class SpotCatalog:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.loaded_at: Optional[float] = None
+        self._spots: Dict[str, dict] = {}
+        self._intervals: Dict[str, Dict[tuple, dict]] = {}
+        self._prices: List[float] = []
+        self._price_ids: List[str] = []
+        self._cities: Dict[str, Set[str]] = {}
+        self._active: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._observers: List = []
+
+    def __len__(self) -> int:
+        return len(self._spots)
+
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.loaded_at if self.loaded_at is not None else 0.0
+
+    # ---------------------------------------------------------------
+    # Loading and incremental updates
+    # ---------------------------------------------------------------
+
+    def add_observer(self, index) -> None:
+        """index.rebuild(spots) / upsert(spot) / remove(spot_id) follow every change"""
+        with self._lock:
+            self._observers.append(index)
+            index.rebuild(list(self._spots.values()))
+
+    def load(self, spots: Iterable[dict], intervals: Iterable[dict]) -> None:
+        """Replace the whole catalog"""
+        by_spot: Dict[str, Dict[tuple, dict]] = {}
+        for interval in intervals:
+            by_spot.setdefault(interval["spot_id"], {})[interval_key(interval)] = interval
+        spots = {spot["id"]: spot for spot in spots}
+        ordered = sorted(spots.values(), key=lambda s: (float(s["price_per_hour"]), s["id"]))
+        cities: Dict[str, Set[str]] = {}
+        for spot in spots.values():
+            cities.setdefault(normalize_city(spot["city"]), set()).add(spot["id"])
+
+        with self._lock:
+            self._spots = spots
+            self._intervals = {spot_id: by_spot.get(spot_id, {}) for spot_id in spots}
+            self._prices = [float(s["price_per_hour"]) for s in ordered]
+            self._price_ids = [s["id"] for s in ordered]
+            self._cities = cities
+            self._active = {s["id"] for s in spots.values() if s.get("is_active")}
+            for index in self._observers:
+                index.rebuild(list(spots.values()))
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+
+    def clear(self) -> None:
+        """Forget everything; callers fall back to the database until the next load"""
+        with self._lock:
+            self.loaded = False
+            self.loaded_at = None
+            self._spots = {}
+            self._intervals = {}
+            self._prices = []
+            self._price_ids = []
+            self._cities = {}
+            self._active = set()
+            for index in self._observers:
+                index.rebuild([])
+
+    def reload(self, client) -> None:
+        """Load every spot and interval from the database (two queries per PAGE_SIZE rows)"""
+        spots = db.fetch_all(client, "parking_spots_v2", "*")
+        intervals = db.fetch_all(client, "availability_intervals_v2", "*")
+        self.load(spots, intervals)
+
+    def _unindex(self, spot: dict) -> None:
+        price = float(spot["price_per_hour"])
+        i = bisect.bisect_left(self._prices, price)
+        while i < len(self._prices) and self._prices[i] == price:
+            if self._price_ids[i] == spot["id"]:
+                del self._prices[i]
+                del self._price_ids[i]
+                break
+            i += 1
+        city = normalize_city(spot["city"])
+        postings = self._cities.get(city)
+        if postings is not None:
+            postings.discard(spot["id"])
+            if not postings:
+                del self._cities[city]
+        self._active.discard(spot["id"])
+
+    def upsert_spot(self, spot: dict) -> None:
+        """Insert or replace one spot row (its intervals are kept)"""
+        with self._lock:
+            previous = self._spots.get(spot["id"])
+            if previous is not None:
+                self._unindex(previous)
+            self._spots[spot["id"]] = spot
+            self._intervals.setdefault(spot["id"], {})
+            price = float(spot["price_per_hour"])
+            i = bisect.bisect_right(self._prices, price)
+            self._prices.insert(i, price)
+            self._price_ids.insert(i, spot["id"])
+            self._cities.setdefault(normalize_city(spot["city"]), set()).add(spot["id"])
+            if spot.get("is_active"):
+                self._active.add(spot["id"])
+            for index in self._observers:
+                index.upsert(spot)
+
+    def remove_spot(self, spot_id: str) -> None:
+        with self._lock:
+            spot = self._spots.pop(spot_id, None)
+            if spot is not None:
+                self._unindex(spot)
+                for index in self._observers:
+                    index.remove(spot_id)
+            self._intervals.pop(spot_id, None)
+
+    def add_intervals(self, intervals: Iterable[dict]) -> None:
+        with self._lock:
+            for interval in intervals:
+                self._intervals.setdefault(interval["spot_id"], {})[interval_key(interval)] = interval
+
+    def remove_interval(self, interval: dict) -> Optional[str]:
+        """
+        Drop one interval row; returns its spot id if found. Delete events often
+        carry only the primary key, so rows are also matched by id.
+        """
+        with self._lock:
+            if all(field in interval for field in ("spot_id", "day", "start_time", "end_time")):
+                if self._intervals.get(interval["spot_id"], {}).pop(interval_key(interval), None) is not None:
+                    return interval["spot_id"]
+                return None
+            if interval.get("id") is None:
+                return None
+            for spot_id, intervals in self._intervals.items():
+                for key, row in intervals.items():
+                    if row.get("id") == interval["id"]:
+                        del intervals[key]
+                        return spot_id
+            return None
+
+    # ---------------------------------------------------------------
+    # Queries
+    # ---------------------------------------------------------------
+
+    def min_price(self) -> float:
+        return self._prices[0] if self._prices else 0.0
+
+    def get(self, spot_id: str) -> Optional[dict]:
+        return self._spots.get(spot_id)
+
+    def intervals(self, spot_id: str) -> List[dict]:
+        return list(self._intervals.get(spot_id, {}).values())
+
+    def _city_ids(self, city: str) -> Set[str]:
+        needle = normalize_city(city)
+        matches: Set[str] = set()
+        for key, postings in self._cities.items():
+            if needle in key:
+                matches |= postings
+        return matches
+
+    def query(
+        self,
+        city: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        is_active: Optional[bool] = True,
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        Spot rows matching every given filter. sort is a SORT_FIELDS name,
+        optionally prefixed with "-" for descending; unsorted results come in
+        ascending price order.
+        """
+        with self._lock:
+            lo = 0 if min_price is None else bisect.bisect_left(self._prices, min_price)
+            hi = len(self._prices) if max_price is None else bisect.bisect_right(self._prices, max_price)
+            if hi <= lo:
+                return []
+
+            if is_active is None:
+                keep: Callable[[str], bool] = lambda spot_id: True
+            elif is_active:
+                keep = self._active.__contains__
+            else:
+                keep = lambda spot_id: spot_id not in self._active
+
+            if city:
+                candidates = self._city_ids(city)
+                # Narrower of the two: walk the city postings or the price slice
+                if len(candidates) < hi - lo:
+                    low = self._prices[lo]
+                    high = self._prices[hi - 1]
+                    ids = [
+                        spot_id for spot_id in candidates
+                        if low <= float(self._spots[spot_id]["price_per_hour"]) <= high and keep(spot_id)
+                    ]
+                    ids.sort(key=lambda spot_id: (float(self._spots[spot_id]["price_per_hour"]), spot_id))
+                else:
+                    ids = [spot_id for spot_id in self._price_ids[lo:hi] if spot_id in candidates and keep(spot_id)]
+            else:
+                ids = [spot_id for spot_id in self._price_ids[lo:hi] if keep(spot_id)]
+
+            if sort:
+                field = sort.lstrip("-")
+                ids.sort(key=lambda spot_id: self._spots[spot_id][field], reverse=sort.startswith("-"))
+            if limit is not None:
+                ids = ids[:limit]
+            return [self._spots[spot_id] for spot_id in ids]
+
+    # ---------------------------------------------------------------
+    # Background refresh
+    # ---------------------------------------------------------------
+
+    async def _refresh_loop(self, client_factory, needs_refresh: Callable[[], bool], interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            if not needs_refresh():
+                continue
+            try:
+                await asyncio.to_thread(self.reload, client_factory())
+            except Exception as e:
+                logger.warning("Spot catalog refresh failed: %s", e)
+
+    async def start(self, client_factory, needs_refresh: Callable[[], bool], interval: float = REFRESH_SECONDS) -> None:
+        if self._task is None and interval > 0:
+            self._task = asyncio.create_task(self._refresh_loop(client_factory, needs_refresh, interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+spot_catalog = SpotCatalog()
+CATALOG_SPOTS.set_function(lambda: {(): float(len(spot_catalog))})
+CATALOG_AGE.set_function(lambda: {(): spot_catalog.age_seconds()})
@@ -0,0 +1,92 @@
+"""
+Supabase realtime change feed.
+
+With several uvicorn workers, a write handled by one worker is invisible to
+the in-process state of the others (availability streams, data versions).
+When REALTIME_CHANGE_FEED=1 each worker subscribes to postgres_changes for the
+tables that have listeners and dispatches every insert/update/delete to them,
+so all workers see every write, including their own.
+
+Listeners are plain callables (table event, record, old_record) and must be
+cheap: they run on the event loop.
+"""
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("REALTIME_CHANGE_FEED", "0") == "1"
+
+Listener = Callable[[str, Optional[dict], Optional[dict]], None]
+
+
+def configured_workers() -> int:
+    """Worker processes per host (uvicorn and gunicorn both read WEB_CONCURRENCY)"""
+    try:
+        return max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    except ValueError:
+        return 1
+
+
+class ChangeFeed:
+    def __init__(self, enabled: bool = ENABLED):
+        self.enabled = enabled
+        self.connected = False
+        self.listeners: Dict[str, List[Listener]] = {}
+        self._client = None
+
+    def add_listener(self, table: str, listener: Listener) -> None:
+        self.listeners.setdefault(table, []).append(listener)
+
+    def sees_all_writes(self) -> bool:
+        """True when in-process state can't miss another worker's write"""
+        return self.connected or configured_workers() == 1
+
+    def dispatch(self, table: str, event: str, record: Optional[dict], old_record: Optional[dict]) -> None:
+        for listener in self.listeners.get(table, ()):
+            try:
+                listener(event, record, old_record)
+            except Exception as e:
+                logger.warning("Change feed listener for %s failed: %s", table, e)
+
+    def _on_change(self, payload: dict) -> None:
+        data = payload.get("data", {})
+        event = data.get("type")
+        self.dispatch(
+            data.get("table", ""),
+            getattr(event, "value", event),
+            data.get("record"),
+            data.get("old_record"),
+        )
+
+    def _on_state(self, state, error: Optional[Exception]) -> None:
+        self.connected = getattr(state, "value", state) == "SUBSCRIBED"
+        if error is not None or not self.connected:
+            logger.warning("Realtime change feed state %s: %s", state, error)
+
+    async def start(self) -> None:
+        if not self.enabled or not self.listeners:
+            return
+        import db
+        try:
+            from supabase import acreate_client
+            self._client = await acreate_client(db.SUPABASE_URL, db.SUPABASE_KEY)
+            channel = self._client.channel("api-change-feed")
+            for table in self.listeners:
+                channel.on_postgres_changes("*", callback=self._on_change, table=table, schema="public")
+            await channel.subscribe(self._on_state)
+        except Exception as e:
+            logger.warning("Realtime change feed unavailable: %s", e)
+
+    async def stop(self) -> None:
+        self.connected = False
+        if self._client is not None:
+            try:
+                await self._client.remove_all_channels()
+            except Exception:
+                pass
+            self._client = None
+
+
+change_feed = ChangeFeed()
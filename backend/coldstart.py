@@ -0,0 +1,117 @@
+"""
+Cold-start budget check: time from `import main` to the first request served.
+
+Each sample runs in a fresh interpreter so nothing is cached in sys.modules.
+The median of the samples is compared against the budget. With --record it is
+also appended to coldstart_history.jsonl together with the git commit, so
+regressions can be traced; recording is refused when tracked files have
+uncommitted changes, since the commit would not describe what was measured.
+
+Usage:
+    python coldstart.py                    # 5 samples, 1500ms budget
+    python coldstart.py --budget-ms 800 --samples 9
+    python coldstart.py --record           # append to the history (clean tree only)
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY = os.path.join(HERE, "coldstart_history.jsonl")
+DEFAULT_BUDGET_MS = float(os.getenv("COLDSTART_BUDGET_MS", "1500"))
+
+# Runs in the child interpreter; prints one JSON line
+_CHILD = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+import httpx
+t_import = time.perf_counter()
+
+async def first_request():
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://coldstart") as client:
+            response = await client.get("/health/live")
+            assert response.status_code == 200, response.status_code
+            return time.perf_counter()
+
+t_first = asyncio.run(first_request())
+print(json.dumps({"import_ms": (t_import - t0) * 1000, "first_request_ms": (t_first - t0) * 1000}))
+"""
+
+
+def sample() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD],
+        cwd=HERE,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _git(*args: str) -> str:
+    return subprocess.run(["git", *args], cwd=HERE, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def git_commit() -> str:
+    try:
+        return _git("rev-parse", "--short", "HEAD")
+    except Exception:
+        return "unknown"
+
+
+def tree_is_clean() -> bool:
+    """No uncommitted changes to tracked files (untracked files don't affect the run)"""
+    try:
+        return _git("status", "--porcelain", "--untracked-files=no") == ""
+    except Exception:
+        return False
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure import-to-first-request cold start")
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    parser.add_argument("--record", action="store_true",
+                        help="Append the result to the history file (requires a clean git tree)")
+    args = parser.parse_args(argv)
+
+    if args.record and not tree_is_clean():
+        sys.stderr.write("Refusing to record: commit or stash changes to tracked files first\n")
+        return 2
+
+    samples = [sample() for _ in range(args.samples)]
+    result = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "samples": args.samples,
+        "import_ms": round(statistics.median(s["import_ms"] for s in samples), 1),
+        "first_request_ms": round(statistics.median(s["first_request_ms"] for s in samples), 1),
+        "budget_ms": args.budget_ms,
+    }
+    sys.stdout.write(json.dumps(result) + "\n")
+
+    if args.record:
+        with open(args.history, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+    if result["first_request_ms"] > args.budget_ms:
+        sys.stdout.write(
+            f"Cold start {result['first_request_ms']:.0f}ms exceeds budget {args.budget_ms:.0f}ms\n"
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
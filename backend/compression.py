@@ -0,0 +1,177 @@
+"""
+Negotiated gzip/brotli response compression.
+
+CompressionMiddleware picks an encoding from Accept-Encoding (brotli when the
+optional `brotli` package is installed, otherwise gzip), leaves bodies under
+the size threshold alone, and compresses streamed responses chunk by chunk,
+flushing after each chunk so clients still receive data incrementally.
+
+Configuration:
+    COMPRESSION_MIN_SIZE        bytes, default 1024
+    COMPRESSION_GZIP_LEVEL      1-9, default 6
+    COMPRESSION_BROTLI_QUALITY  0-11, default 4
+"""
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from metrics import REGISTRY, Counter
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+MINIMUM_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+# Event streams must reach the client unbuffered
+EXCLUDED_CONTENT_TYPES = ("text/event-stream",)
+
+COMPRESSION_BYTES = REGISTRY.register(Counter(
+    "http_response_compression_bytes_total",
+    "Response bytes before (direction=in) and after (direction=out) compression",
+    ("encoding", "direction"),
+))
+
+
+def supported_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported encoding for an Accept-Encoding header; brotli wins ties"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        fields = part.strip().split(";")
+        coding = fields[0].strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in supported_encodings():
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class GzipCompressor:
+    def __init__(self, level: int = GZIP_LEVEL):
+        # wbits=31 -> gzip container
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        chunk = self._compressor.compress(data)
+        return chunk + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class BrotliCompressor:
+    def __init__(self, quality: int = BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        chunk = self._compressor.process(data)
+        return chunk + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        minimum_size: int = MINIMUM_SIZE,
+        gzip_level: int = GZIP_LEVEL,
+        brotli_quality: int = BROTLI_QUALITY,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def make_compressor(self, encoding: str):
+        if encoding == "br":
+            return BrotliCompressor(self.brotli_quality)
+        return GzipCompressor(self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(self, encoding, send))
+
+
+class _CompressingSend:
+    """Per-response state: decides on the first body chunk, then compresses every chunk"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            return
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.start_message.setdefault("headers", []))
+            content_type = headers.get("content-type", "")
+            if (
+                "content-encoding" in headers
+                or content_type.startswith(EXCLUDED_CONTENT_TYPES)
+                or (not more_body and len(body) < self.middleware.minimum_size)
+            ):
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.compressor = self.middleware.make_compressor(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "content-length" in headers:
+                del headers["content-length"]
+            if not more_body:
+                data = self.compressor.compress(body, final=True)
+                headers["Content-Length"] = str(len(data))
+                self._count(len(body), len(data))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": data})
+                return
+            await self.send(self.start_message)
+
+        data = self.compressor.compress(body, final=not more_body)
+        self._count(len(body), len(data))
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    def _count(self, raw: int, compressed: int) -> None:
+        COMPRESSION_BYTES.inc(self.encoding, "in", amount=raw)
+        COMPRESSION_BYTES.inc(self.encoding, "out", amount=compressed)
@@ -0,0 +1,111 @@
+"""
+CPU-versus-bytes tradeoff of response compression at realistic payload sizes.
+
+Builds GET /spots-shaped JSON (spots with nested availability_intervals) for
+several listing sizes and, for each gzip level and brotli quality, reports
+compression time, compressed size and ratio, plus the estimated time to
+deliver the response over a slow mobile link (CPU time + transfer time).
+
+Usage:
+    python compression_bench.py
+    python compression_bench.py --spots 100 1000 --link-mbps 5 --json
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List
+
+from compression import BrotliCompressor, GzipCompressor, brotli
+from loadtest import build_dataset
+
+GZIP_LEVELS = (1, 3, 6, 9)
+BROTLI_QUALITIES = (1, 4, 6, 9, 11)
+
+
+def spots_payload(spots: int) -> bytes:
+    """Serialize a listing the way GET /spots returns it"""
+    data = build_dataset(spots=spots, users=10, bookings_per_spot=0)
+    intervals_by_spot: Dict[str, List[dict]] = {}
+    for interval in data["availability_intervals_v2"]:
+        intervals_by_spot.setdefault(interval["spot_id"], []).append({
+            "day": interval["day"],
+            "start_time": interval["start_time"],
+            "end_time": interval["end_time"],
+        })
+    listing = [
+        {**spot, "availability_intervals": intervals_by_spot.get(spot["id"], [])}
+        for spot in data["parking_spots_v2"]
+    ]
+    return json.dumps(listing).encode("utf-8")
+
+
+def time_codec(make, payload: bytes, repeat: int) -> Dict[str, float]:
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(make().compress(payload, final=True))
+        best = min(best, time.perf_counter() - start)
+    return {"seconds": best, "bytes": size}
+
+
+def run(spot_counts: List[int], link_mbps: float, repeat: int) -> List[dict]:
+    codecs = [("gzip", level, lambda level=level: GzipCompressor(level)) for level in GZIP_LEVELS]
+    if brotli is not None:
+        codecs += [("br", q, lambda q=q: BrotliCompressor(q)) for q in BROTLI_QUALITIES]
+
+    link_bytes_per_second = link_mbps * 1_000_000 / 8
+    rows = []
+    for spots in spot_counts:
+        payload = spots_payload(spots)
+        raw_transfer = len(payload) / link_bytes_per_second
+        rows.append({
+            "spots": spots, "encoding": "identity", "level": None,
+            "raw_bytes": len(payload), "bytes": len(payload), "ratio": 1.0,
+            "compress_ms": 0.0, "mb_per_s": None,
+            "delivery_ms": round(raw_transfer * 1000, 1),
+        })
+        for encoding, level, make in codecs:
+            result = time_codec(make, payload, repeat)
+            rows.append({
+                "spots": spots,
+                "encoding": encoding,
+                "level": level,
+                "raw_bytes": len(payload),
+                "bytes": result["bytes"],
+                "ratio": round(len(payload) / result["bytes"], 2),
+                "compress_ms": round(result["seconds"] * 1000, 3),
+                "mb_per_s": round(len(payload) / result["seconds"] / 1_000_000, 1),
+                "delivery_ms": round((result["seconds"] + result["bytes"] / link_bytes_per_second) * 1000, 1),
+            })
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compression CPU vs bytes benchmark")
+    parser.add_argument("--spots", type=int, nargs="+", default=[10, 100, 1000, 5000],
+                        help="Listing sizes (number of spots) to benchmark")
+    parser.add_argument("--link-mbps", type=float, default=1.5, help="Client link speed for delivery estimates")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON")
+    args = parser.parse_args(argv)
+
+    rows = run(args.spots, args.link_mbps, args.repeat)
+    if args.json:
+        sys.stdout.write(json.dumps({"link_mbps": args.link_mbps, "results": rows}, indent=2) + "\n")
+        return 0
+
+    sys.stdout.write(f"{'spots':>6} {'codec':>8} {'raw KB':>9} {'out KB':>9} {'ratio':>6} "
+                     f"{'cpu ms':>9} {'MB/s':>7} {'deliver ms':>11}\n")
+    for row in rows:
+        codec = row["encoding"] if row["level"] is None else f"{row['encoding']}-{row['level']}"
+        sys.stdout.write(
+            f"{row['spots']:>6} {codec:>8} {row['raw_bytes'] / 1024:>9.1f} {row['bytes'] / 1024:>9.1f} "
+            f"{row['ratio']:>6.2f} {row['compress_ms']:>9.3f} {row['mb_per_s'] or 0:>7.1f} {row['delivery_ms']:>11.1f}\n"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Shared fixtures.
+
+Tests point the app at fake data (loadtest.install_client) and fill the
+process-wide spot catalog and booking replica; restore_app_state puts all
+three back as they were after every test, so nothing leaks into the next one.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import db
+import loadtest
+import main
+from catalog import spot_catalog
+from fake_supabase import FakeSupabase
+from replica import booking_replica
+
+
+@pytest.fixture(autouse=True)
+def restore_app_state():
+    client = db._client
+    catalog = None
+    if spot_catalog.loaded:
+        spots = spot_catalog.query(is_active=None)
+        catalog = (spots, [i for spot in spots for i in spot_catalog.intervals(spot["id"])])
+    replica = (booking_replica.rows(), booking_replica.first_date) if booking_replica.loaded else None
+    replica_enabled = booking_replica.enabled
+    yield
+    db.set_client(client, instrument=False)
+    if catalog is None:
+        spot_catalog.clear()
+    else:
+        spot_catalog.load(*catalog)
+    if replica is None:
+        booking_replica.clear()
+    else:
+        booking_replica.load(*replica)
+    booking_replica.enabled = replica_enabled
+
+
+@pytest.fixture
+def fake_app():
+    """
+    fake_app(**build_dataset kwargs) -> (TestClient, FakeSupabase): the app
+    serving a generated dataset; fake.tables is the dataset itself.
+    """
+    def make(**dataset):
+        fake = FakeSupabase(loadtest.build_dataset(**dataset))
+        loadtest.install_client(fake)
+        return TestClient(main.app), fake
+    return make
@@ -1,6 +1,15 @@
+import logging
 import os
+import threading
+import time
+from typing import Callable, List, Optional
+
 from dotenv import load_dotenv
-from supabase import create_client, Client
+
+from metrics import SUPABASE_QUERY_DURATION, SUPABASE_QUERY_ERRORS
+from query_trace import record_query
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -8,4 +17,164 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
\ No newline at end of file
+# Query builder methods that decide what kind of statement is sent
+QUERY_OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+
+
+class InstrumentedQuery:
+    """Wraps a postgrest query builder and times execute() per table/operation and per request"""
+    __slots__ = ("_builder", "_table", "_operation")
+
+    def __init__(self, builder, table: str, operation: str = "select"):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        operation = name if name in QUERY_OPERATIONS else self._operation
+        if callable(attr):
+            def call(*args, **kwargs):
+                return InstrumentedQuery(attr(*args, **kwargs), self._table, operation)
+            return call
+        if hasattr(attr, "execute"):
+            # Properties such as .not_ return a builder too
+            return InstrumentedQuery(attr, self._table, operation)
+        return attr
+
+    def execute(self):
+        start = time.perf_counter()
+        try:
+            return self._builder.execute()
+        except Exception:
+            SUPABASE_QUERY_ERRORS.inc(self._table, self._operation)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            SUPABASE_QUERY_DURATION.observe(elapsed, self._table, self._operation)
+            record_query(self._table, self._operation, elapsed)
+
+
+class InstrumentedClient:
+    """Drop-in wrapper around a Supabase client that records metrics for every table query"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name: str) -> InstrumentedQuery:
+        return InstrumentedQuery(self._client.table(name), name)
+
+    def rpc(self, name: str, params: Optional[dict] = None) -> InstrumentedQuery:
+        """Postgres function call, recorded under the function name"""
+        return InstrumentedQuery(self._client.rpc(name, params or {}), name, "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+# Rows per request when reading a whole result set; PostgREST caps responses
+# (1000 rows by default on Supabase) so larger reads must page
+PAGE_SIZE = 1000
+# Values per in_() filter; they travel in the request URL, which has a length limit
+IN_CHUNK_SIZE = 200
+
+
+def fetch_all(client, table: str, columns: str, narrow: Callable = lambda query: query) -> List[dict]:
+    """Every row of table matching narrow(query), PAGE_SIZE at a time by id"""
+    rows: List[dict] = []
+    last_id = None
+    while True:
+        query = narrow(client.table(table).select(columns))
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(PAGE_SIZE).execute().data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        last_id = page[-1]["id"]
+
+
+def fetch_keyset(client, table: str, columns: str, keys, narrow: Callable = lambda query: query) -> List[dict]:
+    """
+    Like fetch_all for tables keyed by two columns instead of an id: pages in
+    (keys[0], keys[1]) order, continuing after the last row of each page.
+    Both columns must be selected and hold values without commas or parentheses.
+    """
+    first, second = keys
+    rows: List[dict] = []
+    last = None
+    while True:
+        query = narrow(client.table(table).select(columns))
+        if last is not None:
+            query = query.or_(
+                f"{first}.gt.{last[first]},and({first}.eq.{last[first]},{second}.gt.{last[second]})"
+            )
+        page = query.order(first).order(second).limit(PAGE_SIZE).execute().data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        last = page[-1]
+
+
+def fetch_in(client, table: str, columns: str, column: str, values: List, narrow: Callable = lambda query: query) -> List[dict]:
+    """fetch_all for rows whose column is in values, IN_CHUNK_SIZE values per filter"""
+    rows: List[dict] = []
+    for i in range(0, len(values), IN_CHUNK_SIZE):
+        chunk = values[i:i + IN_CHUNK_SIZE]
+        rows.extend(fetch_all(client, table, columns, lambda query: narrow(query.in_(column, chunk))))
+    return rows
+
+
+# The client is built on first use (or by the app lifespan), not at import time:
+# importing the Supabase stack is slow and must not fail when env vars are missing.
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> InstrumentedClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not SUPABASE_URL or not SUPABASE_KEY:
+                    raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set")
+                from supabase import create_client
+                _client = InstrumentedClient(create_client(SUPABASE_URL, SUPABASE_KEY))
+    return _client
+
+
+def warm_client() -> bool:
+    """Build the client ahead of the first request; failures are logged, not raised"""
+    try:
+        get_client()
+        return True
+    except Exception as e:
+        logger.warning("Supabase client not initialised: %s", e)
+        return False
+
+
+def set_client(client, instrument: bool = True) -> None:
+    """Swap the underlying client (tests, benchmarks, alternative data sources)"""
+    global _client
+    with _client_lock:
+        _client = InstrumentedClient(client) if instrument else client
+
+
+def close_client() -> None:
+    global _client
+    with _client_lock:
+        _client = None
+
+
+class LazyClient:
+    """Module-level handle that resolves the real client on every call"""
+
+    def table(self, name: str) -> InstrumentedQuery:
+        return get_client().table(name)
+
+    def __getattr__(self, name):
+        return getattr(get_client(), name)
+
+
+supabase = LazyClient()
+
@@ -0,0 +1,301 @@
+"""
+In-memory stand-in for the Supabase client, used by the load-test suite and tests.
+
+Supports the subset of the postgrest query builder the API uses (select,
+insert, update, upsert, delete and the eq/neq/gt/gte/lt/lte/ilike/in_ filters,
+or_() with comparison and and(...) terms, with order/limit), plus rpc() for the Postgres functions defined in
+migrations/, emulated in FUNCTIONS. Every execute() can sleep for a configurable latency so
+benchmarks see realistic blocking round trips, just like the real sync client.
+"""
+import copy
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class FakeResponse:
+    def __init__(self, data: List[dict], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def _ilike_regex(pattern: str) -> "re.Pattern":
+    regex = "".join(
+        ".*" if ch == "%" else "." if ch == "_" else re.escape(ch)
+        for ch in pattern
+    )
+    return re.compile(regex, re.IGNORECASE | re.DOTALL)
+
+
+_COMPARISONS = {
+    "eq": lambda a, b: a == b,
+    "neq": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+}
+
+
+def _split_terms(text: str) -> List[str]:
+    """Split a PostgREST logic list on the commas outside parentheses"""
+    terms, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            terms.append(text[start:i])
+            start = i + 1
+    terms.append(text[start:])
+    return terms
+
+
+def _logic_predicate(term: str) -> Callable[[dict], bool]:
+    """Predicate for one or_() term: col.op.value, and(...) or or(...)"""
+    for combinator, combine in (("and(", all), ("or(", any)):
+        if term.startswith(combinator) and term.endswith(")"):
+            parts = [_logic_predicate(t) for t in _split_terms(term[len(combinator):-1])]
+            return lambda row: combine(part(row) for part in parts)
+    column, op, value = term.split(".", 2)
+    compare = _COMPARISONS[op]
+
+    def predicate(row: dict) -> bool:
+        actual = row.get(column)
+        if actual is None:
+            return False
+        # Values arrive as text; compare numbers as numbers
+        expected = type(actual)(value) if isinstance(actual, (int, float)) else value
+        return compare(actual, expected)
+    return predicate
+
+
+class FakeQuery:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self._db = db
+        self._table = table
+        self._operation = "select"
+        self._columns: Optional[List[str]] = None
+        self._payload: Any = None
+        self._on_conflict: Optional[str] = None
+        self._filters: List[Callable[[dict], bool]] = []
+        self._order: List[tuple] = []
+        self._limit: Optional[int] = None
+
+    # -- statements ---------------------------------------------------------
+    def select(self, *columns: str, count: Optional[str] = None):
+        self._operation = "select"
+        joined = ",".join(columns) or "*"
+        if joined.strip() != "*":
+            self._columns = [c.strip() for c in joined.split(",")]
+        return self
+
+    def insert(self, rows):
+        self._operation = "insert"
+        self._payload = rows
+        return self
+
+    def update(self, values: dict):
+        self._operation = "update"
+        self._payload = values
+        return self
+
+    def upsert(self, rows, on_conflict: str = "id"):
+        self._operation = "upsert"
+        self._payload = rows
+        self._on_conflict = on_conflict
+        return self
+
+    def delete(self):
+        self._operation = "delete"
+        return self
+
+    # -- filters ------------------------------------------------------------
+    def _filter(self, predicate: Callable[[dict], bool]):
+        self._filters.append(predicate)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(lambda row: row.get(column) == value)
+
+    def neq(self, column, value):
+        return self._filter(lambda row: row.get(column) != value)
+
+    def gt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row[column] > value)
+
+    def gte(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row[column] >= value)
+
+    def lt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row[column] < value)
+
+    def lte(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row[column] <= value)
+
+    def ilike(self, column, pattern):
+        regex = _ilike_regex(pattern)
+        return self._filter(lambda row: row.get(column) is not None and regex.fullmatch(str(row[column])) is not None)
+
+    def in_(self, column, values):
+        allowed = set(values)
+        return self._filter(lambda row: row.get(column) in allowed)
+
+    def or_(self, filters: str):
+        return self._filter(_logic_predicate(f"or({filters})"))
+
+    def is_(self, column, value):
+        expected = None if value in (None, "null") else value
+        return self._filter(lambda row: row.get(column) is expected)
+
+    def order(self, column, desc: bool = False):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size: int):
+        self._limit = size
+        return self
+
+    # -- execution ----------------------------------------------------------
+    def _matches(self, row: dict) -> bool:
+        return all(predicate(row) for predicate in self._filters)
+
+    def _project(self, row: dict) -> dict:
+        if self._columns is None:
+            return copy.deepcopy(row)
+        return {c: copy.deepcopy(row.get(c)) for c in self._columns}
+
+    def execute(self) -> FakeResponse:
+        self._db.wait()
+        with self._db.lock:
+            rows = self._db.tables.setdefault(self._table, [])
+            if self._operation == "select":
+                result = [row for row in rows if self._matches(row)]
+                for column, desc in reversed(self._order):
+                    result.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+                if self._limit is not None:
+                    result = result[:self._limit]
+                return FakeResponse([self._project(row) for row in result])
+
+            if self._operation in ("insert", "upsert"):
+                payload = self._payload if isinstance(self._payload, list) else [self._payload]
+                written = []
+                for new_row in payload:
+                    new_row = copy.deepcopy(new_row)
+                    existing = None
+                    if self._operation == "upsert":
+                        keys = [k.strip() for k in (self._on_conflict or "id").split(",")]
+                        existing = next(
+                            (r for r in rows if all(r.get(k) == new_row.get(k) for k in keys)),
+                            None,
+                        )
+                    if existing is not None:
+                        existing.update(new_row)
+                        written.append(copy.deepcopy(existing))
+                        continue
+                    if "id" not in new_row:
+                        new_row["id"] = self._db.next_id(self._table)
+                    rows.append(new_row)
+                    written.append(copy.deepcopy(new_row))
+                return FakeResponse(written)
+
+            if self._operation == "update":
+                updated = []
+                for row in rows:
+                    if self._matches(row):
+                        row.update(copy.deepcopy(self._payload))
+                        updated.append(copy.deepcopy(row))
+                return FakeResponse(updated)
+
+            if self._operation == "delete":
+                deleted = [row for row in rows if self._matches(row)]
+                self._db.tables[self._table] = [row for row in rows if not self._matches(row)]
+                return FakeResponse(deleted)
+
+            raise ValueError(f"Unsupported operation: {self._operation}")
+
+
+def _bump_spot_daily_stats(db: "FakeSupabase", params: dict) -> List[dict]:
+    """migrations/001_spot_daily_stats.sql: add deltas to one (host, spot, day) row"""
+    rows = db.tables.setdefault("spot_daily_stats_v2", [])
+    host_id = params["p_host_id"]
+    if host_id is None:
+        spot = next((s for s in db.tables.get("parking_spots_v2", []) if s["id"] == params["p_spot_id"]), None)
+        if spot is None:
+            return []
+        host_id = spot["host_id"]
+    key = (host_id, params["p_spot_id"], params["p_day"])
+    row = next((r for r in rows if (r["host_id"], r["spot_id"], r["day"]) == key), None)
+    if row is None:
+        row = {"host_id": key[0], "spot_id": key[1], "day": key[2],
+               "booked_minutes": 0, "revenue": 0.0, "booking_count": 0}
+        rows.append(row)
+    row["booked_minutes"] += params["p_minutes"]
+    row["revenue"] = round(row["revenue"] + params["p_revenue"], 2)
+    row["booking_count"] += params["p_bookings"]
+    return []
+
+
+# Postgres functions callable through rpc(), keyed by name
+FUNCTIONS: Dict[str, Callable[["FakeSupabase", dict], List[dict]]] = {
+    "bump_spot_daily_stats": _bump_spot_daily_stats,
+}
+
+
+class FakeRpc:
+    def __init__(self, db: "FakeSupabase", name: str, params: dict):
+        self._db = db
+        self._name = name
+        self._params = params
+
+    def execute(self) -> FakeResponse:
+        self._db.wait()
+        with self._db.lock:
+            return FakeResponse(FUNCTIONS[self._name](self._db, copy.deepcopy(self._params)))
+
+
+class FakeSupabase:
+    """
+    Thread-safe in-memory tables with optional injected latency per query.
+    latency is in seconds; jitter is the +/- fraction applied to it.
+    """
+
+    def __init__(
+        self,
+        tables: Optional[Dict[str, List[dict]]] = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.tables: Dict[str, List[dict]] = tables if tables is not None else {}
+        self.latency = latency
+        self.jitter = jitter
+        self.lock = threading.Lock()
+        self._ids: Dict[str, int] = {}
+        self._random = random.Random(seed)
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Optional[dict] = None) -> FakeRpc:
+        if name not in FUNCTIONS:
+            raise ValueError(f"Unknown function: {name}")
+        return FakeRpc(self, name, params or {})
+
+    def next_id(self, table: str) -> int:
+        if table not in self._ids:
+            existing = [r["id"] for r in self.tables.get(table, []) if isinstance(r.get("id"), int)]
+            self._ids[table] = max(existing, default=0)
+        self._ids[table] += 1
+        return self._ids[table]
+
+    def wait(self) -> None:
+        if self.latency <= 0:
+            return
+        delay = self.latency
+        if self.jitter:
+            delay *= 1 + self._random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(delay, 0.0))
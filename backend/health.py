@@ -0,0 +1,117 @@
+"""
+Background dependency health probing.
+
+HealthProber runs every registered check on an interval in a worker thread
+and keeps the last result per dependency, so the /health endpoints answer
+from memory instead of querying Supabase on every load balancer hit.
+Caches that need warming register themselves and mark_warm() when loaded;
+readiness stays false until they have.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from metrics import REGISTRY, Gauge
+
+logger = logging.getLogger(__name__)
+
+PROBE_INTERVAL_SECONDS = float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "10"))
+PROBE_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "5"))
+# A result older than this counts as failing (e.g. the probe loop is stuck)
+STALE_AFTER_SECONDS = float(os.getenv("HEALTH_STALE_AFTER_SECONDS", str(PROBE_INTERVAL_SECONDS * 3)))
+
+DEPENDENCY_UP = REGISTRY.register(Gauge(
+    "dependency_up",
+    "1 if the last background probe of the dependency succeeded",
+    ("dependency",),
+))
+
+
+class HealthProber:
+    def __init__(
+        self,
+        interval: float = PROBE_INTERVAL_SECONDS,
+        timeout: float = PROBE_TIMEOUT_SECONDS,
+        stale_after: float = STALE_AFTER_SECONDS,
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.checks: Dict[str, Callable[[], None]] = {}
+        self.results: Dict[str, dict] = {}
+        self.warmups: Dict[str, bool] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def add_check(self, name: str, check: Callable[[], None]) -> None:
+        """Register a blocking check; it passes unless it raises"""
+        self.checks[name] = check
+
+    def register_warmup(self, name: str) -> None:
+        self.warmups.setdefault(name, False)
+
+    def mark_warm(self, name: str, warm: bool = True) -> None:
+        self.warmups[name] = warm
+
+    async def _run_check(self, name: str, check: Callable[[], None]) -> None:
+        start = time.perf_counter()
+        error = None
+        try:
+            await asyncio.wait_for(asyncio.to_thread(check), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            error = f"timed out after {self.timeout:g}s"
+        except Exception as e:
+            error = str(e)
+        self.results[name] = {
+            "ok": error is None,
+            "error": error,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+            "_monotonic": time.monotonic(),
+        }
+        DEPENDENCY_UP.set(1.0 if error is None else 0.0, name)
+        if error is not None:
+            logger.warning("Health check %s failed: %s", name, error)
+
+    async def probe_once(self) -> None:
+        await asyncio.gather(*(self._run_check(name, check) for name, check in self.checks.items()))
+
+    async def _loop(self) -> None:
+        while True:
+            await self.probe_once()
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def dependency_status(self, name: str) -> dict:
+        """Last result for one dependency, with its age and whether it is stale"""
+        result = self.results.get(name)
+        if result is None:
+            return {"ok": False, "error": "not probed yet", "checked_at": None, "age_seconds": None, "stale": False}
+        age = time.monotonic() - result["_monotonic"]
+        status = {k: v for k, v in result.items() if not k.startswith("_")}
+        status["age_seconds"] = round(age, 3)
+        status["stale"] = age > self.stale_after
+        return status
+
+    def healthy(self) -> bool:
+        return all(
+            (s := self.dependency_status(name))["ok"] and not s["stale"]
+            for name in self.checks
+        )
+
+    def ready(self) -> bool:
+        return self.healthy() and all(self.warmups.values())
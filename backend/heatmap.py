@@ -0,0 +1,166 @@
+"""
+Occupancy heatmaps: how much of each weekday/time-of-day bin a spot was
+booked, averaged over a range of weeks.
+
+Bookings are loaded once into flat NumPy arrays (spot index, weekday, start
+and end minute), so the binning is a handful of array operations regardless
+of the number of spots. A booking spans at most `span` consecutive bins of
+its day; for each offset j < span the minutes it overlaps bin start//width + j
+are computed for every booking at once and accumulated with np.bincount into
+a flat (spots x 7 x bins) array. Dividing by the bin width and by how many of
+each weekday the range contains gives the fraction of time booked (0..1).
+
+Used by GET /host/heatmap and by `python heatmap.py` for every spot.
+"""
+import argparse
+import json
+import sys
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+import db
+from availability import parse_time_to_minutes
+from host_stats import ACTIVE_STATUSES
+
+MINUTES_PER_DAY = 24 * 60
+# Bin widths in minutes: hourly (7 x 24) or quarter-hourly (7 x 96)
+RESOLUTIONS = (60, 15)
+
+
+class BookingArrays:
+    """Bookings as parallel arrays; spot_ids[spot[i]] is booking i's spot"""
+    __slots__ = ("spot_ids", "spot", "weekday", "start", "end")
+
+    def __init__(self, spot_ids: List[str], spot: np.ndarray, weekday: np.ndarray, start: np.ndarray, end: np.ndarray):
+        self.spot_ids = spot_ids
+        self.spot = spot
+        self.weekday = weekday
+        self.start = start
+        self.end = end
+
+    def __len__(self) -> int:
+        return len(self.spot)
+
+
+def _minutes(values: Sequence[str]) -> np.ndarray:
+    """parse_time_to_minutes over an array of time strings, parsing each distinct string once"""
+    unique, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    parsed = np.empty(len(unique), dtype=np.int32)
+    for i, text in enumerate(unique):
+        try:
+            parsed[i] = parse_time_to_minutes(str(text))
+        except ValueError:
+            parsed[i] = -1
+    return parsed[inverse]
+
+
+def to_arrays(bookings: Iterable[dict], spot_ids: Optional[List[str]] = None) -> BookingArrays:
+    """
+    Columnar form of booking rows. Rows with unparseable or empty times are
+    dropped; with spot_ids given, so are rows for other spots.
+    """
+    rows = list(bookings)
+    if spot_ids is None:
+        spot_ids = sorted({row["spot_id"] for row in rows})
+    if not rows:
+        empty = np.empty(0, dtype=np.int32)
+        return BookingArrays(spot_ids, empty, empty, empty, empty)
+
+    known, spot = np.unique(np.asarray([row["spot_id"] for row in rows], dtype=str), return_inverse=True)
+    position = {spot_id: i for i, spot_id in enumerate(spot_ids)}
+    remap = np.asarray([position.get(str(spot_id), -1) for spot_id in known], dtype=np.int32)
+    spot = remap[spot]
+
+    days = np.asarray([str(row["booking_date"])[:10] for row in rows], dtype="datetime64[D]")
+    # 1970-01-01 was a Thursday; shift so Monday is 0 like date.weekday()
+    weekday = ((days.astype(np.int64) + 3) % 7).astype(np.int32)
+    start = _minutes([row["start_time"] for row in rows])
+    end = _minutes([row["end_time"] for row in rows])
+
+    keep = (spot >= 0) & (start >= 0) & (end > start)
+    return BookingArrays(spot_ids, spot[keep], weekday[keep], start[keep], end[keep])
+
+
+def weekday_counts(first: date, last: date) -> np.ndarray:
+    """How many Mondays, Tuesdays, ... the inclusive range first..last contains"""
+    days = np.arange(np.datetime64(first, "D"), np.datetime64(last, "D") + 1)
+    return np.bincount((days.astype(np.int64) + 3) % 7, minlength=7)
+
+
+def occupancy(arrays: BookingArrays, first: date, last: date, bin_minutes: int = 60) -> np.ndarray:
+    """(spots, 7, bins) fraction of each bin booked on average between first and last"""
+    if MINUTES_PER_DAY % bin_minutes:
+        raise ValueError(f"bin_minutes must divide {MINUTES_PER_DAY}")
+    bins = MINUTES_PER_DAY // bin_minutes
+    n_spots = len(arrays.spot_ids)
+    booked = np.zeros(n_spots * 7 * bins, dtype=np.float64)
+
+    if len(arrays):
+        start = np.clip(arrays.start, 0, MINUTES_PER_DAY)
+        end = np.clip(arrays.end, 0, MINUTES_PER_DAY)
+        first_bin = start // bin_minutes
+        row = (arrays.spot.astype(np.int64) * 7 + arrays.weekday) * bins
+        span = int(((end - 1) // bin_minutes - first_bin).max()) + 1
+        for offset in range(span):
+            current = first_bin + offset
+            overlap = np.minimum(end, (current + 1) * bin_minutes) - np.maximum(start, current * bin_minutes)
+            hit = (overlap > 0) & (current < bins)
+            booked += np.bincount(row[hit] + current[hit], weights=overlap[hit], minlength=booked.size)
+
+    matrix = booked.reshape(n_spots, 7, bins)
+    per_weekday = weekday_counts(first, last).astype(np.float64) * bin_minutes
+    with np.errstate(divide="ignore", invalid="ignore"):
+        matrix = np.where(per_weekday[None, :, None] > 0, matrix / per_weekday[None, :, None], 0.0)
+    return np.minimum(matrix, 1.0)
+
+
+def heatmaps(arrays: BookingArrays, first: date, last: date, bin_minutes: int = 60) -> Dict[str, List[List[float]]]:
+    """spot_id -> 7 rows (Monday first) of per-bin occupancy, rounded for JSON"""
+    matrix = np.round(occupancy(arrays, first, last, bin_minutes), 4)
+    return {spot_id: matrix[i].tolist() for i, spot_id in enumerate(arrays.spot_ids)}
+
+
+def load_bookings(client, first: date, last: date, spot_ids: Optional[List[str]] = None) -> List[dict]:
+    """Active bookings between first and last (inclusive), optionally for some spots only"""
+    def narrow(query):
+        query = query.in_("status", list(ACTIVE_STATUSES))\
+            .gte("booking_date", first.isoformat())\
+            .lte("booking_date", last.isoformat())
+        return query.in_("spot_id", spot_ids) if spot_ids is not None else query
+
+    return db.fetch_all(client, "bookings_v2", "id, spot_id, booking_date, start_time, end_time", narrow)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Occupancy heatmaps by weekday and time of day for every spot")
+    parser.add_argument("--weeks", type=int, default=8, help="Weeks of bookings to include")
+    parser.add_argument("--end", help="Last day to include (YYYY-MM-DD, default today)")
+    parser.add_argument("--bin-minutes", type=int, choices=RESOLUTIONS, default=60)
+    parser.add_argument("--out", help="Write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    last = date.fromisoformat(args.end) if args.end else date.today()
+    first = last - timedelta(weeks=args.weeks) + timedelta(days=1)
+    client = db.get_client()
+    spot_ids = sorted(spot["id"] for spot in db.fetch_all(client, "parking_spots_v2", "id"))
+    arrays = to_arrays(load_bookings(client, first, last), spot_ids)
+    document = {
+        "start": first.isoformat(),
+        "end": last.isoformat(),
+        "bin_minutes": args.bin_minutes,
+        "heatmaps": heatmaps(arrays, first, last, args.bin_minutes),
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(document, f)
+        sys.stderr.write(f"Wrote {len(spot_ids)} heatmaps to {args.out}\n")
+    else:
+        json.dump(document, sys.stdout)
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""
+Two-phase bookings: POST /bookings/holds inserts a "pending" booking with an
+expires_at HOLD_TTL_SECONDS ahead, which blocks the slot like a confirmed
+one; POST /bookings/{id}/confirm turns it into a confirmed booking before
+then. Abandoned holds are expired by the worker that created them: each hold
+is a timer in hold_timers, whose callback (main.expire_hold) flips the row to
+"expired" with a conditional update, so a hold that was confirmed or
+cancelled in the meantime is left alone. At startup the pending holds still
+in the database are put back on the wheel (one indexed query), so a restart
+doesn't strand them.
+"""
+import os
+from datetime import datetime, timedelta
+
+from metrics import REGISTRY, Counter, Gauge
+from timers import TimerWheel
+
+HOLD_TTL_SECONDS = int(os.getenv("HOLD_TTL_SECONDS", "600"))
+
+HOLDS = REGISTRY.register(Counter(
+    "booking_holds_total",
+    "Booking holds by outcome (held|confirmed|expired)",
+    ("result",),
+))
+HOLDS_PENDING = REGISTRY.register(Gauge(
+    "booking_holds_pending",
+    "Holds waiting on this worker's expiry timer",
+))
+
+hold_timers = TimerWheel()
+HOLDS_PENDING.set_function(lambda: {(): float(len(hold_timers))})
+
+
+def expires_at(created: datetime, ttl_seconds: int = HOLD_TTL_SECONDS) -> str:
+    return (created + timedelta(seconds=ttl_seconds)).isoformat()
+
+
+def seconds_left(expires: str, now: datetime) -> float:
+    """Seconds until an expires_at value (negative once past)"""
+    moment = datetime.fromisoformat(expires.replace("Z", "+00:00"))
+    if moment.tzinfo is not None:
+        moment = moment.replace(tzinfo=None) - (moment.utcoffset() or timedelta())
+    return (moment - now).total_seconds()
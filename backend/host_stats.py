@@ -0,0 +1,175 @@
+"""
+Per (host, spot, day) booking aggregates behind the host dashboard.
+
+Summing revenue and occupancy straight from bookings_v2 means reading every
+booking a host ever had. spot_daily_stats_v2 (migrations/001_spot_daily_stats.sql)
+instead keeps booked minutes, revenue and booking count per host, spot and
+day: create_booking adds a booking's contribution and cancel_booking takes it
+away, each with one atomic bump_spot_daily_stats call, so a dashboard for N
+weeks reads at most 7 * N rows per spot.
+
+An increment that fails after its booking was written leaves the aggregates
+off; `python host_stats.py rebuild` recomputes the table from bookings_v2.
+Run it when bookings are quiet: one written mid-rebuild may be counted twice
+or missed.
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import db
+from availability import row_minutes
+
+TABLE = "spot_daily_stats_v2"
+# Bookings that occupy their slot; cancelled ones don't count
+ACTIVE_STATUSES = ("confirmed", "pending")
+
+# (host_id, spot_id, day)
+StatsKey = Tuple[int, str, str]
+
+
+def booking_minutes(booking: dict) -> int:
+    try:
+        start, end = row_minutes(booking)
+    except ValueError:
+        return 0
+    return max(0, end - start)
+
+
+def record_booking(client, booking: dict, host_id: Optional[int], sign: int = 1) -> None:
+    """
+    Add (sign=1) or remove (sign=-1) one booking's contribution to its day's
+    row. With host_id None the database looks the host up from the spot.
+    """
+    client.rpc("bump_spot_daily_stats", {
+        "p_host_id": host_id,
+        "p_spot_id": booking["spot_id"],
+        "p_day": booking["booking_date"],
+        "p_minutes": sign * booking_minutes(booking),
+        "p_revenue": sign * round(float(booking.get("total_price") or 0), 2),
+        "p_bookings": sign,
+    }).execute()
+
+
+def aggregate(bookings: Iterable[dict], host_of: Dict[str, int]) -> Dict[StatsKey, dict]:
+    rows: Dict[StatsKey, dict] = {}
+    for booking in bookings:
+        host_id = host_of.get(booking["spot_id"])
+        if host_id is None or booking.get("status") not in ACTIVE_STATUSES:
+            continue
+        key = (host_id, booking["spot_id"], booking["booking_date"])
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = {"host_id": key[0], "spot_id": key[1], "day": key[2],
+                               "booked_minutes": 0, "revenue": 0.0, "booking_count": 0}
+        row["booked_minutes"] += booking_minutes(booking)
+        row["revenue"] = round(row["revenue"] + float(booking.get("total_price") or 0), 2)
+        row["booking_count"] += 1
+    return rows
+
+
+def rebuild(client) -> int:
+    """Recompute spot_daily_stats_v2 from bookings_v2; returns the number of rows written"""
+    spots = db.fetch_all(client, "parking_spots_v2", "id, host_id")
+    bookings = db.fetch_all(
+        client, "bookings_v2", "id, spot_id, booking_date, start_time, end_time, total_price, status",
+        lambda query: query.in_("status", list(ACTIVE_STATUSES)),
+    )
+    rows = list(aggregate(bookings, {spot["id"]: spot["host_id"] for spot in spots}).values())
+
+    # PostgREST refuses a delete without a filter; every row has a day
+    client.table(TABLE).delete().gte("day", "0001-01-01").execute()
+    for i in range(0, len(rows), db.PAGE_SIZE):
+        client.table(TABLE).insert(rows[i:i + db.PAGE_SIZE]).execute()
+    return len(rows)
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def weekly_minutes(intervals: Iterable[dict]) -> int:
+    """Minutes a spot is open in a week, from its recurring intervals"""
+    total = 0
+    for interval in intervals:
+        try:
+            start, end = row_minutes(interval)
+        except ValueError:
+            continue
+        total += max(0, end - start)
+    return total
+
+
+def _totals(booked_minutes: int, available_minutes: int, revenue: float, bookings: int) -> dict:
+    return {
+        "booked_minutes": booked_minutes,
+        "available_minutes": available_minutes,
+        "occupancy": round(booked_minutes / available_minutes, 4) if available_minutes else 0.0,
+        "revenue": round(revenue, 2),
+        "bookings": bookings,
+    }
+
+
+def dashboard(
+    spots: List[dict],
+    intervals: Dict[str, List[dict]],
+    rows: Iterable[dict],
+    start: date,
+    weeks: int,
+) -> dict:
+    """
+    Revenue, bookings and occupancy (booked / open minutes) per spot per week
+    for `weeks` weeks from the Monday `start`, plus per-spot and host totals.
+    """
+    week_starts = [start + timedelta(weeks=i) for i in range(weeks)]
+    sums: Dict[Tuple[str, date], List[float]] = {}
+    for row in rows:
+        key = (row["spot_id"], week_start(date.fromisoformat(str(row["day"])[:10])))
+        bucket = sums.setdefault(key, [0, 0.0, 0])
+        bucket[0] += int(row["booked_minutes"])
+        bucket[1] += float(row["revenue"])
+        bucket[2] += int(row["booking_count"])
+
+    spot_results = []
+    host_sum = [0, 0, 0.0, 0]
+    for spot in sorted(spots, key=lambda s: s["id"]):
+        open_minutes = weekly_minutes(intervals.get(spot["id"], []))
+        week_results = []
+        spot_sum = [0, 0, 0.0, 0]
+        for monday in week_starts:
+            booked, revenue, count = sums.get((spot["id"], monday), (0, 0.0, 0))
+            week_results.append({"week_start": monday.isoformat(), **_totals(booked, open_minutes, revenue, count)})
+            for i, value in enumerate((booked, open_minutes, revenue, count)):
+                spot_sum[i] += value
+        spot_results.append({
+            "spot_id": spot["id"],
+            "street": spot["street"],
+            "city": spot["city"],
+            **_totals(*spot_sum),
+            "weeks": week_results,
+        })
+        for i, value in enumerate(spot_sum):
+            host_sum[i] += value
+
+    return {
+        "start": start.isoformat(),
+        "end": (start + timedelta(weeks=weeks)).isoformat(),
+        **_totals(*host_sum),
+        "spots": spot_results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Host dashboard aggregates")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("rebuild", help=f"Recompute {TABLE} from bookings_v2")
+    parser.parse_args(argv)
+
+    written = rebuild(db.get_client())
+    sys.stdout.write(f"Rebuilt {TABLE}: {written} rows\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
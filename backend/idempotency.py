@@ -0,0 +1,163 @@
+"""
+Idempotency-Key support for non-idempotent POSTs.
+
+The first request with a given key (per user and endpoint) runs normally and
+its final response (status and body) is kept for IDEMPOTENCY_TTL_SECONDS.
+Repeats with the same key and the same body get that response back without
+running the handler or touching the database. A repeat that arrives while
+the first is still running waits for it (up to IDEMPOTENCY_WAIT_SECONDS).
+Reusing a key with a different body is rejected.
+
+Responses with a 5xx status are not kept, so a retry after a transient
+failure runs again. The store is an LRU bounded by IDEMPOTENCY_MAX_KEYS. When
+the shared cache is enabled, completed responses are also written there so a
+retry routed to another worker on the host is replayed too.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from metrics import record_cache
+
+TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+MAX_KEY_LENGTH = 255
+
+# (status_code, body)
+StoredResponse = Tuple[int, Any]
+
+
+class IdempotencyKeyReused(Exception):
+    """Same key, different request body"""
+
+
+class RequestInProgress(Exception):
+    """The original request is still running after waiting WAIT_SECONDS"""
+
+
+def fingerprint(payload: Any) -> str:
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "done", "response", "expires_at")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.response: Optional[StoredResponse] = None
+        self.expires_at = float("inf")
+
+
+class IdempotencyStore:
+    def __init__(
+        self,
+        ttl: float = TTL_SECONDS,
+        max_keys: int = MAX_KEYS,
+        wait_seconds: float = WAIT_SECONDS,
+        shared=None,
+    ):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.wait_seconds = wait_seconds
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self) -> None:
+        # Least recently used first; in-flight entries are never evicted.
+        # Expired entries are dropped when their key is next used.
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_keys:
+                break
+            if self._entries[key].done.is_set():
+                del self._entries[key]
+
+    def _shared_lookup(self, key: str) -> Optional[Tuple[str, StoredResponse]]:
+        if self.shared is None:
+            return None
+        try:
+            stored = self.shared.get(f"idempotency:{key}", ())
+        except Exception:
+            return None
+        if stored is None:
+            return None
+        return stored["fingerprint"], (stored["status"], stored["body"])
+
+    def run(self, key: str, request_fingerprint: str, handler: Callable[[], StoredResponse]) -> Tuple[StoredResponse, bool]:
+        """
+        (response, replayed). handler() returns (status_code, body) and is
+        called at most once per key while the stored response is live.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.done.is_set() and entry.expires_at < now:
+                del self._entries[key]
+                entry = None
+            owner = entry is None
+            if owner:
+                shared = self._shared_lookup(key)
+                if shared is not None:
+                    entry = _Entry(shared[0])
+                    entry.response = shared[1]
+                    entry.expires_at = now + self.ttl
+                    entry.done.set()
+                    owner = False
+                else:
+                    entry = _Entry(request_fingerprint)
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                self._evict()
+
+        if not owner:
+            if entry.fingerprint != request_fingerprint:
+                raise IdempotencyKeyReused(key)
+            if not entry.done.wait(self.wait_seconds):
+                raise RequestInProgress(key)
+            if entry.response is not None:
+                record_cache("idempotency", True)
+                return entry.response, True
+            # The original failed with a 5xx or an exception; this repeat runs it again
+            return self.run(key, request_fingerprint, handler)
+
+        record_cache("idempotency", False)
+        try:
+            response = handler()
+        except BaseException:
+            self._abandon(key, entry)
+            raise
+        if response[0] >= 500:
+            self._abandon(key, entry)
+            return response, False
+
+        with self._lock:
+            entry.response = response
+            entry.expires_at = time.monotonic() + self.ttl
+        entry.done.set()
+        if self.shared is not None:
+            try:
+                self.shared.set(
+                    f"idempotency:{key}",
+                    {"fingerprint": request_fingerprint, "status": response[0], "body": response[1]},
+                    stamp="",
+                    ttl=self.ttl,
+                )
+            except Exception:
+                pass
+        return response, False
+
+    def _abandon(self, key: str, entry: _Entry) -> None:
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
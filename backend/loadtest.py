@@ -0,0 +1,290 @@
+"""
+In-process load test for the API.
+
+Drives the FastAPI app through httpx's ASGI transport against the in-memory
+FakeSupabase with injected per-query latency, runs concurrent scenarios and
+prints (or writes) a JSON report with RPS and p50/p95/p99 per endpoint.
+
+Usage:
+    python loadtest.py --latency-ms 20 --concurrency 50 --requests 2000
+    python loadtest.py --scenario booking_contention --output bench_output.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from availability import row_minutes
+import db
+from catalog import spot_catalog
+from fake_supabase import FakeSupabase
+from replica import booking_replica
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+CITIES = ["Vancouver", "Burnaby", "Richmond", "Surrey", "Victoria", "Toronto", "Montreal", "Calgary"]
+
+
+def build_dataset(spots: int = 200, users: int = 50, bookings_per_spot: int = 3, seed: int = 42) -> Dict[str, List[dict]]:
+    """Generate users, spots with split weekday hours, and a few bookings per spot"""
+    rng = random.Random(seed)
+    now = datetime.utcnow().isoformat()
+    users_rows = [
+        {
+            "id": i,
+            "first_name": f"User{i}",
+            "last_name": "Bench",
+            "email": f"user{i}@bench.test",
+            "password_hash": "",
+            "created_at": now,
+            "is_active": True,
+        }
+        for i in range(1, users + 1)
+    ]
+
+    spot_rows, interval_rows, booking_rows = [], [], []
+    start_day = bench_date()
+    for i in range(spots):
+        spot_id = f"spot-{i:05d}"
+        city = CITIES[i % len(CITIES)]
+        spot_rows.append({
+            "id": spot_id,
+            "host_id": rng.randint(1, users),
+            "street": f"{100 + i} Main St",
+            "city": city,
+            "province": "BC",
+            "postal_code": f"V{i % 10}A {i % 10}B{i % 10}",
+            "country": "Canada",
+            "lat": 49.0 + rng.random(),
+            "lng": -123.0 + rng.random(),
+            "price_per_hour": round(rng.uniform(2, 20), 2),
+            "created_at": now,
+            "is_active": True,
+        })
+        for day in DAYS:
+            interval_rows.append({"id": len(interval_rows) + 1, "spot_id": spot_id, "day": day,
+                                  "start_time": "8:00am", "end_time": "12:00pm"})
+            interval_rows.append({"id": len(interval_rows) + 1, "spot_id": spot_id, "day": day,
+                                  "start_time": "1:00pm", "end_time": "8:00pm"})
+        for b in range(bookings_per_spot):
+            hour = 8 + 3 * b
+            booking_rows.append({
+                "id": f"booking-{i:05d}-{b}",
+                "spot_id": spot_id,
+                "user_id": rng.randint(1, users),
+                "booking_date": start_day.isoformat(),
+                "start_time": f"{hour}:00",
+                "end_time": f"{hour + 1}:00",
+                "start_minute": hour * 60,
+                "end_minute": (hour + 1) * 60,
+                "total_price": spot_rows[-1]["price_per_hour"],
+                "status": "confirmed",
+                "created_at": now,
+            })
+
+    return {
+        "users_v2": users_rows,
+        "parking_spots_v2": spot_rows,
+        "availability_intervals_v2": interval_rows,
+        "bookings_v2": booking_rows,
+    }
+
+
+def bench_date() -> date:
+    """Next Monday, so generated bookings and availability line up"""
+    today = date.today()
+    return today + timedelta(days=(7 - today.weekday()) % 7 or 7)
+
+
+def install_client(fake: FakeSupabase) -> None:
+    """Point the app's data client at the fake (wrapped for metrics/tracing)"""
+    db.set_client(fake)
+    # Anything cached from the previous data source is wrong now
+    spot_catalog.clear()
+    booking_replica.clear()
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+
+    def record(self, endpoint: str, seconds: float, status_code: int) -> None:
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        counts = self.statuses.setdefault(endpoint, {})
+        counts[str(status_code)] = counts.get(str(status_code), 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, dict]:
+        result = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+            errors = sum(n for code, n in self.statuses[endpoint].items() if code.startswith("5"))
+            result[endpoint] = {
+                "requests": len(ordered),
+                "errors": errors,
+                "status_counts": self.statuses[endpoint],
+                "rps": round(len(ordered) / elapsed, 2) if elapsed > 0 else 0.0,
+                "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+                "max_ms": round(ordered[-1] * 1000, 3),
+            }
+        return result
+
+
+# A scenario step returns (endpoint label, method, url, json body, headers)
+Step = Tuple[str, str, str, Optional[dict], Optional[dict]]
+
+
+def search_step(rng: random.Random, ctx: dict) -> Step:
+    city = rng.choice(CITIES)
+    max_price = rng.choice([5, 10, 15, 20])
+    return "GET /spots", "GET", f"/spots?city={city}&max_price={max_price}", None, None
+
+
+def availability_step(rng: random.Random, ctx: dict) -> Step:
+    spot_id = rng.choice(ctx["spot_ids"])
+    day = ctx["date"] + timedelta(days=rng.randint(0, 6))
+    return "GET /spots/{spot_id}/availability/{date}", "GET", f"/spots/{spot_id}/availability/{day.isoformat()}", None, None
+
+
+def booking_contention_step(rng: random.Random, ctx: dict) -> Step:
+    # Many users racing for the same few afternoon hours on a handful of hot spots
+    spot_id = rng.choice(ctx["hot_spot_ids"])
+    hour = rng.choice([13, 14, 15])
+    body = {
+        "spot_id": spot_id,
+        "booking_date": (ctx["date"] + timedelta(days=1)).isoformat(),
+        "start_time": f"{hour}:00",
+        "end_time": f"{hour + 1}:00",
+    }
+    headers = {"Authorization": f"Bearer {rng.choice(ctx['tokens'])}"}
+    return "POST /bookings", "POST", "/bookings", body, headers
+
+
+SCENARIOS: Dict[str, Callable[[random.Random, dict], Step]] = {
+    "search": search_step,
+    "availability": availability_step,
+    "booking_contention": booking_contention_step,
+}
+
+
+def count_double_bookings(fake: FakeSupabase) -> int:
+    """Overlapping active bookings for the same spot and date (should always be zero)"""
+    by_key: Dict[tuple, List[tuple]] = {}
+    for b in fake.tables.get("bookings_v2", []):
+        if b["status"] not in ("confirmed", "pending"):
+            continue
+        key = (b["spot_id"], b["booking_date"])
+        by_key.setdefault(key, []).append(row_minutes(b))
+    overlaps = 0
+    for intervals in by_key.values():
+        intervals.sort()
+        for (_, prev_end), (start, _) in zip(intervals, intervals[1:]):
+            if start < prev_end:
+                overlaps += 1
+    return overlaps
+
+
+async def run_scenario(app, name: str, ctx: dict, concurrency: int, requests: int, seed: int) -> dict:
+    step = SCENARIOS[name]
+    recorder = Recorder()
+    remaining = [requests]
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        async def worker(worker_id: int):
+            rng = random.Random(seed * 1000 + worker_id)
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                label, method, url, body, headers = step(rng, ctx)
+                start = time.perf_counter()
+                response = await client.request(method, url, json=body, headers=headers)
+                recorder.record(label, time.perf_counter() - start, response.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {"duration_s": round(elapsed, 3), "endpoints": recorder.summary(elapsed)}
+
+
+async def run(args) -> dict:
+    import main
+
+    dataset = build_dataset(spots=args.spots, users=args.users, seed=args.seed)
+    fake = FakeSupabase(dataset, latency=args.latency_ms / 1000.0, jitter=args.jitter, seed=args.seed)
+    install_client(fake)
+    # Serve GET /spots the way a warmed-up worker does
+    spot_catalog.reload(db.get_client())
+
+    spot_ids = [s["id"] for s in dataset["parking_spots_v2"]]
+    ctx = {
+        "date": bench_date(),
+        "spot_ids": spot_ids,
+        "hot_spot_ids": spot_ids[: max(1, args.hot_spots)],
+        "tokens": [main.create_access_token({"user_id": u["id"]}) for u in dataset["users_v2"]],
+    }
+
+    report = {
+        "config": {
+            "latency_ms": args.latency_ms,
+            "jitter": args.jitter,
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests,
+            "spots": args.spots,
+            "users": args.users,
+            "seed": args.seed,
+        },
+        "scenarios": {},
+    }
+    for name in args.scenario or list(SCENARIOS):
+        result = await run_scenario(main.app, name, ctx, args.concurrency, args.requests, args.seed)
+        if name == "booking_contention":
+            result["double_bookings"] = count_double_bookings(fake)
+        report["scenarios"][name] = result
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="In-process load test for the parking API")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="Injected latency per Supabase query")
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction applied to the injected latency")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent simulated clients")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--spots", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--hot-spots", type=int, default=3, help="Spots targeted by booking_contention")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
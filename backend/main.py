@@ -131,16 +131,105 @@
 # ===================================================================
 # NEW V2 API - CLEAN START
 # ===================================================================
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 from db import supabase
+from metrics import REGISTRY, CONTENT_TYPE_LATEST, MetricsMiddleware
+from query_trace import QueryTraceMiddleware
+from compression import CompressionMiddleware
+from availability import normalize_intervals, parse_time_to_minutes, minutes_to_time_str, row_minutes, subtract_bookings
+from health import HealthProber
+from metrics import record_cache
+from versions import content_etag, data_versions, etag_matches
+from availability_stream import AvailabilityHub
+from change_feed import change_feed
+from catalog import spot_catalog
+from replica import booking_replica
+from autocomplete import AddressIndex, FIELDS as ADDRESS_FIELDS, tokenize
+from spatial import GridIndex
+from shared_cache import shared_cache
+import holds
+import host_stats
+import quotes
+import schedule
+from quotes import booking_price, within_hours
+from holds import HOLD_TTL_SECONDS, HOLDS, hold_timers
+from idempotency import IdempotencyKeyReused, IdempotencyStore, MAX_KEY_LENGTH, RequestInProgress, fingerprint
+from locks import LockTimeout, booking_locks
+from contextlib import asynccontextmanager
+import asyncio
+import db
 import uuid
 
-app = FastAPI(title="Parking Spot API v2", version="2.0")
+# Dependency health is probed in the background; /health* endpoints read the last result
+health_prober = HealthProber()
+
+async def warm_supabase_client() -> None:
+    health_prober.mark_warm("supabase_client", await asyncio.to_thread(db.warm_client))
+
+async def warm_spot_catalog() -> None:
+    try:
+        await asyncio.to_thread(spot_catalog.reload, db.get_client())
+        health_prober.mark_warm("spot_catalog")
+    except Exception as e:
+        # GET /spots keeps querying the database until a later refresh succeeds
+        print(f"Spot catalog not loaded: {e}")
+
+async def warm_booking_replica() -> None:
+    try:
+        await asyncio.to_thread(booking_replica.reload, db.get_client())
+        health_prober.mark_warm("booking_replica")
+    except Exception as e:
+        # Availability keeps querying the database until the sync loop loads it
+        print(f"Booking replica not loaded: {e}")
+
+async def resume_hold_timers() -> None:
+    """Put holds still pending in the database back on the expiry wheel"""
+    try:
+        await asyncio.to_thread(schedule_pending_holds)
+    except Exception as e:
+        print(f"Pending holds not rescheduled: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the Supabase client off the event loop; requests that arrive first wait on its lock.
+    # /health/ready stays 503 until it exists.
+    health_prober.register_warmup("supabase_client")
+    health_prober.register_warmup("spot_catalog")
+    client_warmup = asyncio.create_task(warm_supabase_client())
+    catalog_warmup = asyncio.create_task(warm_spot_catalog())
+    replica_warmup = None
+    if booking_replica.enabled:
+        health_prober.register_warmup("booking_replica")
+        replica_warmup = asyncio.create_task(warm_booking_replica())
+    await health_prober.start()
+    await change_feed.start()
+    # Periodic reload only while other workers' writes can't reach us through the feed
+    await spot_catalog.start(db.get_client, lambda: not change_feed.sees_all_writes())
+    await booking_replica.start(db.get_client, lambda: change_feed.connected)
+    await hold_timers.start()
+    holds_resumed = asyncio.create_task(resume_hold_timers())
+    yield
+    await holds_resumed
+    await hold_timers.stop()
+    await booking_replica.stop()
+    await spot_catalog.stop()
+    await change_feed.stop()
+    await health_prober.stop()
+    await client_warmup
+    await catalog_warmup
+    if replica_warmup is not None:
+        await replica_warmup
+    db.close_client()
+
+app = FastAPI(title="Parking Spot API v2", version="2.0", lifespan=lifespan)
 
 # CORS Configuration
 app.add_middleware(
@@ -151,9 +240,120 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Per-request query count/time in Server-Timing, with per-route query budgets
+app.add_middleware(QueryTraceMiddleware)
+
+# gzip/brotli for large payloads such as GET /spots (threshold and levels from env)
+app.add_middleware(CompressionMiddleware)
+
+# Request latency metrics (added last so it wraps every other middleware)
+app.add_middleware(MetricsMiddleware)
+
 # Security
 security = HTTPBearer()
 
+def not_modified(etag: str) -> Response:
+    """304 for a conditional GET whose If-None-Match still matches"""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def set_etag(response: Response, etag: str) -> None:
+    # no-cache: clients may store the body but must revalidate with If-None-Match
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+# Shared-cache writes started by change feed listeners, kept referenced until they finish
+_pending_bumps = set()
+
+def _bump_done(task: asyncio.Task) -> None:
+    _pending_bumps.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Shared cache invalidation failed: {task.exception()}")
+
+def bump_shared_cache(scope: str) -> None:
+    """
+    shared_cache.bump(scope). Request threads write before responding, so the
+    next read sees it; on the event loop (change feed listeners) the blocking
+    SQLite write runs in a worker thread instead.
+    """
+    if shared_cache is None:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        shared_cache.bump(scope)
+        return
+    task = loop.create_task(asyncio.to_thread(shared_cache.bump, scope))
+    _pending_bumps.add(task)
+    task.add_done_callback(_bump_done)
+
+def availability_changed(spot_id: str, booking_date: str) -> None:
+    """
+    Invalidate everything derived from a spot's bookings on one date.
+    Called after the write has succeeded, so it must never fail the request.
+    """
+    try:
+        data_versions.bump_availability(spot_id, booking_date)
+        bump_shared_cache(f"avail:{spot_id}:{booking_date}")
+        availability_hub.notify_changed(spot_id, booking_date)
+    except Exception as e:
+        print(f"Availability invalidation failed for {spot_id} on {booking_date}: {e}")
+
+def spot_changed(spot_id: str) -> None:
+    """Invalidate everything derived from a spot's row or weekly hours; never fails the request"""
+    try:
+        data_versions.bump_spot(spot_id)
+        bump_shared_cache(f"spot:{spot_id}")
+    except Exception as e:
+        print(f"Spot invalidation failed for {spot_id}: {e}")
+
+def booking_stats_changed(booking: dict, host_id: Optional[int], sign: int) -> None:
+    """Add (1) or remove (-1) a booking from the host dashboard aggregates; never fails the request"""
+    try:
+        host_stats.record_booking(supabase, booking, host_id, sign)
+    except Exception as e:
+        # Fixed by the next `python host_stats.py rebuild`
+        print(f"Host stats update failed for booking {booking.get('id')}: {e}")
+
+# Responses to POSTs sent with an Idempotency-Key, replayed on retries
+idempotency_store = IdempotencyStore(shared=shared_cache)
+
+def run_idempotent(idempotency_key: Optional[str], scope: str, payload: dict, handler, status_code: int):
+    """
+    Run handler() once per (scope, Idempotency-Key). Without a key the result
+    is returned as is; with one, the first 2xx/4xx response is replayed to
+    repeats of the same request with an Idempotent-Replayed header.
+    """
+    if idempotency_key is None:
+        return handler()
+    if not idempotency_key.strip() or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"
+        )
+
+    def respond():
+        try:
+            return status_code, jsonable_encoder(handler())
+        except HTTPException as e:
+            return e.status_code, {"detail": e.detail}
+
+    try:
+        (code, body), replayed = idempotency_store.run(
+            f"{scope}:{idempotency_key}", fingerprint(payload), respond
+        )
+    except IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request body"
+        )
+    except RequestInProgress:
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still in progress"
+        )
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return JSONResponse(status_code=code, content=body, headers=headers)
+
 @app.get("/")
 def root():
     return {
@@ -234,12 +434,14 @@ class BookingOut(BaseModel):
     total_price: float
     status: str
     created_at: str
+    # Set while the booking is an unconfirmed hold
+    expires_at: Optional[str] = None
 
 # ===================================================================
 # AUTHENTICATION & PASSWORD UTILITIES
 # ===================================================================
-import bcrypt
-import jwt
+# bcrypt and jwt are imported inside the functions that use them so that
+# importing the app (worker start, tests) doesn't pay for them up front
 from datetime import timedelta
 
 # JWT Configuration
@@ -249,16 +451,19 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
+    import bcrypt
     salt = bcrypt.gensalt()
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
+    import bcrypt
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 def create_access_token(data: dict) -> str:
     """Create a JWT access token"""
+    import jwt
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
@@ -267,22 +472,28 @@ def create_access_token(data: dict) -> str:
 
 def decode_token(token: str) -> dict:
     """Decode and verify a JWT token"""
+    import jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
-    """Get current user from JWT token"""
-    token = credentials.credentials
-    payload = decode_token(token)
+def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> int:
+    """User id from a verified JWT, without a database lookup"""
+    payload = decode_token(credentials.credentials)
     user_id = payload.get("user_id")
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid token")
+    return user_id
+
+def get_current_user(user_id: int = Depends(get_current_user_id)) -> dict:
+    """Get current user from JWT token"""
+    return load_user(user_id)
 
+def load_user(user_id: int) -> dict:
     # Get user from database
     try:
         response = supabase.table("users_v2").select("*").eq("id", user_id).execute()
@@ -295,15 +506,53 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
 # ===================================================================
 # HEALTH CHECK ENDPOINT
 # ===================================================================
+def probe_database():
+    """Cheapest query that proves Supabase is reachable"""
+    supabase.table("users_v2").select("id").limit(1).execute()
+
+health_prober.add_check("database", probe_database)
+
 @app.get("/health")
 def health_check():
-    """Check if API and database are healthy"""
-    try:
-        # Test database connection
-        supabase.table("users_v2").select("id").limit(1).execute()
-        return {"status": "healthy", "database": "connected"}
-    except Exception as e:
-        return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
+    """Check if API and database are healthy (answered from the last background probe)"""
+    database = health_prober.dependency_status("database")
+    if database["ok"] and not database["stale"]:
+        return {
+            "status": "healthy",
+            "database": "connected",
+            "checked_at": database["checked_at"],
+            "age_seconds": database["age_seconds"]
+        }
+    return {
+        "status": "unhealthy",
+        "database": "disconnected",
+        "error": "probe result is stale" if database["stale"] else database["error"],
+        "checked_at": database["checked_at"],
+        "age_seconds": database["age_seconds"]
+    }
+
+@app.get("/health/live")
+def liveness_check():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness_check():
+    """Readiness: dependencies are up and caches are warm; 503 tells the balancer to hold traffic"""
+    ready = health_prober.ready()
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "dependencies": {
+            name: health_prober.dependency_status(name) for name in health_prober.checks
+        },
+        "caches": dict(health_prober.warmups)
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint (async so threadpool gauges read the event loop's limiter)"""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
 
 # ===================================================================
 # AUTHENTICATION ENDPOINTS
@@ -427,10 +676,30 @@ def get_user_public_info(user_id: int):
 @app.post("/spots", response_model=ParkingSpotOut, status_code=status.HTTP_201_CREATED)
 def create_parking_spot(
     spot_data: ParkingSpotCreate,
-    current_user: dict = Depends(get_current_user)
+    user_id: int = Depends(get_current_user_id),
+    idempotency_key: Optional[str] = Header(None)
 ):
-    """Create a new parking spot (requires authentication)"""
+    """
+    Create a new parking spot (requires authentication).
+    Retries sent with the same Idempotency-Key get the original response back
+    without any query: the user is only loaded when the request actually runs.
+    """
+    return run_idempotent(
+        idempotency_key,
+        f"{user_id}:POST /spots",
+        spot_data.model_dump(),
+        lambda: add_parking_spot(spot_data, load_user(user_id)),
+        status.HTTP_201_CREATED
+    )
+
+def add_parking_spot(spot_data: ParkingSpotCreate, current_user: dict) -> ParkingSpotOut:
     try:
+        # Canonical weekly hours: merged per day, sorted, with minute columns
+        try:
+            intervals = normalize_intervals(i.model_dump() for i in spot_data.availability_intervals)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
         # Generate UUID for the spot
         spot_id = str(uuid.uuid4())
 
@@ -447,7 +716,9 @@ def create_parking_spot(
             "lng": spot_data.lng,
             "price_per_hour": spot_data.price_per_hour,
             "created_at": datetime.utcnow().isoformat(),
-            "is_active": True
+            "is_active": True,
+            # Same intervals, packed so spot reads can skip availability_intervals_v2
+            "schedule": schedule.encode(intervals)
         }
 
         response = supabase.table("parking_spots_v2").insert(new_spot).execute()
@@ -458,53 +729,83 @@ def create_parking_spot(
         created_spot = response.data[0]
 
         # Insert availability intervals
-        if spot_data.availability_intervals:
-            intervals_to_insert = []
-            for interval in spot_data.availability_intervals:
-                intervals_to_insert.append({
-                    "spot_id": spot_id,
-                    "day": interval.day,
-                    "start_time": interval.start_time,
-                    "end_time": interval.end_time
-                })
-
-            if intervals_to_insert:
-                supabase.table("availability_intervals_v2").insert(intervals_to_insert).execute()
-
-        return ParkingSpotOut(
-            id=created_spot["id"],
-            host_id=created_spot["host_id"],
-            street=created_spot["street"],
-            city=created_spot["city"],
-            province=created_spot["province"],
-            postal_code=created_spot["postal_code"],
-            country=created_spot["country"],
-            lat=created_spot["lat"],
-            lng=created_spot["lng"],
-            price_per_hour=created_spot["price_per_hour"],
-            created_at=created_spot["created_at"],
-            is_active=created_spot["is_active"],
-            availability_intervals=[
-                AvailabilityInterval(
-                    day=i.day,
-                    start_time=i.start_time,
-                    end_time=i.end_time
-                ) for i in spot_data.availability_intervals
-            ] if spot_data.availability_intervals else []
-        )
+        if intervals:
+            intervals_to_insert = [{"spot_id": spot_id, **interval} for interval in intervals]
+            inserted = supabase.table("availability_intervals_v2").insert(intervals_to_insert).execute()
+            spot_catalog.add_intervals(inserted.data or intervals_to_insert)
+
+        spot_catalog.upsert_spot(created_spot)
+        spot_changed(spot_id)
+        return spot_out(created_spot, intervals)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create parking spot: {str(e)}")
 
+def weekly_intervals(spots: List[dict], day: Optional[str] = None) -> Dict[str, List[dict]]:
+    """
+    {spot_id: intervals} (only `day`'s if given), decoded from each spot's
+    schedule column; spots without a readable one are read from the interval
+    table together, in pages.
+    """
+    intervals_by_spot: Dict[str, List[dict]] = {}
+    unpacked = []
+    for spot in spots:
+        intervals = schedule.spot_intervals(spot)
+        if intervals is None:
+            unpacked.append(spot["id"])
+        else:
+            intervals_by_spot[spot["id"]] = [i for i in intervals if day is None or i["day"] == day]
+
+    if unpacked:
+        narrow = (lambda query: query.eq("day", day)) if day is not None else (lambda query: query)
+        for interval in db.fetch_in(supabase, "availability_intervals_v2", "*", "spot_id", unpacked, narrow):
+            intervals_by_spot.setdefault(interval["spot_id"], []).append(interval)
+    return intervals_by_spot
+
+def spot_out(spot: dict, intervals: List[dict]) -> ParkingSpotOut:
+    return ParkingSpotOut(
+        id=spot["id"],
+        host_id=spot["host_id"],
+        street=spot["street"],
+        city=spot["city"],
+        province=spot["province"],
+        postal_code=spot["postal_code"],
+        country=spot["country"],
+        lat=spot["lat"],
+        lng=spot["lng"],
+        price_per_hour=spot["price_per_hour"],
+        created_at=spot["created_at"],
+        is_active=spot["is_active"],
+        availability_intervals=[
+            AvailabilityInterval(
+                day=interval["day"],
+                start_time=interval["start_time"],
+                end_time=interval["end_time"]
+            ) for interval in intervals
+        ]
+    )
+
 @app.get("/spots", response_model=List[ParkingSpotOut])
 def list_parking_spots(
     city: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    is_active: Optional[bool] = True
+    is_active: Optional[bool] = True,
+    sort: Optional[str] = Query(None, pattern="^-?(price_per_hour|created_at)$"),
+    limit: Optional[int] = Query(None, ge=1, le=1000)
 ):
-    """List all parking spots with optional filters"""
+    """
+    List parking spots with optional filters. Results are ordered by price unless
+    sort names a field ("-" prefix for descending). Served from the in-memory
+    catalog once it is loaded, from the database before that.
+    """
+    if spot_catalog.loaded:
+        record_cache("spot_catalog", True)
+        spots = spot_catalog.query(city, min_price, max_price, is_active, sort, limit)
+        return [spot_out(spot, spot_catalog.intervals(spot["id"])) for spot in spots]
+    record_cache("spot_catalog", False)
+
     try:
         query = supabase.table("parking_spots_v2").select("*")
 
@@ -520,136 +821,196 @@ def list_parking_spots(
         if max_price is not None:
             query = query.lte("price_per_hour", max_price)
 
+        sort = sort or "price_per_hour"
+        query = query.order(sort.lstrip("-"), desc=sort.startswith("-"))
+        if limit is not None:
+            query = query.limit(limit)
+
         response = query.execute()
 
         if not response.data:
             return []
 
-        # Get availability intervals for each spot
-        result = []
-        for spot in response.data:
-            intervals_response = supabase.table("availability_intervals_v2")\
-                .select("*")\
-                .eq("spot_id", spot["id"])\
-                .execute()
-
-            availability_intervals = []
-            if intervals_response.data:
-                availability_intervals = [
-                    AvailabilityInterval(
-                        day=interval["day"],
-                        start_time=interval["start_time"],
-                        end_time=interval["end_time"]
-                    ) for interval in intervals_response.data
-                ]
-
-            result.append(ParkingSpotOut(
-                id=spot["id"],
-                host_id=spot["host_id"],
-                street=spot["street"],
-                city=spot["city"],
-                province=spot["province"],
-                postal_code=spot["postal_code"],
-                country=spot["country"],
-                lat=spot["lat"],
-                lng=spot["lng"],
-                price_per_hour=spot["price_per_hour"],
-                created_at=spot["created_at"],
-                is_active=spot["is_active"],
-                availability_intervals=availability_intervals
-            ))
+        # Availability intervals for every listed spot: packed on the row, or one query for the rest
+        intervals_by_spot = weekly_intervals(response.data)
 
-        return result
+        return [spot_out(spot, intervals_by_spot.get(spot["id"], [])) for spot in response.data]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list parking spots: {str(e)}")
 
-@app.get("/spots/{spot_id}", response_model=ParkingSpotOut)
-def get_parking_spot(spot_id: str):
-    """Get a specific parking spot by ID"""
-    try:
-        response = supabase.table("parking_spots_v2").select("*").eq("id", spot_id).execute()
-
-        if not response.data or len(response.data) == 0:
-            raise HTTPException(status_code=404, detail="Parking spot not found")
+# Typeahead over active spots' street, city and postal code; follows the catalog
+address_index = AddressIndex()
+spot_catalog.add_observer(address_index)
 
-        spot = response.data[0]
+class AddressSuggestion(BaseModel):
+    spot_id: str
+    street: str
+    city: str
+    postal_code: str
 
-        # Get availability intervals
-        intervals_response = supabase.table("availability_intervals_v2")\
-            .select("*")\
-            .eq("spot_id", spot_id)\
+@app.get("/spots/autocomplete", response_model=List[AddressSuggestion])
+def autocomplete_addresses(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """Ranked address suggestions for a partial street, city or postal code"""
+    if spot_catalog.loaded:
+        record_cache("address_index", True)
+        return address_index.search(q, limit)
+    record_cache("address_index", False)
+
+    words = tokenize(q)
+    if not words:
+        return []
+    try:
+        # Catalog not loaded yet: narrow with the most selective word, rank the rows in memory
+        pattern = f"%{max(words, key=len)}%"
+        candidates = {}
+        for field in ADDRESS_FIELDS:
+            response = supabase.table("parking_spots_v2")\
+                .select("id, street, city, postal_code, is_active")\
+                .eq("is_active", True)\
+                .ilike(field, pattern)\
+                .limit(200)\
+                .execute()
+            for spot in response.data or []:
+                candidates[spot["id"]] = spot
+        index = AddressIndex()
+        index.rebuild(candidates.values())
+        return index.search(q, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to autocomplete addresses: {str(e)}")
+
+# Grid over active spots' coordinates for ranked nearby search; follows the catalog
+spot_grid = GridIndex()
+spot_catalog.add_observer(spot_grid)
+
+class RankedSpotOut(BaseModel):
+    spot: ParkingSpotOut
+    distance_km: float
+    score: float
+
+@app.get("/spots/ranked", response_model=List[RankedSpotOut])
+def rank_parking_spots(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    date: str = Query(...),
+    start_time: str = Query(...),
+    end_time: str = Query(...),
+    limit: int = Query(10, ge=1, le=50),
+    max_km: float = Query(25.0, gt=0, le=200),
+    price_weight: float = Query(0.5, ge=0)
+):
+    """
+    Best spots free for start_time-end_time on date, lowest score first, where
+    score = distance_km + price_weight * price_per_hour (price_weight is the
+    extra km a driver would go to save 1 per hour).
+    """
+    if not spot_catalog.loaded:
+        raise HTTPException(status_code=503, detail="Spot catalog is loading, retry shortly",
+                            headers={"Retry-After": "5"})
+    try:
+        day_name = datetime.strptime(date, "%Y-%m-%d").strftime("%A")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    try:
+        start_minutes = parse_time_to_minutes(start_time)
+        end_minutes = parse_time_to_minutes(end_time)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if end_minutes <= start_minutes:
+        raise HTTPException(status_code=400, detail="End time must be after start time")
+
+    def score(spot: dict, distance_km: float) -> Optional[float]:
+        # Operating hours come from the catalog, no query needed
+        if not within_hours(spot_catalog.intervals(spot["id"]), day_name, start_minutes, end_minutes):
+            return None
+        return distance_km + price_weight * float(spot["price_per_hour"])
+
+    def free_for_window(spots: List[dict]) -> set:
+        # One bookings query per batch of the most promising candidates
+        ids = [spot["id"] for spot in spots]
+        response = supabase.table("bookings_v2")\
+            .select("spot_id, start_time, end_time")\
+            .in_("spot_id", ids)\
+            .eq("booking_date", date)\
+            .in_("status", ["confirmed", "pending"])\
             .execute()
+        busy = set()
+        for booking in response.data or []:
+            try:
+                if parse_time_to_minutes(booking["start_time"]) < end_minutes \
+                        and start_minutes < parse_time_to_minutes(booking["end_time"]):
+                    busy.add(booking["spot_id"])
+            except ValueError:
+                continue
+        return set(ids) - busy
 
-        availability_intervals = []
-        if intervals_response.data:
-            availability_intervals = [
-                AvailabilityInterval(
-                    day=interval["day"],
-                    start_time=interval["start_time"],
-                    end_time=interval["end_time"]
-                ) for interval in intervals_response.data
-            ]
-
-        return ParkingSpotOut(
-            id=spot["id"],
-            host_id=spot["host_id"],
-            street=spot["street"],
-            city=spot["city"],
-            province=spot["province"],
-            postal_code=spot["postal_code"],
-            country=spot["country"],
-            lat=spot["lat"],
-            lng=spot["lng"],
-            price_per_hour=spot["price_per_hour"],
-            created_at=spot["created_at"],
-            is_active=spot["is_active"],
-            availability_intervals=availability_intervals
+    try:
+        ranked = spot_grid.best(
+            lat, lng, limit, score,
+            min_extra=price_weight * spot_catalog.min_price(),
+            accept=free_for_window,
+            max_km=max_km
         )
-    except HTTPException:
-        raise
+        return [
+            RankedSpotOut(
+                spot=spot_out(spot, spot_catalog.intervals(spot["id"])),
+                distance_km=round(distance_km, 3),
+                score=round(value, 3)
+            ) for value, distance_km, spot in ranked
+        ]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get parking spot: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to rank parking spots: {str(e)}")
 
-# ===================================================================
-# AVAILABILITY CALCULATION HELPERS & ENDPOINT
-# ===================================================================
+def load_parking_spot(spot_id: str) -> ParkingSpotOut:
+    """Spot row plus weekly intervals from the database; 404 if the spot doesn't exist"""
+    response = supabase.table("parking_spots_v2").select("*").eq("id", spot_id).execute()
 
-def parse_time_to_minutes(time_str: str) -> int:
-    """
-    Robust parser that handles '9:00am', '5:00 PM', and '17:00'.
-    Raises ValueError if format is invalid.
-    """
-    if not time_str:
-        raise ValueError("Time string cannot be empty")
+    if not response.data or len(response.data) == 0:
+        raise HTTPException(status_code=404, detail="Parking spot not found")
 
-    # Normalize string: remove spaces, lowercase
-    clean_str = time_str.lower().replace(" ", "")
+    spot = response.data[0]
+    return spot_out(spot, weekly_intervals([spot]).get(spot_id, []))
+
+@app.get("/spots/{spot_id}", response_model=ParkingSpotOut)
+def get_parking_spot(
+    spot_id: str,
+    http_response: Response,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Get a specific parking spot by ID (supports If-None-Match)"""
+    versioned = change_feed.sees_all_writes()
+    if versioned:
+        etag = data_versions.spot_etag(spot_id)
+        if etag_matches(if_none_match, etag):
+            record_cache("etag_spot", True)
+            return not_modified(etag)
+    record_cache("etag_spot", False)
 
     try:
-        # Try 12-hour format with am/pm (e.g., "9:00am")
-        if "am" in clean_str or "pm" in clean_str:
-            time_obj = datetime.strptime(clean_str, "%I:%M%p")
-        # Try 24-hour format (e.g., "17:00")
+        if shared_cache is not None:
+            # Shared with the other workers on this host; invalidated by spot_changed()
+            payload = shared_cache.get_or_compute(f"spot:{spot_id}", (f"spot:{spot_id}",),
+                                                  lambda: load_parking_spot(spot_id).model_dump())
+            result = ParkingSpotOut(**payload)
         else:
-            time_obj = datetime.strptime(clean_str, "%H:%M")
-
-        return time_obj.hour * 60 + time_obj.minute
-    except ValueError:
-        raise ValueError(f"Invalid time format: {time_str}")
-
-def minutes_to_time_str(minutes: int) -> str:
-    """
-    Converts minutes back to clean 12-hour format for frontend display
-    e.g., 900 -> "3:00 PM"
-    """
-    hours = minutes // 60
-    mins = minutes % 60
+            result = load_parking_spot(spot_id)
+        if not versioned:
+            etag = content_etag(result.model_dump())
+        # The spot exists now, so If-None-Match: * may match too
+        if etag_matches(if_none_match, etag, exists=True):
+            return not_modified(etag)
+        set_etag(http_response, etag)
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get parking spot: {str(e)}")
 
-    # Python's datetime can handle the formatting for us
-    # Create a dummy date with this time
-    dummy_time = datetime.now().replace(hour=hours, minute=mins)
-    # Return in 12h format (change to %H:%M for 24h)
-    return dummy_time.strftime("%I:%M %p").lstrip("0")
+# ===================================================================
+# AVAILABILITY CALCULATION HELPERS & ENDPOINT
+# ===================================================================
 
 class AvailableSlot(BaseModel):
     start_time: str
@@ -661,131 +1022,346 @@ class AvailabilityForDateOut(BaseModel):
     available_slots: List[AvailableSlot]
     operating_hours: List[AvailableSlot]
 
-@app.get("/spots/{spot_id}/availability/{date}", response_model=AvailabilityForDateOut)
-def get_available_slots_for_date(spot_id: str, date: str):
+def compute_availability(spot_id: str, date: str) -> AvailabilityForDateOut:
+    """
+    Availability for one spot and date, through the shared cache when enabled.
+    Raises HTTPException for an unknown spot or a malformed date (never cached).
+    """
+    if shared_cache is None:
+        return calculate_availability(spot_id, date)
+    payload = shared_cache.get_or_compute(
+        f"availability:{spot_id}:{date}",
+        (f"spot:{spot_id}", f"avail:{spot_id}:{date}"),
+        lambda: calculate_availability(spot_id, date).model_dump()
+    )
+    return AvailabilityForDateOut(**payload)
+
+def calculate_availability(spot_id: str, date: str) -> AvailabilityForDateOut:
     """
-    Get available time slots for a specific parking spot on a specific date.
     Calculates availability dynamically by subtracting booked slots from base hours.
+    Raises HTTPException for an unknown spot or a malformed date.
     """
+    # 1. Verify Spot Exists (in local replica mode, from the in-memory catalog; a spot
+    # it hasn't seen yet, e.g. created on another worker, is read from the database)
+    spot = spot_catalog.get(spot_id) if booking_replica.enabled else None
+    local = spot is not None
+    if local:
+        spot_rows = [spot]
+    else:
+        spot_rows = supabase.table("parking_spots_v2").select("*").eq("id", spot_id).execute().data
+    if not spot_rows:
+        raise HTTPException(status_code=404, detail="Parking spot not found")
+
+    # 2. Determine Day of Week (e.g., "Monday")
     try:
-        # 1. Verify Spot Exists
-        spot_response = supabase.table("parking_spots_v2").select("id").eq("id", spot_id).execute()
-        if not spot_response.data:
-            raise HTTPException(status_code=404, detail="Parking spot not found")
-
-        # 2. Determine Day of Week (e.g., "Monday")
-        try:
-            date_obj = datetime.strptime(date, "%Y-%m-%d")
-            day_name = date_obj.strftime("%A")
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+        date_obj = datetime.strptime(date, "%Y-%m-%d")
+        day_name = date_obj.strftime("%A")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
-        # 3. Get Base Availability (The "Supply")
-        # Handles cases where a host might have split hours (e.g. 9-12 AND 2-5 on Mondays)
-        intervals_response = supabase.table("availability_intervals_v2")\
-            .select("*")\
-            .eq("spot_id", spot_id)\
-            .eq("day", day_name)\
-            .execute()
+    # 3. Get Base Availability (The "Supply")
+    # Handles cases where a host might have split hours (e.g. 9-12 AND 2-5 on Mondays)
+    if local:
+        intervals = [i for i in spot_catalog.intervals(spot_id) if i["day"] == day_name]
+    else:
+        intervals = weekly_intervals(spot_rows, day_name).get(spot_id, [])
 
-        if not intervals_response.data:
-            return AvailabilityForDateOut(date=date, day=day_name, available_slots=[])
+    if not intervals:
+        return AvailabilityForDateOut(date=date, day=day_name, available_slots=[], operating_hours=[])
 
-        # 4. Get Existing Bookings (The "Demand")
+    # 4. Get Existing Bookings (The "Demand"), locally when the replica is current
+    bookings = booking_replica.bookings(spot_id, date)
+    if bookings is None:
         bookings_response = supabase.table("bookings_v2")\
             .select("*")\
             .eq("spot_id", spot_id)\
             .eq("booking_date", date)\
             .in_("status", ["confirmed", "pending"])\
             .execute()
-
         bookings = bookings_response.data if bookings_response.data else []
+    return availability_from_rows(date, day_name, intervals, bookings)
+
+def availability_from_rows(date: str, day_name: str, intervals: List[dict], bookings: List[dict]) -> AvailabilityForDateOut:
+    """Free slots for one spot and date from that weekday's intervals and the date's active bookings"""
+    # 5. Calculate Operating Hours (Base Intervals)
+    operating_hours = []
+    for base_interval in intervals:
+        operating_hours.append(AvailableSlot(
+            start_time=base_interval["start_time"],
+            end_time=base_interval["end_time"]
+        ))
+
+    # 6. The Subtraction Logic
+    base_intervals = []
+    for base_interval in intervals:
+        try:
+            base_intervals.append(row_minutes(base_interval))
+        except ValueError as e:
+            print(f"Skipping invalid base interval: {e}")
 
-        # 5. Calculate Operating Hours (Base Intervals)
-        operating_hours = []
-        for base_interval in intervals_response.data:
-            operating_hours.append(AvailableSlot(
-                start_time=base_interval["start_time"],
-                end_time=base_interval["end_time"]
-            ))
+    # Parse each booking once, not once per base interval
+    booked_ranges = []
+    for b in bookings:
+        try:
+            booked_ranges.append(row_minutes(b))
+        except ValueError:
+            print(f"Skipping invalid booking time: {b['start_time']} - {b['end_time']}")
+
+    all_available_slots = [
+        AvailableSlot(
+            start_time=minutes_to_time_str(free_start),
+            end_time=minutes_to_time_str(free_end)
+        ) for free_start, free_end in subtract_bookings(base_intervals, booked_ranges)
+    ]
+
+    return AvailabilityForDateOut(
+        date=date,
+        day=day_name,
+        available_slots=all_available_slots,
+        operating_hours=operating_hours
+    )
 
-        # 6. The Subtraction Logic
-        all_available_slots = []
+@app.get("/spots/{spot_id}/availability/{date}", response_model=AvailabilityForDateOut)
+def get_available_slots_for_date(
+    spot_id: str,
+    date: str,
+    http_response: Response,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Get available time slots for a specific parking spot on a specific date.
+    Polling clients should send If-None-Match; unchanged availability is a 304 with no queries.
+    """
+    versioned = change_feed.sees_all_writes()
+    if versioned:
+        etag = data_versions.availability_etag(spot_id, date)
+        if etag_matches(if_none_match, etag):
+            record_cache("etag_availability", True)
+            return not_modified(etag)
+    record_cache("etag_availability", False)
 
-        # We iterate over every "Base Interval" the host has set
-        for base_interval in intervals_response.data:
-            try:
-                base_start = parse_time_to_minutes(base_interval["start_time"])
-                base_end = parse_time_to_minutes(base_interval["end_time"])
-            except ValueError as e:
-                print(f"Skipping invalid base interval: {e}")
-                continue
+    try:
+        result = compute_availability(spot_id, date)
+        if not versioned:
+            etag = content_etag(result.model_dump())
+        if etag_matches(if_none_match, etag, exists=True):
+            return not_modified(etag)
+        set_etag(http_response, etag)
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Server Error: {str(e)}") # Good for debugging
+        raise HTTPException(status_code=500, detail=f"Internal server error processing availability: {str(e)}")
 
-            # Sort bookings to process them sequentially
-            # We parse booking times safely inside the loop or pre-process them
-            valid_bookings = []
-            for b in bookings:
-                try:
-                    b_start = parse_time_to_minutes(b["start_time"])
-                    valid_bookings.append({**b, "_start_mins": b_start})
-                except ValueError:
-                    print(f"Skipping invalid booking time: {b['start_time']}")
-                    continue
-
-            sorted_bookings = sorted(valid_bookings, key=lambda x: x["_start_mins"])
-
-            current_cursor = base_start
-
-            for booking in sorted_bookings:
-                try:
-                    book_start = booking["_start_mins"]
-                    book_end = parse_time_to_minutes(booking["end_time"])
-                except ValueError:
-                    continue
-
-                # Skip if booking doesn't overlap current check area
-                # (e.g. Booking is 8-9, Base is 9-5) OR (Booking is 6-7, Base is 9-5)
-                if book_end <= current_cursor or book_start >= base_end:
-                    continue
-
-                # If there is a gap between cursor and booking start, that is a free slot
-                # Logic: max(current_cursor, base_start) handles bookings starting before window
-                effective_start = max(current_cursor, base_start)
-                effective_book_start = max(book_start, base_start) # Clamp booking to window start
-
-                if effective_start < effective_book_start:
-                    all_available_slots.append(AvailableSlot(
-                        start_time=minutes_to_time_str(effective_start),
-                        # FIX: Use effective_book_start to ensure we don't return a time before the window
-                        end_time=minutes_to_time_str(effective_book_start)
-                    ))
+def compute_availability_payload(spot_id: str, date: str) -> dict:
+    return compute_availability(spot_id, date).model_dump()
+
+# Pushes availability deltas to SSE subscribers when bookings change
+availability_hub = AvailabilityHub(compute_availability_payload)
+
+def booking_row_changed(event: str, record: Optional[dict], old_record: Optional[dict]) -> None:
+    """Change feed listener: a bookings_v2 row was written, possibly by another worker"""
+    row = record or old_record or {}
+    if event == "DELETE":
+        booking_replica.remove(row.get("id"))
+    elif record:
+        booking_replica.apply(record)
+    if row.get("spot_id") and row.get("booking_date"):
+        availability_changed(row["spot_id"], row["booking_date"])
+
+def spot_row_changed(event: str, record: Optional[dict], old_record: Optional[dict]) -> None:
+    """Change feed listener for parking_spots_v2"""
+    if event == "DELETE":
+        if old_record and old_record.get("id"):
+            spot_catalog.remove_spot(old_record["id"])
+            spot_changed(old_record["id"])
+    elif record:
+        spot_catalog.upsert_spot(record)
+        spot_changed(record["id"])
+
+def interval_row_changed(event: str, record: Optional[dict], old_record: Optional[dict]) -> None:
+    """Change feed listener for availability_intervals_v2"""
+    if event == "DELETE":
+        spot_id = spot_catalog.remove_interval(old_record or {})
+        if spot_id:
+            spot_changed(spot_id)
+    elif record:
+        spot_catalog.add_intervals([record])
+        spot_changed(record["spot_id"])
+
+change_feed.add_listener("bookings_v2", booking_row_changed)
+change_feed.add_listener("parking_spots_v2", spot_row_changed)
+change_feed.add_listener("availability_intervals_v2", interval_row_changed)
+
+@app.get("/spots/{spot_id}/availability/{date}/stream")
+async def stream_availability(spot_id: str, date: str):
+    """
+    Server-sent events for one spot and date: a snapshot event first, then an
+    availability event (full slots plus added/removed) whenever a booking changes them.
+    """
+    if not change_feed.sees_all_writes():
+        # Without the realtime feed, other workers' bookings would never reach this stream
+        raise HTTPException(
+            status_code=503,
+            detail="Availability streaming needs REALTIME_CHANGE_FEED=1 when running several workers"
+        )
+
+    key = (spot_id, date)
+    queue = availability_hub.subscribe(key)
+    try:
+        snapshot = await run_in_threadpool(compute_availability_payload, spot_id, date)
+    except BaseException:
+        availability_hub.unsubscribe(key, queue)
+        raise
+    return StreamingResponse(
+        availability_hub.stream(key, queue, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-                # Move cursor to end of this booking
-                current_cursor = max(current_cursor, book_end)
+def spots_with_intervals(spot_ids: List[str]):
+    """
+    ({spot_id: spot}, {spot_id: [intervals]}) for the ids that exist: from the
+    catalog when it is loaded, and from the database (see weekly_intervals) for
+    the ids it doesn't hold, e.g. spots created on another worker since the
+    last reload.
+    """
+    spots: Dict[str, dict] = {}
+    intervals: Dict[str, List[dict]] = {}
+    missing = set(spot_ids)
+    if spot_catalog.loaded:
+        for spot_id in missing:
+            spot = spot_catalog.get(spot_id)
+            if spot is not None:
+                spots[spot_id] = spot
+                intervals[spot_id] = spot_catalog.intervals(spot_id)
+        missing -= set(spots)
+
+    if missing:
+        fetched = supabase.table("parking_spots_v2").select("*").in_("id", sorted(missing)).execute().data or []
+        spots.update((spot["id"], spot) for spot in fetched)
+        intervals.update(weekly_intervals(fetched))
+    return spots, intervals
 
-                # Optimization: If cursor passed the window end, stop checking this interval
-                if current_cursor >= base_end:
-                    break
+# ===================================================================
+# BATCH AVAILABILITY
+# ===================================================================
+
+# spot_ids x dates per POST /availability/batch
+AVAILABILITY_BATCH_LIMIT = 500
+
+class AvailabilityBatchRequest(BaseModel):
+    spot_ids: List[str]
+    dates: List[str]
+
+class SpotAvailabilityOut(BaseModel):
+    spot_id: str
+    date: str
+    availability: Optional[AvailabilityForDateOut] = None
+    # Set instead of availability for an unknown spot or a malformed date
+    error: Optional[str] = None
 
-            # If there is still time left after the last booking
-            if current_cursor < base_end:
-                all_available_slots.append(AvailableSlot(
-                    start_time=minutes_to_time_str(current_cursor),
-                    end_time=minutes_to_time_str(base_end)
-                ))
-
-        return AvailabilityForDateOut(
-            date=date,
-            day=day_name,
-            available_slots=all_available_slots,
-            operating_hours=operating_hours
+@app.post("/availability/batch", response_model=List[SpotAvailabilityOut])
+def get_availability_batch(request: AvailabilityBatchRequest):
+    """
+    Available slots for every spot_id on every date (spot by spot, dates in the
+    given order, duplicates dropped), at most AVAILABILITY_BATCH_LIMIT pairs. Schedules and bookings
+    for the whole batch are loaded with a few in_ queries rather than three per pair.
+    """
+    spot_ids = list(dict.fromkeys(request.spot_ids))
+    dates = list(dict.fromkeys(request.dates))
+    if len(spot_ids) * len(dates) > AVAILABILITY_BATCH_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {AVAILABILITY_BATCH_LIMIT} spot/date pairs per batch"
         )
+    if not spot_ids or not dates:
+        return []
+
+    day_names = {}
+    for date in dates:
+        try:
+            day_names[date] = datetime.strptime(date, "%Y-%m-%d").strftime("%A")
+        except ValueError:
+            day_names[date] = None
+    valid_dates = [date for date in dates if day_names[date]]
 
+    try:
+        spots, intervals = spots_with_intervals(spot_ids)
+        bookings = booking_replica.bookings_for(spots, valid_dates) if spots and valid_dates else {}
+        if bookings is None:
+            bookings = {}
+            rows = db.fetch_all(
+                supabase, "bookings_v2", "id, spot_id, booking_date, start_time, end_time, start_minute, end_minute",
+                lambda query: query.in_("spot_id", list(spots))
+                    .in_("booking_date", valid_dates)
+                    .in_("status", ["confirmed", "pending"])
+            )
+            for booking in rows:
+                bookings.setdefault((booking["spot_id"], booking["booking_date"]), []).append(booking)
+
+        results = []
+        for spot_id in spot_ids:
+            for date in dates:
+                if spot_id not in spots:
+                    results.append(SpotAvailabilityOut(spot_id=spot_id, date=date, error="Parking spot not found"))
+                elif day_names[date] is None:
+                    results.append(SpotAvailabilityOut(
+                        spot_id=spot_id, date=date, error="Invalid date format. Use YYYY-MM-DD"
+                    ))
+                else:
+                    day_intervals = [i for i in intervals.get(spot_id, []) if i["day"] == day_names[date]]
+                    results.append(SpotAvailabilityOut(
+                        spot_id=spot_id,
+                        date=date,
+                        availability=availability_from_rows(
+                            date, day_names[date], day_intervals, bookings.get((spot_id, date), [])
+                        )
+                    ))
+        return results
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Server Error: {str(e)}") # Good for debugging
-        raise HTTPException(status_code=500, detail=f"Internal server error processing availability: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to load availability: {str(e)}")
+
+# ===================================================================
+# QUOTES
+# ===================================================================
+
+class QuoteItem(BaseModel):
+    spot_id: str
+    booking_date: str
+    start_time: str
+    end_time: str
+
+class QuoteBatchRequest(BaseModel):
+    items: List[QuoteItem]
+
+class QuoteOut(QuoteItem):
+    duration_hours: Optional[float] = None
+    price_per_hour: Optional[float] = None
+    total_price: Optional[float] = None
+    # Set instead of the price when the item can't be booked as asked
+    error: Optional[str] = None
+
+@app.post("/quotes/batch", response_model=List[QuoteOut])
+def quote_batch(request: QuoteBatchRequest):
+    """
+    Prices for up to QUOTE_BATCH_LIMIT (spot, date, start, end) items, computed
+    exactly as create_booking would charge, with a per-item error instead of a
+    price when the spot is missing or inactive or the window is outside its hours.
+    """
+    if len(request.items) > quotes.MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {quotes.MAX_BATCH} items per batch")
+    try:
+        items = [item.model_dump() for item in request.items]
+        spots, intervals = spots_with_intervals([item["spot_id"] for item in items])
+        return quotes.quote_batch(items, spots, intervals)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to quote: {str(e)}")
 
 # ===================================================================
 # BOOKINGS ENDPOINTS
@@ -794,9 +1370,43 @@ def get_available_slots_for_date(spot_id: str, date: str):
 @app.post("/bookings", response_model=BookingOut, status_code=status.HTTP_201_CREATED)
 def create_booking(
     booking_data: BookingCreate,
-    current_user: dict = Depends(get_current_user)
+    user_id: int = Depends(get_current_user_id),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """
+    Create a new booking (requires authentication).
+    Retries sent with the same Idempotency-Key get the original response back
+    without any query: the user is only loaded when the request actually runs.
+    """
+    return run_idempotent(
+        idempotency_key,
+        f"{user_id}:POST /bookings",
+        booking_data.model_dump(),
+        lambda: book_spot(booking_data, load_user(user_id)),
+        status.HTTP_201_CREATED
+    )
+
+@app.post("/bookings/holds", response_model=BookingOut, status_code=status.HTTP_201_CREATED)
+def create_booking_hold(
+    booking_data: BookingCreate,
+    user_id: int = Depends(get_current_user_id),
+    idempotency_key: Optional[str] = Header(None)
 ):
-    """Create a new booking (requires authentication)"""
+    """
+    Hold a slot for HOLD_TTL_SECONDS (requires authentication). The pending
+    booking blocks the slot until it is confirmed with POST /bookings/{id}/confirm
+    or expires; accepts Idempotency-Key like POST /bookings.
+    """
+    return run_idempotent(
+        idempotency_key,
+        f"{user_id}:POST /bookings/holds",
+        booking_data.model_dump(),
+        lambda: book_spot(booking_data, load_user(user_id), hold_seconds=HOLD_TTL_SECONDS),
+        status.HTTP_201_CREATED
+    )
+
+def book_spot(booking_data: BookingCreate, current_user: dict, hold_seconds: Optional[int] = None) -> BookingOut:
+    """Validate and insert a booking: confirmed, or a pending hold expiring after hold_seconds"""
     try:
         # Verify the parking spot exists
         spot_response = supabase.table("parking_spots_v2").select("*").eq("id", booking_data.spot_id).execute()
@@ -820,7 +1430,7 @@ def create_booking(
             if duration_hours <= 0:
                 raise HTTPException(status_code=400, detail="End time must be after start time")
 
-            total_price = duration_hours * spot["price_per_hour"]
+            total_price = booking_price(spot["price_per_hour"], start_minutes, end_minutes)
 
             # Convert back to datetime for later comparisons
             start_dt = dt.now().replace(hour=start_minutes // 60, minute=start_minutes % 60)
@@ -833,13 +1443,9 @@ def create_booking(
         day_name = booking_date_obj.strftime("%A")
 
         # Check if the booking time falls within the spot's recurring availability for that day
-        intervals_response = supabase.table("availability_intervals_v2")\
-            .select("*")\
-            .eq("spot_id", booking_data.spot_id)\
-            .eq("day", day_name)\
-            .execute()
+        day_intervals = weekly_intervals([spot], day_name).get(spot["id"], [])
 
-        if not intervals_response.data or len(intervals_response.data) == 0:
+        if not day_intervals:
             raise HTTPException(
                 status_code=400,
                 detail=f"This parking spot is not available on {day_name}s"
@@ -847,10 +1453,9 @@ def create_booking(
 
         # Check if requested time falls within any of the available intervals for this day
         time_is_within_availability = False
-        for interval in intervals_response.data:
+        for interval in day_intervals:
             try:
-                interval_start_mins = parse_time_to_minutes(interval["start_time"])
-                interval_end_mins = parse_time_to_minutes(interval["end_time"])
+                interval_start_mins, interval_end_mins = row_minutes(interval)
 
                 # Check if booking is completely within this availability interval
                 if start_minutes >= interval_start_mins and end_minutes <= interval_end_mins:
@@ -865,51 +1470,61 @@ def create_booking(
                 detail=f"Requested time is outside the spot's available hours for {day_name}s"
             )
 
-        # Check for conflicting bookings
-        existing_bookings = supabase.table("bookings_v2")\
-            .select("*")\
-            .eq("spot_id", booking_data.spot_id)\
-            .eq("booking_date", booking_data.booking_date)\
-            .in_("status", ["confirmed", "pending"])\
-            .execute()
-
-        if existing_bookings.data:
-            for existing in existing_bookings.data:
-                try:
-                    existing_start_mins = parse_time_to_minutes(existing["start_time"])
-                    existing_end_mins = parse_time_to_minutes(existing["end_time"])
-
-                    # Check for time overlap
-                    if not (end_minutes <= existing_start_mins or start_minutes >= existing_end_mins):
-                        raise HTTPException(
-                            status_code=400,
-                            detail="This time slot is already booked"
-                        )
-                except ValueError:
-                    continue
-
-        # Generate UUID for the booking
-        booking_id = str(uuid.uuid4())
-
-        # Create booking
-        new_booking = {
-            "id": booking_id,
-            "spot_id": booking_data.spot_id,
-            "user_id": current_user["id"],
-            "booking_date": booking_data.booking_date,
-            "start_time": booking_data.start_time,
-            "end_time": booking_data.end_time,
-            "total_price": total_price,
-            "status": "confirmed",
-            "created_at": datetime.utcnow().isoformat()
-        }
+        # Concurrent attempts for this spot in this worker run the check and insert one at a time
+        with booking_locks.hold(booking_data.spot_id):
+            # Check for conflicting bookings: any active booking that starts before this one
+            # ends and ends after it starts. The database answers with at most one row.
+            conflict = supabase.table("bookings_v2")\
+                .select("id")\
+                .eq("spot_id", booking_data.spot_id)\
+                .eq("booking_date", booking_data.booking_date)\
+                .in_("status", ["confirmed", "pending"])\
+                .lt("start_minute", end_minutes)\
+                .gt("end_minute", start_minutes)\
+                .limit(1)\
+                .execute()
 
-        response = supabase.table("bookings_v2").insert(new_booking).execute()
+            if conflict.data:
+                raise HTTPException(
+                    status_code=400,
+                    detail="This time slot is already booked"
+                )
+
+            # Generate UUID for the booking
+            booking_id = str(uuid.uuid4())
+
+            # Create booking
+            created_at = datetime.utcnow()
+            new_booking = {
+                "id": booking_id,
+                "spot_id": booking_data.spot_id,
+                "user_id": current_user["id"],
+                "booking_date": booking_data.booking_date,
+                "start_time": booking_data.start_time,
+                "end_time": booking_data.end_time,
+                "start_minute": start_minutes,
+                "end_minute": end_minutes,
+                "total_price": total_price,
+                "status": "confirmed",
+                "created_at": created_at.isoformat()
+            }
+            if hold_seconds is not None:
+                new_booking["status"] = "pending"
+                new_booking["expires_at"] = holds.expires_at(created_at, hold_seconds)
+
+            response = supabase.table("bookings_v2").insert(new_booking).execute()
 
         if not response.data or len(response.data) == 0:
             raise HTTPException(status_code=500, detail="Failed to create booking")
 
         created_booking = response.data[0]
+        if hold_seconds is not None:
+            # One tick late rather than early: the conditional update only expires past holds
+            schedule_hold_expiry(booking_id, hold_seconds + hold_timers.tick)
+            HOLDS.inc("held")
+        booking_replica.apply(created_booking)
+        availability_changed(booking_data.spot_id, booking_data.booking_date)
+        booking_stats_changed(created_booking, spot["host_id"], 1)
 
         return BookingOut(
             id=created_booking["id"],
@@ -920,10 +1535,18 @@ def create_booking(
             end_time=created_booking["end_time"],
             total_price=created_booking["total_price"],
             status=created_booking["status"],
-            created_at=created_booking["created_at"]
+            created_at=created_booking["created_at"],
+            expires_at=created_booking.get("expires_at")
         )
     except HTTPException:
         raise
+    except LockTimeout:
+        # Earlier attempts for this spot are stuck on a slow database; don't queue more threads
+        raise HTTPException(
+            status_code=503,
+            detail="Too many simultaneous bookings for this spot, try again",
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create booking: {str(e)}")
 
@@ -957,7 +1580,8 @@ def list_user_bookings(
                 end_time=booking["end_time"],
                 total_price=booking["total_price"],
                 status=booking["status"],
-                created_at=booking["created_at"]
+                created_at=booking["created_at"],
+                expires_at=booking.get("expires_at")
             ) for booking in response.data
         ]
     except Exception as e:
@@ -990,7 +1614,8 @@ def get_booking(
             end_time=booking["end_time"],
             total_price=booking["total_price"],
             status=booking["status"],
-            created_at=booking["created_at"]
+            created_at=booking["created_at"],
+            expires_at=booking.get("expires_at")
         )
     except HTTPException:
         raise
@@ -1004,30 +1629,31 @@ def cancel_booking(
 ):
     """Cancel a booking (must be owned by current user)"""
     try:
-        # Get the booking first
-        response = supabase.table("bookings_v2").select("*").eq("id", booking_id).execute()
-
-        if not response.data or len(response.data) == 0:
-            raise HTTPException(status_code=404, detail="Booking not found")
-
-        booking = response.data[0]
-
-        # Verify the booking belongs to the current user
-        if booking["user_id"] != current_user["id"]:
-            raise HTTPException(status_code=403, detail="You don't have permission to cancel this booking")
-
-        # Check if booking is already cancelled
-        if booking["status"] == "cancelled":
-            raise HTTPException(status_code=400, detail="Booking is already cancelled")
-
-        # Update booking status to cancelled
+        # One conditional update: only the owner's booking, only while it is active
+        # (an expired hold has already released its slot and its stats)
         update_response = supabase.table("bookings_v2")\
             .update({"status": "cancelled"})\
             .eq("id", booking_id)\
+            .eq("user_id", current_user["id"])\
+            .in_("status", ["confirmed", "pending"])\
             .execute()
 
-        if not update_response.data or len(update_response.data) == 0:
-            raise HTTPException(status_code=500, detail="Failed to cancel booking")
+        if not update_response.data:
+            # Nothing changed; a second read only on this failure path says why
+            response = supabase.table("bookings_v2").select("user_id, status").eq("id", booking_id).execute()
+            if not response.data:
+                raise HTTPException(status_code=404, detail="Booking not found")
+            if response.data[0]["user_id"] != current_user["id"]:
+                raise HTTPException(status_code=403, detail="You don't have permission to cancel this booking")
+            if response.data[0]["status"] == "expired":
+                raise HTTPException(status_code=400, detail="Booking hold has expired")
+            raise HTTPException(status_code=400, detail="Booking is already cancelled")
+
+        booking = update_response.data[0]
+        hold_timers.cancel(booking_id)
+        booking_replica.apply(booking)
+        availability_changed(booking["spot_id"], booking["booking_date"])
+        booking_stats_changed(booking, None, -1)
 
         return {
             "success": True,
@@ -1039,3 +1665,202 @@ def cancel_booking(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to cancel booking: {str(e)}")
 
+@app.post("/bookings/{booking_id}/confirm", response_model=BookingOut)
+def confirm_booking_hold(
+    booking_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Confirm a hold made with POST /bookings/holds before it expires"""
+    try:
+        # One conditional update: only the owner's hold, only while it is pending and unexpired
+        update_response = supabase.table("bookings_v2")\
+            .update({"status": "confirmed", "expires_at": None})\
+            .eq("id", booking_id)\
+            .eq("user_id", current_user["id"])\
+            .eq("status", "pending")\
+            .gt("expires_at", datetime.utcnow().isoformat())\
+            .execute()
+
+        if not update_response.data:
+            response = supabase.table("bookings_v2").select("user_id, status").eq("id", booking_id).execute()
+            if not response.data:
+                raise HTTPException(status_code=404, detail="Booking not found")
+            if response.data[0]["user_id"] != current_user["id"]:
+                raise HTTPException(status_code=403, detail="You don't have permission to confirm this booking")
+            if response.data[0]["status"] == "confirmed":
+                raise HTTPException(status_code=400, detail="Booking is already confirmed")
+            raise HTTPException(status_code=409, detail="Hold has expired")
+
+        booking = update_response.data[0]
+        hold_timers.cancel(booking_id)
+        HOLDS.inc("confirmed")
+        booking_replica.apply(booking)
+
+        return BookingOut(
+            id=booking["id"],
+            spot_id=booking["spot_id"],
+            user_id=booking["user_id"],
+            booking_date=booking["booking_date"],
+            start_time=booking["start_time"],
+            end_time=booking["end_time"],
+            total_price=booking["total_price"],
+            status=booking["status"],
+            created_at=booking["created_at"]
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to confirm booking: {str(e)}")
+
+def expire_hold(booking_id: str) -> None:
+    """Hold timer callback: release the slot unless the hold was confirmed or cancelled meanwhile"""
+    try:
+        response = supabase.table("bookings_v2")\
+            .update({"status": "expired"})\
+            .eq("id", booking_id)\
+            .eq("status", "pending")\
+            .lte("expires_at", datetime.utcnow().isoformat())\
+            .execute()
+        for booking in response.data or []:
+            HOLDS.inc("expired")
+            booking_replica.apply(booking)
+            availability_changed(booking["spot_id"], booking["booking_date"])
+            booking_stats_changed(booking, None, -1)
+    except Exception as e:
+        print(f"Failed to expire hold {booking_id}: {e}")
+
+def schedule_hold_expiry(booking_id: str, delay: float) -> None:
+    hold_timers.schedule(booking_id, delay, lambda: expire_hold(booking_id))
+
+def schedule_pending_holds() -> int:
+    """Start expiry timers for the holds pending in the database; returns how many"""
+    now = datetime.utcnow()
+    pending = db.fetch_all(
+        supabase, "bookings_v2", "id, expires_at",
+        lambda query: query.eq("status", "pending").gt("expires_at", "1970-01-01")
+    )
+    for booking in pending:
+        schedule_hold_expiry(booking["id"], max(0.0, holds.seconds_left(booking["expires_at"], now)) + hold_timers.tick)
+    return len(pending)
+
+# ===================================================================
+# HOST DASHBOARD
+# ===================================================================
+
+class HostWeekStats(BaseModel):
+    week_start: str
+    booked_minutes: int
+    available_minutes: int
+    occupancy: float
+    revenue: float
+    bookings: int
+
+class HostSpotStats(BaseModel):
+    spot_id: str
+    street: str
+    city: str
+    booked_minutes: int
+    available_minutes: int
+    occupancy: float
+    revenue: float
+    bookings: int
+    weeks: List[HostWeekStats]
+
+class HostDashboardOut(BaseModel):
+    start: str
+    end: str
+    booked_minutes: int
+    available_minutes: int
+    occupancy: float
+    revenue: float
+    bookings: int
+    spots: List[HostSpotStats]
+
+@app.get("/host/dashboard", response_model=HostDashboardOut)
+def host_dashboard(
+    weeks: int = Query(8, ge=1, le=52),
+    start: Optional[str] = Query(None, description="First week (YYYY-MM-DD, any day of it); default: weeks - 1 weeks before this one"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Revenue, bookings and occupancy per spot per week for the current user's spots,
+    read from the per-day aggregates rather than from individual bookings.
+    """
+    try:
+        from datetime import date as date_cls
+        try:
+            first_day = date_cls.fromisoformat(start) if start else date_cls.today() - timedelta(weeks=weeks - 1)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="start must be a date (YYYY-MM-DD)")
+        first_week = host_stats.week_start(first_day)
+        end = first_week + timedelta(weeks=weeks)
+
+        spots = supabase.table("parking_spots_v2")\
+            .select("*")\
+            .eq("host_id", current_user["id"])\
+            .execute().data or []
+        intervals = weekly_intervals(spots)
+        rows = []
+        if spots:
+            # One row per spot and day, so a long range for a busy host spans several pages
+            rows = db.fetch_keyset(
+                supabase, host_stats.TABLE, "spot_id, day, booked_minutes, revenue, booking_count",
+                ("spot_id", "day"),
+                lambda query: query.eq("host_id", current_user["id"])
+                    .gte("day", first_week.isoformat())
+                    .lt("day", end.isoformat())
+            )
+
+        return host_stats.dashboard(spots, intervals, rows, first_week, weeks)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to build host dashboard: {str(e)}")
+
+class HostHeatmapOut(BaseModel):
+    start: str
+    end: str
+    bin_minutes: int
+    # spot_id -> 7 rows (Monday first) of the fraction of each time bin that was booked
+    heatmaps: Dict[str, List[List[float]]]
+
+@app.get("/host/heatmap", response_model=HostHeatmapOut)
+def host_heatmap(
+    weeks: int = Query(8, ge=1, le=104),
+    end: Optional[str] = Query(None, description="Last day to include (YYYY-MM-DD); default today"),
+    bin_minutes: int = Query(60, description="60 for a 7x24 grid, 15 for 7x96"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Occupancy by weekday and time of day over the last `weeks` weeks for each
+    of the current user's spots.
+    """
+    # NumPy is only needed here; keep it out of the import path of every worker
+    import heatmap
+    from datetime import date as date_cls
+
+    if bin_minutes not in heatmap.RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"bin_minutes must be one of {list(heatmap.RESOLUTIONS)}")
+    try:
+        last = date_cls.fromisoformat(end) if end else date_cls.today()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="end must be a date (YYYY-MM-DD)")
+    first = last - timedelta(weeks=weeks) + timedelta(days=1)
+
+    try:
+        spots = supabase.table("parking_spots_v2")\
+            .select("id")\
+            .eq("host_id", current_user["id"])\
+            .execute().data or []
+        spot_ids = sorted(spot["id"] for spot in spots)
+        bookings = heatmap.load_bookings(supabase, first, last, spot_ids) if spot_ids else []
+        return {
+            "start": first.isoformat(),
+            "end": last.isoformat(),
+            "bin_minutes": bin_minutes,
+            "heatmaps": heatmap.heatmaps(heatmap.to_arrays(bookings, spot_ids), first, last, bin_minutes),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to build heatmap: {str(e)}")
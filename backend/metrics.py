@@ -0,0 +1,277 @@
+"""
+Lightweight in-process metrics rendered in the Prometheus text format.
+
+Counters, gauges and histograms keep their samples in plain dicts keyed by
+label tuples behind a single lock each, so recording a sample on the hot path
+is a dict lookup, a bisect and a few additions.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds. Tuned for an API whose requests mostly spend their time waiting on Supabase.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Tuple[str, ...], labelvalues: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, one series per label combination"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self._header()
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be computed at scrape time via set_function()"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def dec(self, *labelvalues: str, amount: float = 1.0) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0.0)
+
+    def set_function(self, function: Callable[[], Dict[Tuple[str, ...], float]]) -> None:
+        """Compute the gauge lazily on every scrape instead of on the hot path"""
+        self._function = function
+
+    def render(self) -> List[str]:
+        if self._function is not None:
+            try:
+                computed = self._function()
+            except Exception:
+                computed = {}
+            with self._lock:
+                self._values.update(computed)
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self._header()
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Bucketed distribution with _bucket, _sum and _count series"""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[labelvalues] = series
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labelvalues: str) -> int:
+        series = self._series.get(labelvalues)
+        return series[2] if series else 0
+
+    def total(self, *labelvalues: str) -> float:
+        series = self._series.get(labelvalues)
+        return series[1] if series else 0.0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        lines = self._header()
+        for labelvalues, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for upper, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(upper) + '"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}"
+                )
+            label_str = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template, method and status code",
+    ("method", "route", "status"),
+))
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being handled",
+))
+SUPABASE_QUERY_DURATION = REGISTRY.register(Histogram(
+    "supabase_query_duration_seconds",
+    "Supabase query latency by table and operation",
+    ("table", "operation"),
+))
+SUPABASE_QUERY_ERRORS = REGISTRY.register(Counter(
+    "supabase_query_errors_total",
+    "Supabase queries that raised, by table and operation",
+    ("table", "operation"),
+))
+THREADPOOL_TOKENS = REGISTRY.register(Gauge(
+    "threadpool_tokens",
+    "Worker threadpool capacity used by sync endpoints (state=borrowed|total)",
+    ("state",),
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "cache_requests_total",
+    "Cache lookups by cache name and result (hit|miss)",
+    ("cache", "result"),
+))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache lookup; hit rate is hit / (hit + miss) per cache"""
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def _threadpool_tokens() -> Dict[Tuple[str, ...], float]:
+    # Must run inside the event loop (the /metrics endpoint is async for this reason)
+    from anyio import to_thread
+
+    limiter = to_thread.current_default_thread_limiter()
+    return {
+        ("borrowed",): float(limiter.borrowed_tokens),
+        ("total",): float(limiter.total_tokens),
+    }
+
+
+THREADPOOL_TOKENS.set_function(_threadpool_tokens)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency per route template.
+    Labels use the matched route's path ("/spots/{spot_id}"), never the raw
+    URL, so series cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start, scope["method"], route_path, str(status_code)
+            )
@@ -0,0 +1,347 @@
+"""
+Microbenchmarks for the core availability algorithms.
+
+Each benchmark runs a generated workload (many intervals, dense bookings,
+fragmented days) several times and keeps the best time, which is the least
+noisy estimate on a shared machine. Results are compared against a baseline
+JSON file and the run fails if any benchmark is slower than the baseline by
+more than the threshold.
+
+Absolute times only mean something on comparable hardware, so every run also
+times a fixed calibration loop and baseline times are scaled by how much
+faster or slower this machine is at it. A baseline recorded with a different
+Python version or CPU architecture is not compared at all (a warning is
+printed instead); record a local one with --save.
+
+Usage:
+    python microbench.py                      # compare with microbench_baseline.json
+    python microbench.py --save               # record a new baseline
+    python microbench.py --only subtract --threshold 0.5
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from autocomplete import AddressIndex
+from availability import minutes_to_time_str, parse_time_to_minutes, subtract_bookings
+import heatmap
+from processor import IntervalCalendar
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "microbench_baseline.json")
+DEFAULT_THRESHOLD = 0.25
+
+MINUTES_PER_DAY = 24 * 60
+
+
+# -------------------------------------------------------------------
+# Workload generators (seeded so every run times the same inputs)
+# -------------------------------------------------------------------
+
+def random_intervals(rng: random.Random, count: int, min_len: int = 5, max_len: int = 120) -> List[Tuple[int, int]]:
+    intervals = []
+    for _ in range(count):
+        start = rng.randrange(0, MINUTES_PER_DAY - min_len)
+        end = min(MINUTES_PER_DAY, start + rng.randint(min_len, max_len))
+        intervals.append((start, end))
+    return intervals
+
+
+def dense_bookings(count: int, length: int = 15) -> List[Tuple[int, int]]:
+    """Back-to-back bookings with a one minute gap, spread across the day"""
+    step = max(length + 1, MINUTES_PER_DAY // max(count, 1))
+    return [(i * step, i * step + length) for i in range(count) if i * step + length <= MINUTES_PER_DAY]
+
+
+def fragmented_day(pieces: int) -> List[Tuple[int, int]]:
+    """Many short base intervals, as if a host published lots of small windows"""
+    width = MINUTES_PER_DAY // (pieces * 2)
+    return [(2 * i * width, (2 * i + 1) * width) for i in range(pieces)]
+
+
+def time_strings(rng: random.Random, count: int) -> List[str]:
+    values = []
+    for _ in range(count):
+        minutes = rng.randrange(0, MINUTES_PER_DAY)
+        hours, mins = divmod(minutes, 60)
+        if rng.random() < 0.5:
+            values.append(f"{hours:02d}:{mins:02d}")
+        else:
+            suffix = "am" if hours < 12 else "pm"
+            values.append(f"{(hours % 12) or 12}:{mins:02d}{rng.choice(['', ' '])}{suffix}")
+    return values
+
+
+# -------------------------------------------------------------------
+# Benchmarks: each returns a zero-argument callable timed as one "op"
+# -------------------------------------------------------------------
+
+def bench_calendar_add_many() -> Callable[[], None]:
+    intervals = random_intervals(random.Random(1), 2000)
+
+    def run():
+        cal = IntervalCalendar()
+        for s, e in intervals:
+            cal.addAvailable(s, e)
+    return run
+
+
+def bench_calendar_reserve_fragmented() -> Callable[[], None]:
+    base = fragmented_day(200)
+    requests = random_intervals(random.Random(2), 1000, min_len=1, max_len=5)
+
+    def run():
+        cal = IntervalCalendar()
+        for s, e in base:
+            cal.addAvailable(s, e)
+        for s, e in requests:
+            if cal.isAvailable(s, e):
+                cal.reserve(s, e)
+    return run
+
+
+def bench_subtract_dense_bookings() -> Callable[[], None]:
+    base = [(0, MINUTES_PER_DAY // 2), (MINUTES_PER_DAY // 2 + 30, MINUTES_PER_DAY)]
+    bookings = dense_bookings(80)
+
+    def run():
+        for _ in range(50):
+            subtract_bookings(base, bookings)
+    return run
+
+
+def bench_subtract_fragmented_day() -> Callable[[], None]:
+    base = fragmented_day(150)
+    bookings = random_intervals(random.Random(3), 300, min_len=5, max_len=30)
+
+    def run():
+        subtract_bookings(base, bookings)
+    return run
+
+
+def bench_parse_time_to_minutes() -> Callable[[], None]:
+    values = time_strings(random.Random(4), 5000)
+
+    def run():
+        for value in values:
+            parse_time_to_minutes(value)
+    return run
+
+
+def bench_minutes_to_time_str() -> Callable[[], None]:
+    rng = random.Random(5)
+    values = [rng.randrange(0, MINUTES_PER_DAY) for _ in range(5000)]
+
+    def run():
+        for value in values:
+            minutes_to_time_str(value)
+    return run
+
+
+def bench_autocomplete_keystrokes() -> Callable[[], None]:
+    """Every prefix of a few typed addresses against 10k active spots"""
+    rng = random.Random(6)
+    streets = ["Main", "Chestnut", "Granville", "Cambie", "Oak", "Victoria", "Kingsway", "Fraser"]
+    cities = ["Vancouver", "Burnaby", "Richmond", "Surrey", "Toronto", "Montreal"]
+    index = AddressIndex()
+    index.rebuild(
+        {
+            "id": str(i),
+            "street": f"{rng.randint(1, 9999)} {rng.choice(streets)} {rng.choice(['St', 'Ave', 'Dr'])}",
+            "city": rng.choice(cities),
+            "postal_code": f"V{rng.randint(0, 9)}A {rng.randint(0, 9)}B{rng.randint(0, 9)}",
+            "is_active": True,
+        }
+        for i in range(10_000)
+    )
+    typed = ["1234 granville vancouver", "chestnut bur", "v5a 3b"]
+    keystrokes = [text[:n] for text in typed for n in range(1, len(text) + 1)]
+
+    def run():
+        for prefix in keystrokes:
+            index.search(prefix, 10)
+    return run
+
+
+def bench_heatmap_5k_spots() -> Callable[[], None]:
+    """Hourly occupancy heatmaps for 5k spots from 8 weeks of bookings (~120k rows)"""
+    rng = random.Random(7)
+    first = date(2030, 1, 7)
+    spot_ids = [f"spot-{i:05d}" for i in range(5_000)]
+    rows = []
+    for spot_id in spot_ids:
+        for _ in range(24):
+            start = rng.randrange(6 * 60, 20 * 60, 15)
+            rows.append({
+                "spot_id": spot_id,
+                "booking_date": (first + timedelta(days=rng.randrange(56))).isoformat(),
+                "start_time": minutes_to_time_str(start),
+                "end_time": minutes_to_time_str(start + rng.choice((30, 60, 90, 120, 240))),
+            })
+    last = first + timedelta(days=55)
+
+    def run():
+        heatmap.occupancy(heatmap.to_arrays(rows, spot_ids), first, last, 60)
+    return run
+
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[], None]]] = {
+    "calendar_add_many": bench_calendar_add_many,
+    "calendar_reserve_fragmented": bench_calendar_reserve_fragmented,
+    "subtract_dense_bookings": bench_subtract_dense_bookings,
+    "subtract_fragmented_day": bench_subtract_fragmented_day,
+    "parse_time_to_minutes": bench_parse_time_to_minutes,
+    "minutes_to_time_str": bench_minutes_to_time_str,
+    "autocomplete_keystrokes": bench_autocomplete_keystrokes,
+    "heatmap_5k_spots": bench_heatmap_5k_spots,
+}
+
+
+# -------------------------------------------------------------------
+# Runner
+# -------------------------------------------------------------------
+
+def bench_calibration() -> Callable[[], None]:
+    """Fixed interpreter-bound work, independent of the code under test"""
+    def run():
+        total = 0
+        for i in range(200_000):
+            total += i % 7
+        sorted(str(i) for i in range(20_000))
+    return run
+
+
+def time_benchmark(factory: Callable[[], Callable[[], None]], repeat: int) -> Dict[str, float]:
+    run = factory()
+    run()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "best_ms": round(samples[0] * 1000, 4),
+        "median_ms": round(samples[len(samples) // 2] * 1000, 4),
+        "repeat": repeat,
+    }
+
+
+def run_benchmarks(names: List[str], repeat: int) -> Dict[str, Dict[str, float]]:
+    return {name: time_benchmark(BENCHMARKS[name], repeat) for name in names}
+
+
+def platform_info() -> Dict[str, str]:
+    return {
+        "python": ".".join(platform.python_version_tuple()[:2]),
+        "machine": platform.machine(),
+    }
+
+
+def platform_mismatch(document: dict) -> List[str]:
+    """Differences between the baseline's platform and this one"""
+    current = platform_info()
+    mismatches = []
+    for field, value in current.items():
+        recorded = str(document.get(field, value))
+        if field == "python":
+            recorded = ".".join(recorded.split(".")[:2])
+        if recorded != value:
+            mismatches.append(f"{field} {recorded} (baseline) vs {value} (here)")
+    return mismatches
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float, scale: float = 1.0) -> List[str]:
+    """
+    Return a message for every benchmark slower than baseline * scale * (1 + threshold).
+    scale is this machine's calibration time over the baseline's.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["best_ms"] * scale
+        after = result["best_ms"]
+        if before > 0 and after > before * (1 + threshold):
+            regressions.append(f"{name}: {after:.3f}ms vs baseline {before:.3f}ms (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def load_baseline_document(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_baseline(path: str) -> Dict[str, dict]:
+    return load_baseline_document(path).get("benchmarks", {})
+
+
+def save_baseline(path: str, results: Dict[str, dict], calibration_ms: float) -> None:
+    existing = load_baseline(path)
+    existing.update(results)
+    document = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "calibration_ms": calibration_ms,
+        "benchmarks": dict(sorted(existing.items())),
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+        f.write("\n")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for availability algorithms")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown as a fraction of the baseline (0.25 = 25%%)")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--only", help="Run only benchmarks whose name contains this string")
+    args = parser.parse_args(argv)
+
+    names = [n for n in BENCHMARKS if not args.only or args.only in n]
+    calibration_ms = time_benchmark(bench_calibration, args.repeat)["best_ms"]
+    results = run_benchmarks(names, args.repeat)
+
+    if args.save:
+        for name, result in results.items():
+            sys.stdout.write(f"{name:32s} best {result['best_ms']:10.3f}ms  median {result['median_ms']:10.3f}ms\n")
+        save_baseline(args.baseline, results, calibration_ms)
+        sys.stdout.write(f"Baseline written to {args.baseline}\n")
+        return 0
+
+    document = load_baseline_document(args.baseline)
+    mismatches = platform_mismatch(document)
+    if mismatches:
+        sys.stdout.write("WARNING: baseline was recorded on a different platform ("
+                         + "; ".join(mismatches) + "); skipping comparison. Run with --save to record one here.\n")
+        return 0
+    baseline = document.get("benchmarks", {})
+    scale = calibration_ms / document["calibration_ms"] if document.get("calibration_ms") else 1.0
+    sys.stdout.write(f"Calibration {calibration_ms:.3f}ms, baseline scaled by {scale:.2f}\n")
+
+    for name, result in results.items():
+        before = baseline.get(name, {}).get("best_ms")
+        before = before * scale if before else None
+        change = f" (baseline {before:.3f}ms, {(result['best_ms'] / before - 1) * 100:+.0f}%)" if before else ""
+        sys.stdout.write(f"{name:32s} best {result['best_ms']:10.3f}ms  median {result['median_ms']:10.3f}ms{change}\n")
+
+    regressions = compare(results, baseline, args.threshold, scale)
+    if regressions:
+        sys.stdout.write("Regressions beyond threshold:\n")
+        for message in regressions:
+            sys.stdout.write(f"  {message}\n")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
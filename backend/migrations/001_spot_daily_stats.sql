@@ -0,0 +1,38 @@
+-- Per (host, spot, day) booking aggregates behind GET /host/dashboard.
+-- Maintained incrementally by the API (bump_spot_daily_stats on every booking
+-- and cancellation) and recomputed from bookings_v2 by `python host_stats.py rebuild`.
+
+create table if not exists spot_daily_stats_v2 (
+    host_id        integer       not null,
+    spot_id        uuid          not null references parking_spots_v2 (id) on delete cascade,
+    day            date          not null,
+    booked_minutes integer       not null default 0,
+    revenue        numeric(12,2) not null default 0,
+    booking_count  integer       not null default 0,
+    primary key (host_id, spot_id, day)
+);
+
+create index if not exists spot_daily_stats_v2_host_day on spot_daily_stats_v2 (host_id, day);
+
+-- Atomic increment, so concurrent bookings on one spot and day never lose an update.
+-- p_host_id may be null (e.g. on cancellation); it is then read from the spot.
+create or replace function bump_spot_daily_stats(
+    p_host_id  integer,
+    p_spot_id  uuid,
+    p_day      date,
+    p_minutes  integer,
+    p_revenue  numeric,
+    p_bookings integer
+) returns void
+language sql
+as $$
+    insert into spot_daily_stats_v2 (host_id, spot_id, day, booked_minutes, revenue, booking_count)
+    values (
+        coalesce(p_host_id, (select host_id from parking_spots_v2 where id = p_spot_id)),
+        p_spot_id, p_day, p_minutes, p_revenue, p_bookings
+    )
+    on conflict (host_id, spot_id, day) do update set
+        booked_minutes = spot_daily_stats_v2.booked_minutes + excluded.booked_minutes,
+        revenue        = spot_daily_stats_v2.revenue + excluded.revenue,
+        booking_count  = spot_daily_stats_v2.booking_count + excluded.booking_count;
+$$;
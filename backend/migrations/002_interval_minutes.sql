@@ -0,0 +1,36 @@
+-- Integer minute columns on availability_intervals_v2, so readers compare
+-- numbers instead of re-parsing '9:00am' / '17:00' strings on every request.
+-- New spots get them from the API (intervals are also merged per day there);
+-- this fills them in for existing rows. Rows whose times don't parse keep
+-- nulls and readers fall back to the strings.
+
+-- Minutes since midnight for the time formats the API accepts ('9:00am',
+-- '5:00 PM', '17:00'); null if the text doesn't parse
+create or replace function time_text_to_minutes(t text) returns integer
+language plpgsql immutable
+as $$
+declare
+    clean text := lower(replace(t, ' ', ''));
+begin
+    if clean ~ '^\d{1,2}:\d{2}(am|pm)$' then
+        return (extract(epoch from to_timestamp(clean, 'HH12:MIam')::time) / 60)::integer;
+    elsif clean ~ '^\d{1,2}:\d{2}$' then
+        return (extract(epoch from to_timestamp(clean, 'HH24:MI')::time) / 60)::integer;
+    end if;
+    return null;
+exception when others then
+    return null;
+end;
+$$;
+
+alter table availability_intervals_v2
+    add column if not exists start_minute integer,
+    add column if not exists end_minute integer;
+
+update availability_intervals_v2
+set start_minute = time_text_to_minutes(start_time),
+    end_minute   = time_text_to_minutes(end_time)
+where start_minute is null or end_minute is null;
+
+create index if not exists availability_intervals_v2_spot_day
+    on availability_intervals_v2 (spot_id, day, start_minute);
@@ -0,0 +1,52 @@
+-- Weekly hours packed onto the spot row (parking_spots_v2.schedule), so spot
+-- reads don't need a second query against availability_intervals_v2. The
+-- format is described in schedule.py: 'v1:' then base64 of big-endian
+-- (start, end) minute pairs counted from Monday 00:00, sorted. Apply after
+-- 002_interval_minutes.sql, which adds the minute columns this reads.
+--
+-- The interval rows stay the source of truth: a trigger rebuilds the column
+-- whenever they change. A null schedule (e.g. some row's minutes are null)
+-- just sends readers back to the interval rows.
+
+alter table parking_spots_v2 add column if not exists schedule text;
+
+create or replace function spot_schedule_v1(p_spot_id uuid) returns text
+language sql stable
+as $$
+    with pairs as (
+        select (array_position(array['Monday', 'Tuesday', 'Wednesday', 'Thursday',
+                                     'Friday', 'Saturday', 'Sunday'], day) - 1) * 1440 as offset_minute,
+               start_minute, end_minute
+        from availability_intervals_v2
+        where spot_id = p_spot_id
+    )
+    select 'v1:' || coalesce(replace(encode(string_agg(
+               int2send((offset_minute + start_minute)::smallint)
+               || int2send((offset_minute + end_minute)::smallint),
+               ''::bytea order by offset_minute + start_minute, offset_minute + end_minute
+           ), 'base64'), E'\n', ''), '')
+    from pairs
+    having coalesce(bool_and(offset_minute is not null and start_minute is not null
+                             and end_minute is not null), true)
+$$;
+
+update parking_spots_v2 set schedule = spot_schedule_v1(id);
+
+create or replace function sync_spot_schedule() returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op <> 'INSERT' then
+        update parking_spots_v2 set schedule = spot_schedule_v1(old.spot_id) where id = old.spot_id;
+    end if;
+    if tg_op <> 'DELETE' and (tg_op = 'INSERT' or new.spot_id is distinct from old.spot_id) then
+        update parking_spots_v2 set schedule = spot_schedule_v1(new.spot_id) where id = new.spot_id;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists availability_intervals_v2_schedule on availability_intervals_v2;
+create trigger availability_intervals_v2_schedule
+    after insert or update or delete on availability_intervals_v2
+    for each row execute function sync_spot_schedule();
@@ -0,0 +1,22 @@
+-- Integer minute columns on bookings_v2, so create_booking can ask the
+-- database for a conflicting booking (start_minute < new end and
+-- end_minute > new start, limit 1) instead of fetching the whole day's
+-- bookings and parsing their time strings. Apply after
+-- 002_interval_minutes.sql, which defines time_text_to_minutes, and before
+-- deploying the API version that writes and filters on these columns.
+-- Rows whose times don't parse keep nulls; the overlap query never matches
+-- them, just as the old Python check skipped them.
+
+alter table bookings_v2
+    add column if not exists start_minute integer,
+    add column if not exists end_minute integer;
+
+update bookings_v2
+set start_minute = time_text_to_minutes(start_time),
+    end_minute   = time_text_to_minutes(end_time)
+where start_minute is null or end_minute is null;
+
+create index if not exists bookings_v2_spot_date_start
+    on bookings_v2 (spot_id, booking_date, start_minute)
+    include (end_minute)
+    where status in ('confirmed', 'pending');
@@ -0,0 +1,11 @@
+-- Two-phase bookings: POST /bookings/holds inserts status 'pending' with an
+-- expires_at; POST /bookings/{id}/confirm sets 'confirmed' and clears it, and
+-- the API's expiry timer sets 'expired' once it has passed. Expired rows are
+-- kept for history and, like cancelled ones, no longer block the slot.
+
+alter table bookings_v2 add column if not exists expires_at timestamp;
+
+-- Workers reschedule outstanding holds at startup with this lookup
+create index if not exists bookings_v2_pending_holds
+    on bookings_v2 (expires_at)
+    where status = 'pending';
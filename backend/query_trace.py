@@ -0,0 +1,141 @@
+"""
+Per-request Supabase query tracing.
+
+QueryTraceMiddleware opens a QueryTrace for every HTTP request; the
+instrumented client in db.py records each execute() into it. The totals are
+sent back in a Server-Timing header, logged at debug level, and compared with
+a per-route query budget so N+1 regressions show up as warnings.
+
+Budgets come from QUERY_BUDGET_DEFAULT and QUERY_BUDGETS, the latter being a
+comma separated list of "METHOD /route/template=N" entries, e.g.
+QUERY_BUDGETS="GET /spots=2,POST /bookings=5".
+"""
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_budgets(raw: str) -> Dict[str, int]:
+    budgets = {}
+    for entry in raw.split(","):
+        if "=" not in entry:
+            continue
+        route, limit = entry.rsplit("=", 1)
+        try:
+            budgets[" ".join(route.split())] = int(limit)
+        except ValueError:
+            logger.warning("Ignoring invalid query budget entry: %s", entry)
+    return budgets
+
+
+DEFAULT_QUERY_BUDGET = int(os.getenv("QUERY_BUDGET_DEFAULT", "10"))
+ROUTE_QUERY_BUDGETS: Dict[str, int] = _parse_budgets(os.getenv("QUERY_BUDGETS", ""))
+
+
+class QueryTrace:
+    """Queries issued while handling one request: (table, operation, seconds)"""
+
+    def __init__(self):
+        self.queries: List[Tuple[str, str, float]] = []
+
+    def record(self, table: str, operation: str, seconds: float) -> None:
+        self.queries.append((table, operation, seconds))
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(q[2] for q in self.queries)
+
+    def by_table(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for table, operation, _ in self.queries:
+            key = f"{table}.{operation}"
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.total_seconds * 1000:.1f};desc="{self.count} queries"'
+
+
+def query_count(response) -> int:
+    """Queries a response's request issued, read back from its Server-Timing header"""
+    return int(response.headers["server-timing"].split('desc="')[1].split()[0])
+
+
+_current_trace: ContextVar[Optional[QueryTrace]] = ContextVar("query_trace", default=None)
+
+
+def record_query(table: str, operation: str, seconds: float) -> None:
+    """Called by the instrumented client for every executed query"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(table, operation, seconds)
+
+
+@contextmanager
+def capture_queries():
+    """
+    Collect the queries issued inside the block, e.g. in tests:
+
+        with capture_queries() as trace:
+            list_parking_spots()
+        assert trace.count <= 2
+    """
+    trace = QueryTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def query_budget_for(method: str, route_path: str) -> int:
+    return ROUTE_QUERY_BUDGETS.get(f"{method} {route_path}", DEFAULT_QUERY_BUDGET)
+
+
+class QueryTraceMiddleware:
+    """Pure ASGI middleware; the trace is shared with threadpool handlers via the copied context"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = QueryTrace()
+        token = _current_trace.set(trace)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or scope.get("path", "")
+            method = scope["method"]
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "%s %s issued %d queries in %.1fms: %s",
+                    method, route_path, trace.count, trace.total_seconds * 1000, trace.by_table(),
+                )
+            budget = query_budget_for(method, route_path)
+            if trace.count > budget:
+                logger.warning(
+                    "Query budget exceeded for %s %s: %d queries (budget %d): %s",
+                    method, route_path, trace.count, budget, trace.by_table(),
+                )
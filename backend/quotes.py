@@ -0,0 +1,107 @@
+"""
+Booking prices, shared by create_booking and the batch quote endpoint.
+
+A quote is what create_booking would charge for the same spot, date and
+times: it checks the spot is active, the times parse and the window lies
+inside one of the spot's intervals for that weekday. Existing bookings are
+not checked; that is what availability is for.
+
+quote_batch prices many (spot, date, start, end) items against spots and
+intervals fetched up front by the caller, in one pass. Each distinct time
+string and date is parsed once, so a page of results that repeats the same
+search window costs little more than a single quote.
+"""
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from availability import parse_time_to_minutes, row_minutes
+
+MAX_BATCH = int(os.getenv("QUOTE_BATCH_LIMIT", "200"))
+
+
+def booking_price(price_per_hour: float, start_minutes: int, end_minutes: int) -> float:
+    return (end_minutes - start_minutes) / 60.0 * price_per_hour
+
+
+def within_hours(intervals: List[dict], day_name: str, start_minutes: int, end_minutes: int) -> bool:
+    """True if start..end fits inside one of the intervals for day_name"""
+    for interval in intervals:
+        if interval["day"] != day_name:
+            continue
+        try:
+            interval_start, interval_end = row_minutes(interval)
+        except ValueError:
+            continue
+        if interval_start <= start_minutes and end_minutes <= interval_end:
+            return True
+    return False
+
+
+class _Parsed:
+    """Per-batch memo of parsed times and weekday names"""
+
+    def __init__(self):
+        self._minutes: Dict[str, object] = {}
+        self._days: Dict[str, Optional[str]] = {}
+
+    def minutes(self, text: str) -> int:
+        value = self._minutes.get(text)
+        if value is None:
+            try:
+                value = parse_time_to_minutes(text)
+            except ValueError as e:
+                value = e
+            self._minutes[text] = value
+        if isinstance(value, ValueError):
+            raise value
+        return value
+
+    def day_name(self, text: str) -> Optional[str]:
+        if text not in self._days:
+            try:
+                self._days[text] = datetime.strptime(text, "%Y-%m-%d").strftime("%A")
+            except ValueError:
+                self._days[text] = None
+        return self._days[text]
+
+
+def quote_batch(items: List[dict], spots: Dict[str, dict], intervals: Dict[str, List[dict]]) -> List[dict]:
+    """
+    One result per item, in order: the item plus duration_hours,
+    price_per_hour and total_price, or plus an error message.
+    """
+    parsed = _Parsed()
+    results = []
+    for item in items:
+        result = dict(item)
+        results.append(result)
+
+        spot = spots.get(item["spot_id"])
+        if spot is None:
+            result["error"] = "Parking spot not found"
+            continue
+        if not spot["is_active"]:
+            result["error"] = "Parking spot is not available"
+            continue
+        try:
+            start_minutes = parsed.minutes(item["start_time"])
+            end_minutes = parsed.minutes(item["end_time"])
+        except ValueError as e:
+            result["error"] = str(e)
+            continue
+        if end_minutes <= start_minutes:
+            result["error"] = "End time must be after start time"
+            continue
+        day_name = parsed.day_name(item["booking_date"])
+        if day_name is None:
+            result["error"] = "Invalid date format. Use YYYY-MM-DD"
+            continue
+        if not within_hours(intervals.get(spot["id"], []), day_name, start_minutes, end_minutes):
+            result["error"] = f"Requested time is outside the spot's available hours for {day_name}s"
+            continue
+
+        result["duration_hours"] = (end_minutes - start_minutes) / 60.0
+        result["price_per_hour"] = spot["price_per_hour"]
+        result["total_price"] = booking_price(spot["price_per_hour"], start_minutes, end_minutes)
+    return results
@@ -0,0 +1,251 @@
+"""
+Local read replica of bookings_v2 (opt-in with LOCAL_REPLICA=1).
+
+Spots and their intervals already live in memory (see catalog.py); this adds
+the active bookings from today onward, indexed by (spot_id, booking_date), so
+availability reads need no round trip at all. The booking conflict check in
+create_booking always asks the database: a replica can lag, a double booking
+must not happen.
+
+The snapshot is loaded at startup (see main.lifespan) and kept in sync by:
+
+- the realtime change feed, when it is connected (every insert, update and
+  delete of a booking reaches apply()/remove());
+- otherwise, polling every REPLICA_POLL_SECONDS for rows created since the
+  newest created_at seen, minus POLL_OVERLAP_SECONDS so rows committed slightly
+  out of clock order are not missed (apply() is idempotent);
+- this worker's own writes, applied as they happen;
+- a full reload every REPLICA_RELOAD_SECONDS while polling, because polling
+  on created_at can't see another worker's cancellations.
+
+The lag (seconds since the replica was last known to be current) is exported
+as a gauge. Readers call bookings(); it returns None when the replica isn't
+loaded, doesn't cover the date, or lags more than REPLICA_MAX_STALENESS_SECONDS,
+and the caller queries the database instead.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import db
+from metrics import REGISTRY, Gauge, record_cache
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("LOCAL_REPLICA", "0") == "1"
+POLL_SECONDS = float(os.getenv("REPLICA_POLL_SECONDS", "5"))
+RELOAD_SECONDS = float(os.getenv("REPLICA_RELOAD_SECONDS", "300"))
+MAX_STALENESS_SECONDS = float(os.getenv("REPLICA_MAX_STALENESS_SECONDS", "30"))
+POLL_OVERLAP_SECONDS = 5.0
+
+ACTIVE_STATUSES = ("confirmed", "pending")
+COLUMNS = "id, spot_id, user_id, booking_date, start_time, end_time, start_minute, end_minute, status, created_at"
+
+REPLICA_ROWS = REGISTRY.register(Gauge(
+    "booking_replica_rows",
+    "Active bookings held in the local replica",
+))
+REPLICA_LAG = REGISTRY.register(Gauge(
+    "booking_replica_lag_seconds",
+    "Seconds since the local booking replica was last known to be current",
+))
+
+
+def _poll_since(created_at: str) -> str:
+    """created_at bound for the next poll: the high-water mark minus the overlap"""
+    try:
+        moment = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+    except ValueError:
+        return created_at
+    return (moment - timedelta(seconds=POLL_OVERLAP_SECONDS)).isoformat()
+
+
+class BookingReplica:
+    def __init__(self, enabled: bool = ENABLED):
+        self.enabled = enabled
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.loaded_at: Optional[float] = None
+        self.synced_at: Optional[float] = None
+        # Dates before this weren't loaded; reads for them go to the database
+        self.first_date: Optional[str] = None
+        self._rows: Dict[str, dict] = {}
+        self._by_day: Dict[Tuple[str, str], Dict[str, dict]] = {}
+        self._high_water: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def lag_seconds(self) -> float:
+        return time.monotonic() - self.synced_at if self.synced_at is not None else 0.0
+
+    # ---------------------------------------------------------------
+    # Loading and incremental updates
+    # ---------------------------------------------------------------
+
+    def load(self, rows: Iterable[dict], first_date: str) -> None:
+        """Replace the whole replica with rows for first_date onward"""
+        with self._lock:
+            self._rows = {}
+            self._by_day = {}
+            self._high_water = None
+            self.first_date = first_date
+            for row in rows:
+                self._apply(row)
+            self.loaded = True
+            self.loaded_at = self.synced_at = time.monotonic()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.loaded = False
+            self.loaded_at = self.synced_at = None
+            self.first_date = None
+            self._rows = {}
+            self._by_day = {}
+            self._high_water = None
+
+    def reload(self, client) -> None:
+        """Snapshot every active booking from today onward"""
+        first_date = date.today().isoformat()
+        rows = db.fetch_all(
+            client, "bookings_v2", COLUMNS,
+            lambda query: query.in_("status", list(ACTIVE_STATUSES)).gte("booking_date", first_date)
+        )
+        self.load(rows, first_date)
+
+    def _remove(self, booking_id) -> None:
+        previous = self._rows.pop(booking_id, None)
+        if previous is not None:
+            key = (previous["spot_id"], previous["booking_date"])
+            day = self._by_day.get(key)
+            if day is not None:
+                day.pop(booking_id, None)
+                if not day:
+                    del self._by_day[key]
+
+    def _apply(self, row: dict) -> None:
+        if row.get("id") is None:
+            return
+        self._remove(row["id"])
+        if row.get("created_at") and (self._high_water is None or row["created_at"] > self._high_water):
+            self._high_water = row["created_at"]
+        # Updates may carry only changed columns; without a key the row can't be placed
+        if row.get("status") in ACTIVE_STATUSES and row.get("spot_id") and row.get("booking_date"):
+            self._rows[row["id"]] = row
+            self._by_day.setdefault((row["spot_id"], row["booking_date"]), {})[row["id"]] = row
+
+    def apply(self, row: dict) -> None:
+        """Insert, replace or (if no longer active) drop one booking row"""
+        with self._lock:
+            if self.loaded:
+                self._apply(row)
+
+    def remove(self, booking_id) -> None:
+        with self._lock:
+            self._remove(booking_id)
+
+    def poll(self, client) -> int:
+        """Apply rows created since the last poll; returns how many were read"""
+        with self._lock:
+            since = self._high_water
+        narrow = lambda query: query.gte("booking_date", self.first_date)
+        if since is not None:
+            bound = _poll_since(since)
+            narrow = lambda query: query.gte("booking_date", self.first_date).gte("created_at", bound)
+        rows = db.fetch_all(client, "bookings_v2", COLUMNS, narrow)
+        with self._lock:
+            for row in rows:
+                self._apply(row)
+            self.synced_at = time.monotonic()
+        return len(rows)
+
+    def mark_synced(self) -> None:
+        with self._lock:
+            if self.loaded:
+                self.synced_at = time.monotonic()
+
+    # ---------------------------------------------------------------
+    # Queries
+    # ---------------------------------------------------------------
+
+    def rows(self) -> List[dict]:
+        """Every booking the replica holds"""
+        with self._lock:
+            return list(self._rows.values())
+
+    def covers(self, booking_date: str) -> bool:
+        return (
+            self.loaded
+            and booking_date >= self.first_date
+            and self.lag_seconds() <= MAX_STALENESS_SECONDS
+        )
+
+    def bookings(self, spot_id: str, booking_date: str) -> Optional[List[dict]]:
+        """Active bookings for the spot and date, or None to query the database"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            hit = self.covers(booking_date)
+            result = list(self._by_day.get((spot_id, booking_date), {}).values()) if hit else None
+        record_cache("booking_replica", hit)
+        return result
+
+    def bookings_for(self, spot_ids: Iterable[str], dates: List[str]) -> Optional[Dict[Tuple[str, str], List[dict]]]:
+        """{(spot_id, date): bookings} for every pair, or None if any date can't be served"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            hit = all(self.covers(booking_date) for booking_date in dates)
+            result = None
+            if hit:
+                result = {}
+                for spot_id in spot_ids:
+                    for booking_date in dates:
+                        rows = self._by_day.get((spot_id, booking_date))
+                        if rows:
+                            result[(spot_id, booking_date)] = list(rows.values())
+        record_cache("booking_replica", hit)
+        return result
+
+    # ---------------------------------------------------------------
+    # Background sync
+    # ---------------------------------------------------------------
+
+    async def _sync_loop(self, client_factory, feed_connected: Callable[[], bool], interval: float) -> None:
+        last_reload = time.monotonic()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not self.loaded or (not feed_connected() and time.monotonic() - last_reload >= RELOAD_SECONDS):
+                    await asyncio.to_thread(self.reload, client_factory())
+                    last_reload = time.monotonic()
+                elif feed_connected():
+                    # Every write reaches apply() through the feed
+                    self.mark_synced()
+                else:
+                    await asyncio.to_thread(self.poll, client_factory())
+            except Exception as e:
+                logger.warning("Booking replica sync failed: %s", e)
+
+    async def start(self, client_factory, feed_connected: Callable[[], bool], interval: float = POLL_SECONDS) -> None:
+        if self.enabled and self._task is None and interval > 0:
+            self._task = asyncio.create_task(self._sync_loop(client_factory, feed_connected, interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+booking_replica = BookingReplica()
+REPLICA_ROWS.set_function(lambda: {(): float(len(booking_replica))})
+REPLICA_LAG.set_function(lambda: {(): booking_replica.lag_seconds()})
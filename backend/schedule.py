@@ -0,0 +1,86 @@
+"""
+Compact weekly schedule stored on the spot row (parking_spots_v2.schedule).
+
+Rebuilding a spot's weekly hours from availability_intervals_v2 costs a
+second query on every spot read. The same intervals are small enough to
+keep on the spot itself:
+
+    v1:<base64 of big-endian uint16 pairs>
+
+Each pair is (start, end) in minutes since Monday 00:00, so a Tuesday
+9:00-17:00 interval is (1440 + 540, 1440 + 1020); pairs are sorted. Big-endian
+matches Postgres int2send, which migrations/003_spot_schedule.sql uses to
+backfill the column and a trigger uses to keep it in sync with the interval
+rows. The "v1:" prefix names the format. A reader that meets a version it
+doesn't know, or a null column, returns None and the caller falls back to
+the interval rows.
+"""
+import base64
+import struct
+from typing import Callable, Dict, Iterable, List, Optional
+
+from availability import WEEKDAYS, minutes_to_time_str, row_minutes
+
+VERSION = "v1"
+MINUTES_PER_DAY = 24 * 60
+
+
+def encode(intervals: Iterable[dict]) -> str:
+    """v1 encoding of interval rows (day plus start/end minutes or times)"""
+    pairs = []
+    for interval in intervals:
+        offset = WEEKDAYS.index(interval["day"]) * MINUTES_PER_DAY
+        start, end = row_minutes(interval)
+        pairs.append((offset + start, offset + end))
+    pairs.sort()
+    packed = struct.pack(f">{2 * len(pairs)}H", *(minute for pair in pairs for minute in pair))
+    return f"{VERSION}:{base64.b64encode(packed).decode('ascii')}"
+
+
+def _decode_v1(payload: str) -> List[dict]:
+    packed = base64.b64decode(payload, validate=True)
+    if len(packed) % 4:
+        raise ValueError("v1 schedule must hold whole (start, end) pairs")
+    minutes = struct.unpack(f">{len(packed) // 2}H", packed)
+    intervals = []
+    for start, end in zip(minutes[0::2], minutes[1::2]):
+        day, start_minute = divmod(start, MINUTES_PER_DAY)
+        end_minute = end - day * MINUTES_PER_DAY
+        if day >= len(WEEKDAYS) or not start_minute < end_minute < MINUTES_PER_DAY:
+            raise ValueError(f"Invalid v1 schedule pair: {start}, {end}")
+        intervals.append({
+            "day": WEEKDAYS[day],
+            "start_time": minutes_to_time_str(start_minute),
+            "end_time": minutes_to_time_str(end_minute),
+            "start_minute": start_minute,
+            "end_minute": end_minute,
+        })
+    return intervals
+
+
+DECODERS: Dict[str, Callable[[str], List[dict]]] = {
+    "v1": _decode_v1,
+}
+
+
+def decode(text: str) -> List[dict]:
+    """Interval rows (day, start/end time strings and minutes) from an encoded schedule"""
+    version, _, payload = text.partition(":")
+    decoder = DECODERS.get(version)
+    if decoder is None:
+        raise ValueError(f"Unknown schedule version: {version}")
+    return decoder(payload)
+
+
+def spot_intervals(spot: dict) -> Optional[List[dict]]:
+    """The spot's weekly intervals from its schedule column, or None to read the interval rows"""
+    text = spot.get("schedule")
+    if not text:
+        return None
+    try:
+        intervals = decode(text)
+    except (ValueError, struct.error):
+        return None
+    for interval in intervals:
+        interval["spot_id"] = spot["id"]
+    return intervals
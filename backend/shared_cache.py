@@ -0,0 +1,150 @@
+"""
+Host-local cache shared by all worker processes.
+
+uvicorn/gunicorn workers on one host don't share memory, so each would fetch
+the same spots and recompute the same availability. SharedCache keeps JSON
+values in a SQLite file in WAL mode (readers never block, one writer at a
+time), which every worker process opens.
+
+Invalidation is versioned rather than key-based: each entry is stamped with
+the versions of the scopes it depends on (e.g. "spot:<id>" and
+"avail:<id>:<date>") read *before* the value was computed. A write bumps its
+scopes' versions in the same file, so every worker's next read sees a stale
+stamp and recomputes; a value computed concurrently with a write is stored
+under the old stamp and never served.
+
+Writes made on another host only reach this file through the realtime change
+feed (whose listeners bump the same scopes); SHARED_CACHE_TTL_SECONDS bounds
+staleness when the feed is off.
+
+Enabled by setting SHARED_CACHE_PATH, e.g. /dev/shm/parking-cache.sqlite3.
+"""
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+TTL_SECONDS = float(os.getenv("SHARED_CACHE_TTL_SECONDS", "30"))
+# Roughly one set() in this many also deletes expired entries
+PURGE_EVERY = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    scope TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    stamp TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SharedCache:
+    def __init__(self, path: str, ttl: float = TTL_SECONDS, name: str = "shared_cache"):
+        self.path = path
+        self.ttl = ttl
+        self.name = name
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def stamp(self, scopes: Sequence[str]) -> str:
+        """Current versions of the scopes, as stored alongside an entry"""
+        if not scopes:
+            return ""
+        placeholders = ",".join("?" * len(scopes))
+        rows = dict(self._connection().execute(
+            f"SELECT scope, version FROM versions WHERE scope IN ({placeholders})", list(scopes)
+        ).fetchall())
+        return ".".join(str(rows.get(scope, 0)) for scope in scopes)
+
+    def bump(self, *scopes: str) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO versions (scope, version) VALUES (?, 1) "
+                "ON CONFLICT(scope) DO UPDATE SET version = version + 1",
+                [(scope,) for scope in scopes],
+            )
+
+    def _lookup(self, key: str, stamp: str) -> Optional[Any]:
+        row = self._connection().execute(
+            "SELECT stamp, value, expires_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[0] != stamp or row[2] < time.time():
+            return None
+        return json.loads(row[1])
+
+    def get(self, key: str, scopes: Sequence[str]) -> Optional[Any]:
+        """The cached value, or None if missing, expired or stamped with old versions"""
+        return self._lookup(key, self.stamp(scopes))
+
+    def set(self, key: str, value: Any, stamp: str, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, stamp, value, expires_at) VALUES (?, ?, ?, ?)",
+            (key, stamp, json.dumps(value, separators=(",", ":")), expires_at),
+        )
+        if random.randrange(PURGE_EVERY) == 0:
+            conn.execute("DELETE FROM entries WHERE expires_at < ?", (time.time(),))
+
+    def get_or_compute(
+        self,
+        key: str,
+        scopes: Sequence[str],
+        compute: Callable[[], Any],
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """
+        Cached value for key, or compute() stored under the versions read
+        before computing. Cache errors fall through to compute().
+        """
+        try:
+            stamp = self.stamp(scopes)
+            value = self._lookup(key, stamp)
+            if value is not None:
+                record_cache(self.name, True)
+                return value
+        except sqlite3.Error as e:
+            logger.warning("Shared cache read failed for %s: %s", key, e)
+            return compute()
+
+        record_cache(self.name, False)
+        value = compute()
+        try:
+            self.set(key, value, stamp, ttl)
+        except sqlite3.Error as e:
+            logger.warning("Shared cache write failed for %s: %s", key, e)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._connection()
+        return {
+            "entries": conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0],
+            "scopes": conn.execute("SELECT COUNT(*) FROM versions").fetchone()[0],
+        }
+
+
+shared_cache: Optional[SharedCache] = SharedCache(SHARED_CACHE_PATH) if SHARED_CACHE_PATH else None
@@ -0,0 +1,211 @@
+"""
+Grid spatial index over spot coordinates and best-k ranked search.
+
+Spots are bucketed into square cells of CELL_KM (in latitude; longitude
+cells use the same number of degrees). A search expands square rings of
+cells around the query point. Every spot in ring r is at least
+ring_lower_bound(r) km away, so once the k best accepted candidates all
+score below the lower bound of the next ring plus the cheapest possible
+non-distance term, no further ring can change the answer and the search
+stops without looking at the remaining spots.
+
+Acceptance (e.g. "free for this window") is decided by a caller-supplied
+batch callback, so an expensive check runs once per batch of the most
+promising candidates, not once per spot; a batch may include candidates
+past the current bound, which only saves a later round trip. The result is
+kept in a bounded heap of size k.
+
+GridIndex is a SpotCatalog observer.
+"""
+import heapq
+import itertools
+import math
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+CELL_KM = float(os.getenv("SPATIAL_CELL_KM", "1.0"))
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Candidates checked per batch, as a multiple of the results still missing
+OVERSAMPLE = 2
+
+Cell = Tuple[int, int]
+# (score, distance_km, spot)
+Ranked = Tuple[float, float, dict]
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    def __init__(self, cell_km: float = CELL_KM):
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        self._lock = threading.RLock()
+        self._cells: Dict[Cell, Dict[str, dict]] = {}
+        self._spot_cells: Dict[str, Cell] = {}
+        # (min_i, max_i, min_j, max_j) of the occupied cells, None when empty; widened on
+        # upsert, recomputed on the next search after a remove empties a cell on the edge
+        self._bounds: Optional[Tuple[int, int, int, int]] = None
+        self._bounds_stale = False
+
+    def __len__(self) -> int:
+        return len(self._spot_cells)
+
+    def cell_of(self, lat: float, lng: float) -> Cell:
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    # Observer interface used by SpotCatalog
+
+    def rebuild(self, spots: Iterable[dict]) -> None:
+        with self._lock:
+            self._cells = {}
+            self._spot_cells = {}
+            self._bounds = None
+            self._bounds_stale = False
+            for spot in spots:
+                self.upsert(spot)
+
+    def upsert(self, spot: dict) -> None:
+        with self._lock:
+            self.remove(spot["id"])
+            if not spot.get("is_active") or spot.get("lat") is None or spot.get("lng") is None:
+                return
+            cell = self.cell_of(float(spot["lat"]), float(spot["lng"]))
+            self._cells.setdefault(cell, {})[spot["id"]] = spot
+            self._spot_cells[spot["id"]] = cell
+            self._widen(cell)
+
+    def remove(self, spot_id: str) -> None:
+        with self._lock:
+            cell = self._spot_cells.pop(spot_id, None)
+            if cell is None:
+                return
+            spots = self._cells[cell]
+            spots.pop(spot_id, None)
+            if not spots:
+                del self._cells[cell]
+                if self._bounds is not None and (cell[0] in self._bounds[:2] or cell[1] in self._bounds[2:]):
+                    self._bounds_stale = True
+
+    def _widen(self, cell: Cell) -> None:
+        i, j = cell
+        if self._bounds is None:
+            self._bounds = (i, i, j, j)
+        else:
+            min_i, max_i, min_j, max_j = self._bounds
+            self._bounds = (min(min_i, i), max(max_i, i), min(min_j, j), max(max_j, j))
+
+    # Search
+
+    @staticmethod
+    def ring(center: Cell, r: int) -> Iterable[Cell]:
+        ci, cj = center
+        if r == 0:
+            yield center
+            return
+        for j in range(cj - r, cj + r + 1):
+            yield (ci - r, j)
+            yield (ci + r, j)
+        for i in range(ci - r + 1, ci + r):
+            yield (i, cj - r)
+            yield (i, cj + r)
+
+    def ring_lower_bound(self, lat: float, r: int) -> float:
+        """Minimum distance in km from a point in the center cell to any spot in ring r"""
+        if r <= 1:
+            return 0.0
+        # Longitude cells shrink away from the equator; use the narrowest row the ring touches
+        widest_lat = min(90.0, abs(lat) + (r + 1) * self.cell_deg)
+        cell_km = self.cell_deg * KM_PER_DEGREE * math.cos(math.radians(widest_lat))
+        return (r - 1) * cell_km
+
+    def _max_ring(self, center: Cell) -> int:
+        """Outermost ring around center with an occupied cell, -1 if there is none"""
+        if self._bounds_stale:
+            self._bounds = None
+            for cell in self._cells:
+                self._widen(cell)
+            self._bounds_stale = False
+        if self._bounds is None:
+            return -1
+        min_i, max_i, min_j, max_j = self._bounds
+        return max(center[0] - min_i, max_i - center[0], center[1] - min_j, max_j - center[1])
+
+    def best(
+        self,
+        lat: float,
+        lng: float,
+        k: int,
+        score: Callable[[dict, float], Optional[float]],
+        min_extra: float,
+        accept: Callable[[List[dict]], Set[str]],
+        max_km: Optional[float] = None,
+    ) -> List[Ranked]:
+        """
+        Up to k (score, distance_km, spot) with the lowest scores, best first.
+
+        score(spot, distance_km) returns a score (lower is better) or None to
+        skip the spot; it must be >= distance_km + min_extra. accept(spots)
+        returns the ids of the spots that qualify and is called in batches.
+        """
+        with self._lock:
+            center = self.cell_of(lat, lng)
+            last_ring = self._max_ring(center)
+        if max_km is not None:
+            # Rings entirely beyond max_km can't contain a candidate
+            for r in range(last_ring + 1):
+                if self.ring_lower_bound(lat, r) > max_km:
+                    last_ring = r - 1
+                    break
+
+        best: List[Tuple[float, str, float, dict]] = []  # max-heap by score (negated)
+        unchecked: List[Tuple[float, str, float, dict]] = []  # min-heap by score
+
+        def worst() -> float:
+            return -best[0][0] if len(best) == k else math.inf
+
+        for r in itertools.count():
+            bound = self.ring_lower_bound(lat, r) + min_extra if r <= last_ring else math.inf
+
+            # Once the best candidate beats everything in unseen rings, check the top
+            # `size` in one batch; keep expanding first if there aren't that many yet
+            while unchecked and unchecked[0][0] <= bound and unchecked[0][0] < worst():
+                size = max(1, k - len(best)) * OVERSAMPLE
+                if len(unchecked) < size and bound != math.inf:
+                    break
+                batch = []
+                while unchecked and unchecked[0][0] < worst() and len(batch) < size:
+                    batch.append(heapq.heappop(unchecked))
+                accepted = accept([item[3] for item in batch])
+                for item in batch:
+                    if item[1] not in accepted:
+                        continue
+                    entry = (-item[0], item[1], item[2], item[3])
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif entry > best[0]:
+                        heapq.heapreplace(best, entry)
+
+            if worst() <= bound or r > last_ring:
+                break
+
+            with self._lock:
+                ring_spots = [
+                    item for cell in self.ring(center, r) for item in self._cells.get(cell, {}).items()
+                ]
+            for spot_id, spot in ring_spots:
+                distance = haversine_km(lat, lng, float(spot["lat"]), float(spot["lng"]))
+                if max_km is not None and distance > max_km:
+                    continue
+                value = score(spot, distance)
+                if value is not None:
+                    heapq.heappush(unchecked, (value, spot_id, distance, spot))
+
+        ranked = sorted(best, key=lambda entry: (-entry[0], entry[1]))
+        return [(-negated, distance, spot) for negated, _, distance, spot in ranked]
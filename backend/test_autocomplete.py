@@ -0,0 +1,77 @@
+"""
+Test the address autocomplete index and GET /spots/autocomplete
+"""
+from fastapi.testclient import TestClient
+
+import db
+import loadtest
+import main
+from autocomplete import AddressIndex
+from catalog import spot_catalog
+from fake_supabase import FakeSupabase
+
+
+def spot(spot_id, street, city, postal_code, is_active=True):
+    return {"id": spot_id, "street": street, "city": city, "postal_code": postal_code, "is_active": is_active}
+
+
+def make_index():
+    index = AddressIndex()
+    index.rebuild([
+        spot("a", "12 Chestnut Street", "Vancouver", "V6B 1A1"),
+        spot("b", "400 Main Street", "Vancouver", "V5T 3E1"),
+        spot("c", "9 Chester Avenue", "Victoria", "V8W 2B2"),
+        spot("d", "77 Main Street", "Toronto", "M5V 2T6", is_active=False),
+        spot("e", "3 Vancouver Lane", "Burnaby", "V5H 4M1"),
+    ])
+    return index
+
+
+def ids(results):
+    return [r["spot_id"] for r in results]
+
+
+def test_prefix_words_must_all_match_and_exact_tokens_rank_first():
+    index = make_index()
+    assert ids(index.search("ches")) == ["c", "a"]
+    assert ids(index.search("chestnut van")) == ["a"]
+    assert ids(index.search("main")) == ["b"]  # inactive spot d excluded
+
+
+def test_street_matches_rank_above_city_matches():
+    assert ids(make_index().search("vancouver")) == ["e", "b", "a"]
+
+
+def test_substring_and_compact_postal_code():
+    index = make_index()
+    assert ids(index.search("stnut")) == ["a"]
+    assert ids(index.search("v6b1a")) == ["a"]
+    assert ids(index.search("zzz")) == []
+
+
+def test_incremental_updates_and_limit():
+    index = make_index()
+    index.upsert(spot("f", "1 Chestnut Court", "Richmond", "V6X 1A1"))
+    assert ids(index.search("chestnut")) == ["f", "a"]
+    index.upsert(spot("a", "12 Chestnut Street", "Vancouver", "V6B 1A1", is_active=False))
+    index.remove("f")
+    assert ids(index.search("chestnut")) == []
+    assert len(index.search("v", limit=2)) == 2
+
+
+def test_endpoint_uses_catalog_index_and_falls_back_to_database():
+    fake = FakeSupabase(loadtest.build_dataset(spots=30, users=1))
+    loadtest.install_client(fake)
+    client = TestClient(main.app)
+    city = fake.tables["parking_spots_v2"][0]["city"]
+
+    from_db = client.get("/spots/autocomplete", params={"q": city[:4], "limit": 3})
+    assert from_db.status_code == 200
+    assert len(from_db.json()) == 3
+
+    spot_catalog.reload(db.get_client())
+    from_index = client.get("/spots/autocomplete", params={"q": city[:4], "limit": 3})
+    assert 'desc="0 queries"' in from_index.headers["server-timing"]
+    assert from_index.json() == from_db.json()
+    assert client.get("/spots/autocomplete", params={"q": ""}).status_code == 422
+    loadtest.install_client(fake)
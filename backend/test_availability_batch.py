@@ -0,0 +1,61 @@
+"""
+Test POST /availability/batch against the single-spot endpoint
+"""
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+
+import db
+import loadtest
+import main
+from catalog import spot_catalog
+from fake_supabase import FakeSupabase
+from query_trace import query_count
+
+
+def test_batch_matches_single_spot_availability(monkeypatch):
+    dataset = loadtest.build_dataset(spots=20, users=2, bookings_per_spot=3)
+    loadtest.install_client(FakeSupabase(dataset))
+    client = TestClient(main.app)
+    monday = loadtest.bench_date()
+    dates = [monday.isoformat(), (monday + timedelta(days=1)).isoformat()]
+    spot_ids = [spot["id"] for spot in dataset["parking_spots_v2"]]
+    # Page through the 60 bookings in several requests
+    monkeypatch.setattr(db, "PAGE_SIZE", 25)
+
+    response = client.post("/availability/batch", json={"spot_ids": spot_ids, "dates": dates})
+    assert response.status_code == 200
+    # Spots, twelve pages of the 280 intervals, then three pages of bookings
+    assert query_count(response) == 1 + 12 + 3
+    results = response.json()
+    assert [(r["spot_id"], r["date"]) for r in results] == [(s, d) for s in spot_ids for d in dates]
+    for result in results:
+        single = client.get(f"/spots/{result['spot_id']}/availability/{result['date']}").json()
+        assert result["error"] is None
+        assert result["availability"] == single
+    assert results[0]["availability"] != results[1]["availability"]
+
+    spot_catalog.reload(db.get_client())
+    cached = client.post("/availability/batch", json={"spot_ids": spot_ids, "dates": dates})
+    assert cached.json() == results
+    assert query_count(cached) == 3
+    spot_catalog.clear()
+
+
+def test_batch_errors_and_limit(monkeypatch):
+    loadtest.install_client(FakeSupabase(loadtest.build_dataset(spots=2, users=2)))
+    client = TestClient(main.app)
+    day = loadtest.bench_date().isoformat()
+
+    results = client.post("/availability/batch", json={
+        "spot_ids": ["spot-00000", "missing", "spot-00000"], "dates": [day, "tomorrow"],
+    }).json()
+    assert len(results) == 4
+    assert results[0]["availability"]["day"] == "Monday"
+    assert results[1]["error"] == "Invalid date format. Use YYYY-MM-DD"
+    assert {r["error"] for r in results[2:]} == {"Parking spot not found"}
+
+    monkeypatch.setattr(main, "AVAILABILITY_BATCH_LIMIT", 3)
+    too_many = client.post("/availability/batch", json={"spot_ids": ["a", "b"], "dates": [day, "x"]})
+    assert too_many.status_code == 400
+    assert client.post("/availability/batch", json={"spot_ids": [], "dates": [day]}).json() == []
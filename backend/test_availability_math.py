@@ -0,0 +1,87 @@
+"""
+Test the availability math helpers used by the availability and booking endpoints
+"""
+import pytest
+
+from availability import (
+    minutes_to_time_str,
+    normalize_intervals,
+    parse_time_to_minutes,
+    row_minutes,
+    subtract_bookings,
+)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("9:00am", 540),
+    ("5:00 PM", 1020),
+    ("17:00", 1020),
+    ("12:00am", 0),
+    ("12:30pm", 750),
+])
+def test_parse_time_to_minutes(value, expected):
+    assert parse_time_to_minutes(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "25:00", "nine"])
+def test_parse_time_to_minutes_rejects_invalid(value):
+    with pytest.raises(ValueError):
+        parse_time_to_minutes(value)
+
+
+def test_minutes_to_time_str():
+    assert minutes_to_time_str(900) == "3:00 PM"
+    assert minutes_to_time_str(545) == "9:05 AM"
+
+
+def test_subtract_bookings_splits_base_interval():
+    # 9-5 with bookings 10-11 and 1-2
+    assert subtract_bookings([(540, 1020)], [(780, 840), (600, 660)]) == [
+        (540, 600), (660, 780), (840, 1020),
+    ]
+
+
+def test_subtract_bookings_clamps_to_window_and_merges_overlaps():
+    # Booking starting before the window and two overlapping bookings
+    assert subtract_bookings([(540, 720)], [(480, 570), (600, 660), (630, 690)]) == [
+        (570, 600), (690, 720),
+    ]
+
+
+def test_subtract_bookings_handles_split_hours():
+    assert subtract_bookings([(540, 720), (840, 1020)], [(700, 860)]) == [(540, 700), (860, 1020)]
+
+
+def test_subtract_bookings_fully_booked():
+    assert subtract_bookings([(540, 600)], [(500, 700)]) == []
+
+
+def test_normalize_intervals_merges_per_day_and_sorts():
+    merged = normalize_intervals([
+        {"day": "Tuesday", "start_time": "1:00pm", "end_time": "3:00pm"},
+        {"day": "monday", "start_time": "11:00", "end_time": "13:00"},
+        {"day": "Monday", "start_time": "9:00am", "end_time": "12:00pm"},
+        {"day": "Monday", "start_time": "1:00pm", "end_time": "2:00pm"},
+        {"day": "Monday", "start_time": "4:00pm", "end_time": "5:00pm"},
+        {"day": "Tuesday", "start_time": "9:00", "end_time": "10:00"},
+    ])
+    assert [(i["day"], i["start_minute"], i["end_minute"]) for i in merged] == [
+        ("Monday", 540, 840), ("Monday", 960, 1020), ("Tuesday", 540, 600), ("Tuesday", 780, 900),
+    ]
+    assert merged[0]["start_time"] == "9:00 AM" and merged[0]["end_time"] == "2:00 PM"
+    assert all(row_minutes(i) == (i["start_minute"], i["end_minute"]) for i in merged)
+
+
+@pytest.mark.parametrize("interval", [
+    {"day": "Someday", "start_time": "9:00", "end_time": "10:00"},
+    {"day": "Monday", "start_time": "nine", "end_time": "10:00"},
+    {"day": "Monday", "start_time": "10:00", "end_time": "10:00"},
+])
+def test_normalize_intervals_rejects_invalid(interval):
+    with pytest.raises(ValueError):
+        normalize_intervals([interval])
+
+
+def test_row_minutes_falls_back_to_time_strings():
+    assert row_minutes({"start_time": "9:00am", "end_time": "17:00"}) == (540, 1020)
+    assert row_minutes({"start_time": "x", "end_time": "y", "start_minute": 1, "end_minute": 2}) == (1, 2)
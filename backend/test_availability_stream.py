@@ -0,0 +1,139 @@
+"""
+Test server-sent availability updates
+"""
+import asyncio
+import json
+import threading
+
+from fastapi.testclient import TestClient
+
+import loadtest
+import main
+from availability_stream import AvailabilityHub, slot_delta
+from fake_supabase import FakeSupabase
+
+
+def slots(*pairs):
+    return [{"start_time": s, "end_time": e} for s, e in pairs]
+
+
+def test_slot_delta():
+    added, removed = slot_delta(slots(("8", "12")), slots(("8", "9"), ("10", "12")))
+    assert added == slots(("8", "9"), ("10", "12"))
+    assert removed == slots(("8", "12"))
+
+
+def test_hub_fans_out_one_delta_to_every_subscriber():
+    state = {"slots": slots(("8", "12"))}
+    calls = []
+
+    def compute(spot_id, date):
+        calls.append((spot_id, date))
+        return {"available_slots": state["slots"]}
+
+    async def scenario():
+        hub = AvailabilityHub(compute)
+        key = ("s1", "2030-01-07")
+        queues = [hub.subscribe(key) for _ in range(1000)]
+        hub._snapshots[key] = state["slots"]
+
+        state["slots"] = slots(("8", "9"))
+        # Writers call from threadpool threads
+        thread = threading.Thread(target=hub.notify_changed, args=key)
+        thread.start()
+        thread.join()
+        messages = [await asyncio.wait_for(q.get(), 1) for q in queues]
+
+        for q in queues:
+            hub.unsubscribe(key, q)
+        return hub, messages
+
+    hub, messages = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert len(set(messages)) == 1
+    data = json.loads(messages[0].split("data: ", 1)[1])
+    assert data["removed"] == slots(("8", "12"))
+    assert data["added"] == slots(("8", "9"))
+    assert hub.subscriber_count(("s1", "2030-01-07")) == 0
+
+
+def test_notify_without_subscribers_is_a_noop():
+    hub = AvailabilityHub(lambda spot_id, date: (_ for _ in ()).throw(AssertionError("computed")))
+    hub.notify_changed("s1", "2030-01-07")
+
+
+def test_full_queue_drops_oldest_event():
+    async def scenario():
+        hub = AvailabilityHub(lambda s, d: {"available_slots": []}, queue_size=1)
+        key = ("s1", "d")
+        queue = hub.subscribe(key)
+        hub._publish(key, {"available_slots": slots(("1", "2"))})
+        hub._publish(key, {"available_slots": slots(("3", "4"))})
+        return queue
+
+    queue = asyncio.run(scenario())
+    assert queue.qsize() == 1
+    assert '"3"' in queue.get_nowait()
+
+
+def test_change_during_snapshot_is_not_lost():
+    state = {"slots": slots(("8", "12"))}
+
+    async def scenario():
+        hub = AvailabilityHub(lambda s, d: {"available_slots": state["slots"]})
+        key = ("s1", "d")
+        queue = hub.subscribe(key)
+        snapshot = {"available_slots": state["slots"]}
+        # A booking lands after the snapshot was read but before streaming starts
+        state["slots"] = slots(("8", "9"))
+        hub.notify_changed(*key)
+        frames = hub.stream(key, queue, snapshot)
+        first = await frames.__anext__()
+        second = await asyncio.wait_for(frames.__anext__(), 1)
+        await frames.aclose()
+        return hub, first, second
+
+    hub, first, second = asyncio.run(scenario())
+    assert first.startswith("event: snapshot")
+    assert second.startswith("event: availability")
+    assert hub.subscriber_count(("s1", "d")) == 0
+
+
+def test_change_feed_rows_notify_the_hub(monkeypatch):
+    notified = []
+    monkeypatch.setattr(main.availability_hub, "notify_changed", lambda *key: notified.append(key))
+    main.change_feed.dispatch("bookings_v2", "INSERT", {"spot_id": "s1", "booking_date": "2030-01-07"}, None)
+    main.change_feed.dispatch("bookings_v2", "DELETE", None, {"spot_id": "s2", "booking_date": "2030-01-08"})
+    assert notified == [("s1", "2030-01-07"), ("s2", "2030-01-08")]
+
+
+def test_stream_endpoint_sends_snapshot():
+    loadtest.install_client(FakeSupabase(loadtest.build_dataset(spots=2, users=2)))
+    day = loadtest.bench_date().isoformat()
+    key = ("spot-00000", day)
+
+    async def first_frame():
+        response = await main.stream_availability(*key)
+        frames = response.body_iterator
+        frame = await frames.__anext__()
+        await frames.aclose()
+        return response, frame
+
+    response, frame = asyncio.run(first_frame())
+    assert response.media_type == "text/event-stream"
+    event, data = frame.strip().split("\n")
+    assert event == "event: snapshot"
+    payload = json.loads(data[len("data: "):])
+    assert payload["date"] == day
+    assert payload["available_slots"]
+    assert main.availability_hub.subscriber_count(key) == 0
+
+    client = TestClient(main.app)
+    assert client.get(f"/spots/missing/availability/{day}/stream").status_code == 404
+    assert main.availability_hub.subscriber_count(("missing", day)) == 0
+
+
+def test_stream_endpoint_refuses_unfed_multi_worker(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    day = loadtest.bench_date().isoformat()
+    assert TestClient(main.app).get(f"/spots/spot-00000/availability/{day}/stream").status_code == 503
@@ -0,0 +1,46 @@
+"""
+Test that POST /bookings finds conflicts with a ranged minute query
+"""
+import pytest
+
+import loadtest
+import main
+
+
+@pytest.fixture
+def app(fake_app):
+    # Spot 0 has bookings at 8-9, 11-12 and 14-15 on the bench date
+    client, fake = fake_app(spots=1, users=1, bookings_per_spot=3)
+    auth = {"Authorization": f"Bearer {main.create_access_token({'user_id': 1})}"}
+    return client, fake.tables, auth
+
+
+def book(client, auth, start, end):
+    return client.post("/bookings", headers=auth, json={
+        "spot_id": "spot-00000", "booking_date": loadtest.bench_date().isoformat(),
+        "start_time": start, "end_time": end,
+    })
+
+
+def test_overlapping_bookings_are_rejected_and_touching_ones_allowed(app):
+    client, dataset, auth = app
+    for start, end in [("8:30am", "9:30am"), ("10:00", "11:01"), ("14:15", "14:45"), ("13:00", "16:00")]:
+        response = book(client, auth, start, end)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "This time slot is already booked"
+
+    # Ends exactly when one booking starts and starts when another ends
+    assert book(client, auth, "9:00am", "11:00am").status_code == 201
+    created = dataset["bookings_v2"][-1]
+    assert (created["start_minute"], created["end_minute"]) == (540, 660)
+    assert book(client, auth, "10:00", "10:30").status_code == 400
+
+
+def test_cancelled_and_unparsed_bookings_do_not_conflict(app):
+    client, dataset, auth = app
+    dataset["bookings_v2"][0]["status"] = "cancelled"
+    # A legacy row whose times never parsed keeps null minutes
+    dataset["bookings_v2"][1].update(start_time="eleven", start_minute=None, end_minute=None)
+    assert book(client, auth, "8:00am", "9:00am").status_code == 201
+    assert book(client, auth, "11:00am", "12:00pm").status_code == 201
+    assert len(dataset["bookings_v2"]) == 5
@@ -0,0 +1,54 @@
+"""
+Test DELETE /bookings/{id} as a single conditional update
+"""
+import pytest
+
+import loadtest
+import main
+from query_trace import query_count
+
+
+def auth(user_id):
+    return {"Authorization": f"Bearer {main.create_access_token({'user_id': user_id})}"}
+
+
+@pytest.fixture
+def app(fake_app):
+    client, fake = fake_app(spots=2, users=2)
+    booked = client.post("/bookings", headers=auth(1), json={
+        "spot_id": "spot-00000",
+        "booking_date": loadtest.bench_date().isoformat(),
+        "start_time": "17:00",
+        "end_time": "18:00",
+    })
+    assert booked.status_code == 201
+    return client, fake.tables, booked.json()
+
+
+def test_cancel_is_one_update_and_frees_the_slot(app):
+    client, dataset, booking = app
+    url = f"/spots/{booking['spot_id']}/availability/{booking['booking_date']}"
+    before = client.get(url).json()
+
+    response = client.delete(f"/bookings/{booking['id']}", headers=auth(1))
+    assert response.status_code == 200
+    # User lookup for the token, the update itself and the host stats bump
+    assert query_count(response) == 3
+    row = next(b for b in dataset["bookings_v2"] if b["id"] == booking["id"])
+    assert row["status"] == "cancelled"
+    assert client.get(url).json() != before
+
+
+def test_failed_cancel_reports_why(app):
+    client, dataset, booking = app
+    assert client.delete("/bookings/missing", headers=auth(1)).status_code == 404
+
+    forbidden = client.delete(f"/bookings/{booking['id']}", headers=auth(2))
+    assert forbidden.status_code == 403
+    row = next(b for b in dataset["bookings_v2"] if b["id"] == booking["id"])
+    assert row["status"] == "confirmed"
+
+    assert client.delete(f"/bookings/{booking['id']}", headers=auth(1)).status_code == 200
+    again = client.delete(f"/bookings/{booking['id']}", headers=auth(1))
+    assert again.status_code == 400
+    assert again.json()["detail"] == "Booking is already cancelled"
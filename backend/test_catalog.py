@@ -0,0 +1,130 @@
+"""
+Test the in-memory spot catalog and GET /spots served from it
+"""
+import random
+
+from fastapi.testclient import TestClient
+
+import db
+import loadtest
+import main
+from catalog import SpotCatalog, spot_catalog
+from fake_supabase import FakeSupabase
+from query_trace import query_count
+
+
+def brute_force(spots, city=None, min_price=None, max_price=None, is_active=True):
+    return sorted(
+        (
+            s for s in spots
+            if (is_active is None or s["is_active"] == is_active)
+            and (not city or city.lower() in s["city"].lower())
+            and (min_price is None or s["price_per_hour"] >= min_price)
+            and (max_price is None or s["price_per_hour"] <= max_price)
+        ),
+        key=lambda s: (s["price_per_hour"], s["id"]),
+    )
+
+
+def test_combined_filters_match_a_full_scan():
+    data = loadtest.build_dataset(spots=500, users=1, bookings_per_spot=0)
+    rng = random.Random(7)
+    for spot in data["parking_spots_v2"]:
+        spot["is_active"] = rng.random() < 0.8
+    catalog = SpotCatalog()
+    catalog.load(data["parking_spots_v2"], data["availability_intervals_v2"])
+
+    for _ in range(200):
+        city = rng.choice([None, "tor", "Vancouver", "o", "nowhere"])
+        low = rng.choice([None, rng.uniform(0, 20)])
+        high = rng.choice([None, rng.uniform(10, 40)])
+        active = rng.choice([True, False, None])
+        expected = [s["id"] for s in brute_force(data["parking_spots_v2"], city, low, high, active)]
+        got = [s["id"] for s in catalog.query(city, low, high, active)]
+        assert got == expected, (city, low, high, active)
+
+
+def test_sort_limit_and_incremental_updates():
+    catalog = SpotCatalog()
+    catalog.load([], [])
+    for i, price in enumerate([5.0, 3.0, 9.0]):
+        catalog.upsert_spot({
+            "id": f"s{i}", "city": "Toronto", "price_per_hour": price,
+            "created_at": f"2030-01-0{i + 1}", "is_active": True,
+        })
+    assert [s["id"] for s in catalog.query(sort="-price_per_hour", limit=2)] == ["s2", "s0"]
+    assert [s["id"] for s in catalog.query(sort="-created_at")] == ["s2", "s1", "s0"]
+
+    catalog.upsert_spot({"id": "s1", "city": "Ottawa", "price_per_hour": 20.0,
+                         "created_at": "2030-01-02", "is_active": False})
+    assert [s["id"] for s in catalog.query(city="toronto")] == ["s0", "s2"]
+    assert [s["id"] for s in catalog.query(is_active=False)] == ["s1"]
+
+    catalog.add_intervals([{"id": 1, "spot_id": "s0", "day": "Monday", "start_time": "8:00am", "end_time": "9:00am"}])
+    assert len(catalog.intervals("s0")) == 1
+    assert catalog.remove_interval({"id": 1}) == "s0"
+    assert catalog.intervals("s0") == []
+
+    catalog.remove_spot("s0")
+    assert [s["id"] for s in catalog.query(min_price=0)] == ["s2"]
+
+
+def test_list_spots_uses_catalog_without_queries():
+    fake = FakeSupabase(loadtest.build_dataset(spots=20, users=1))
+    loadtest.install_client(fake)
+    client = TestClient(main.app)
+
+    from_db = client.get("/spots", params={"city": "o", "max_price": 25})
+    assert query_count(from_db) == 2
+
+    spot_catalog.reload(db.get_client())
+    from_catalog = client.get("/spots", params={"city": "o", "max_price": 25})
+    assert query_count(from_catalog) == 0
+    assert from_catalog.json() == from_db.json()
+
+    limited = client.get("/spots", params={"sort": "-price_per_hour", "limit": 3}).json()
+    assert len(limited) == 3
+    assert limited[0]["price_per_hour"] >= limited[-1]["price_per_hour"]
+    assert client.get("/spots", params={"sort": "street"}).status_code == 422
+
+
+def test_created_spot_is_listed_immediately():
+    fake = FakeSupabase(loadtest.build_dataset(spots=2, users=1))
+    loadtest.install_client(fake)
+    spot_catalog.reload(db.get_client())
+    client = TestClient(main.app)
+    auth = {"Authorization": f"Bearer {main.create_access_token({'user_id': 1})}"}
+
+    created = client.post("/spots", headers=auth, json={
+        "street": "1 Test St", "city": "Catalogville", "province": "ON", "postal_code": "A1A 1A1",
+        "country": "Canada", "lat": 43.0, "lng": -79.0, "price_per_hour": 4.5,
+        "availability_intervals": [{"day": "Monday", "start_time": "8:00am", "end_time": "5:00pm"}],
+    })
+    assert created.status_code == 201
+
+    response = client.get("/spots", params={"city": "catalogville"})
+    assert query_count(response) == 0
+    listed = response.json()
+    assert [s["id"] for s in listed] == [created.json()["id"]]
+    assert listed[0]["availability_intervals"][0]["day"] == "Monday"
+    loadtest.install_client(fake)
+
+
+def test_reload_pages_past_the_response_cap(monkeypatch):
+    data = loadtest.build_dataset(spots=30, users=1, bookings_per_spot=0)
+    # 30 spots and 420 intervals against a 100-row cap
+    monkeypatch.setattr(db, "PAGE_SIZE", 100)
+    catalog = SpotCatalog()
+    catalog.reload(FakeSupabase(data))
+    assert len(catalog) == 30
+    assert sum(len(catalog.intervals(s["id"])) for s in data["parking_spots_v2"]) == 420
+
+
+def test_listing_fallback_reads_intervals_in_chunks(monkeypatch):
+    loadtest.install_client(FakeSupabase(loadtest.build_dataset(spots=12, users=1, bookings_per_spot=0)))
+    monkeypatch.setattr(db, "IN_CHUNK_SIZE", 5)
+    response = TestClient(main.app).get("/spots?is_active=true")
+    assert len(response.json()) == 12
+    assert all(len(spot["availability_intervals"]) == 14 for spot in response.json())
+    # Spots, then one interval read per chunk of five spot ids
+    assert query_count(response) == 1 + 3
@@ -0,0 +1,109 @@
+"""
+Test negotiated response compression
+"""
+import gzip
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+import compression
+from compression import CompressionMiddleware, negotiate_encoding
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+
+@app.get("/large")
+def large():
+    return {"spots": [{"id": i, "city": "Vancouver"} for i in range(200)]}
+
+
+@app.get("/small")
+def small():
+    return {"ok": True}
+
+
+@app.get("/stream")
+def stream():
+    def chunks():
+        for i in range(5):
+            yield ("chunk %d " % i) * 50
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+@app.get("/events")
+def events():
+    return StreamingResponse(iter(["data: x\n\n" * 200]), media_type="text/event-stream")
+
+
+@app.get("/encoded")
+def encoded():
+    return PlainTextResponse("x" * 1000, headers={"Content-Encoding": "identity"})
+
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("", None),
+    ("gzip", "gzip"),
+    ("gzip, deflate", "gzip"),
+    ("deflate", None),
+    ("gzip;q=0", None),
+    ("*", "br" if compression.brotli else "gzip"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+def test_large_json_is_gzipped():
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json()["spots"][199]["id"] == 199
+
+
+def test_small_bodies_are_not_compressed():
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_streamed_responses_compress_incrementally():
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+    decompressor = zlib.decompressobj(31)
+    assert decompressor.decompress(raw).decode().count("chunk 4") == 50
+
+
+def test_gzip_stream_chunks_are_decodable_as_they_arrive():
+    compressor = compression.GzipCompressor(6)
+    decompressor = zlib.decompressobj(31)
+    first = compressor.compress(b"hello ", final=False)
+    assert decompressor.decompress(first) == b"hello "
+    rest = compressor.compress(b"world", final=True)
+    assert decompressor.decompress(rest) == b"world"
+
+
+def test_event_streams_and_encoded_responses_pass_through():
+    assert "content-encoding" not in client.get("/events", headers={"Accept-Encoding": "gzip"}).headers
+    assert client.get("/encoded", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "identity"
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="brotli not installed")
+def test_brotli_preferred_when_available():
+    response = client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.json()["spots"][0]["city"] == "Vancouver"
+
+
+def test_gzip_level_is_configurable():
+    payload = b'{"city": "Vancouver"}' * 500
+    fast = compression.GzipCompressor(1).compress(payload, final=True)
+    best = compression.GzipCompressor(9).compress(payload, final=True)
+    assert gzip.decompress(fast) == gzip.decompress(best) == payload
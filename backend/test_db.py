@@ -0,0 +1,35 @@
+"""
+Test lazy Supabase client construction in db.py
+"""
+import subprocess
+import sys
+
+import pytest
+
+import db
+from fake_supabase import FakeSupabase
+
+
+def test_importing_the_app_does_not_load_supabase_or_auth_libraries():
+    code = (
+        "import sys, main; "
+        "loaded = [m for m in ('supabase', 'bcrypt', 'jwt') if m in sys.modules]; "
+        "assert not loaded, loaded"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=db.os.path.dirname(db.__file__), check=True,
+                   env={"PATH": "", "SUPABASE_URL": "", "SUPABASE_KEY": ""})
+
+
+def test_get_client_requires_env(monkeypatch):
+    monkeypatch.setattr(db, "_client", None)
+    monkeypatch.setattr(db, "SUPABASE_URL", None)
+    with pytest.raises(RuntimeError, match="SUPABASE_URL"):
+        db.get_client()
+    # warm_client only logs
+    db.warm_client()
+
+
+def test_lazy_handle_resolves_the_current_client(monkeypatch):
+    monkeypatch.setattr(db, "_client", None)
+    db.set_client(FakeSupabase({"users_v2": [{"id": 1}]}))
+    assert db.supabase.table("users_v2").select("id").execute().data == [{"id": 1}]
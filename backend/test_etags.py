@@ -0,0 +1,102 @@
+"""
+Test ETag / If-None-Match handling for spot detail and availability
+"""
+import pytest
+
+import loadtest
+import main
+from query_trace import capture_queries
+from versions import DataVersions, etag_matches
+
+
+@pytest.fixture
+def app(fake_app):
+    client, fake = fake_app(spots=3, users=3)
+    token = main.create_access_token({"user_id": 1})
+    return client, fake, {"Authorization": f"Bearer {token}"}
+
+
+def test_etag_matches_weak_and_lists():
+    assert etag_matches('W/"abc"', 'W/"abc"')
+    assert etag_matches('"x", W/"abc"', 'W/"abc"')
+    assert not etag_matches("*", 'W/"abc"')
+    assert etag_matches("*", 'W/"abc"', exists=True)
+    assert not etag_matches('W/"abd"', 'W/"abc"')
+    assert not etag_matches(None, 'W/"abc"')
+
+
+def test_versions_change_etags():
+    versions = DataVersions(max_age_seconds=0)
+    spot_tag = versions.spot_etag("s1")
+    day_tag = versions.availability_etag("s1", "2030-01-07")
+    versions.bump_availability("s1", "2030-01-07")
+    assert versions.spot_etag("s1") == spot_tag
+    assert versions.availability_etag("s1", "2030-01-07") != day_tag
+    versions.bump_spot("s1")
+    assert versions.spot_etag("s1") != spot_tag
+
+
+def test_etags_are_per_resource():
+    versions = DataVersions(max_age_seconds=0)
+    assert versions.spot_etag("s1") != versions.spot_etag("s2")
+    assert versions.availability_etag("s1", "2030-01-07") != versions.availability_etag("s1", "2030-01-08")
+
+
+def test_wildcard_does_not_validate_missing_resources(app):
+    client, _, _ = app
+    star = {"If-None-Match": "*"}
+    assert client.get("/spots/does-not-exist", headers=star).status_code == 404
+    assert client.get("/spots/spot-00000/availability/not-a-date", headers=star).status_code == 400
+    assert client.get("/spots/spot-00000", headers=star).status_code == 304
+
+
+def test_multiple_workers_without_feed_use_content_etags(app, monkeypatch):
+    client, fake, _ = app
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    day = loadtest.bench_date().isoformat()
+    url = f"/spots/spot-00001/availability/{day}"
+
+    etag = client.get(url).headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    # A write made by another worker, which never bumps this worker's versions
+    with fake.lock:
+        fake.tables["bookings_v2"].append({
+            "id": 999999, "user_id": 2, "spot_id": "spot-00001", "booking_date": day,
+            "start_time": "17:00", "end_time": "18:00", "status": "confirmed",
+        })
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_spot_detail_returns_304_without_queries(app):
+    client, _, _ = app
+    first = client.get("/spots/spot-00000")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    with capture_queries() as trace:
+        second = client.get("/spots/spot-00000", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert trace.count == 0
+
+
+def test_booking_invalidates_availability_etag(app):
+    client, _, auth = app
+    day = (loadtest.bench_date()).isoformat()
+    url = f"/spots/spot-00001/availability/{day}"
+
+    etag = client.get(url).headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    booking = client.post("/bookings", headers=auth, json={
+        "spot_id": "spot-00001", "booking_date": day, "start_time": "17:00", "end_time": "18:00",
+    })
+    assert booking.status_code == 201
+    refreshed = client.get(url, headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != etag
+
+    etag = refreshed.headers["etag"]
+    assert client.delete(f"/bookings/{booking.json()['id']}", headers=auth).status_code == 200
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
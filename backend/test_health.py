@@ -0,0 +1,84 @@
+"""
+Test the background health prober and the /health, /health/live and /health/ready endpoints
+"""
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+import loadtest
+from fake_supabase import FakeSupabase
+from health import HealthProber
+from metrics import SUPABASE_QUERY_DURATION
+
+
+def test_prober_keeps_last_result_per_dependency():
+    prober = HealthProber(interval=60, timeout=1, stale_after=60)
+    prober.add_check("ok", lambda: None)
+    prober.add_check("broken", lambda: (_ for _ in ()).throw(RuntimeError("down")))
+
+    asyncio.run(prober.probe_once())
+
+    assert prober.dependency_status("ok")["ok"] is True
+    assert prober.dependency_status("broken")["error"] == "down"
+    assert prober.healthy() is False
+
+
+def test_prober_times_out_slow_checks():
+    prober = HealthProber(interval=60, timeout=0.05, stale_after=60)
+    prober.add_check("slow", lambda: time.sleep(0.2))
+    asyncio.run(prober.probe_once())
+    assert "timed out" in prober.dependency_status("slow")["error"]
+
+
+def test_stale_results_are_not_healthy():
+    prober = HealthProber(interval=60, timeout=1, stale_after=0)
+    prober.add_check("db", lambda: None)
+    asyncio.run(prober.probe_once())
+    time.sleep(0.01)
+    assert prober.dependency_status("db")["stale"] is True
+    assert prober.healthy() is False
+
+
+def test_readiness_waits_for_cache_warmup():
+    prober = HealthProber(interval=60, timeout=1, stale_after=60)
+    prober.add_check("db", lambda: None)
+    prober.register_warmup("catalog")
+    asyncio.run(prober.probe_once())
+    assert prober.healthy() and not prober.ready()
+    prober.mark_warm("catalog")
+    assert prober.ready()
+
+
+def test_health_endpoints_answer_from_memory():
+    import main
+
+    fake = FakeSupabase(loadtest.build_dataset(spots=2, users=2))
+    loadtest.install_client(fake)
+    asyncio.run(main.health_prober.probe_once())
+
+    client = TestClient(main.app)
+    before = SUPABASE_QUERY_DURATION.count("users_v2", "select")
+    for _ in range(5):
+        response = client.get("/health")
+        assert response.json()["status"] == "healthy"
+    assert client.get("/health/live").json() == {"status": "alive"}
+    assert client.get("/health/ready").status_code == 200
+    assert SUPABASE_QUERY_DURATION.count("users_v2", "select") == before
+
+
+def test_lifespan_marks_client_warm():
+    import main
+
+    async def run_lifespan():
+        async with main.app.router.lifespan_context(main.app):
+            # warm_client runs in a thread; give it a moment
+            for _ in range(100):
+                if main.health_prober.warmups.get("supabase_client"):
+                    break
+                await asyncio.sleep(0.01)
+            return dict(main.health_prober.warmups)
+
+    loadtest.install_client(FakeSupabase(loadtest.build_dataset(spots=1, users=1)))
+    assert asyncio.run(run_lifespan())["supabase_client"] is True
+    loadtest.install_client(FakeSupabase(loadtest.build_dataset(spots=1, users=1)))
@@ -0,0 +1,99 @@
+"""
+Test the vectorized occupancy heatmaps and GET /host/heatmap
+"""
+import random
+from datetime import date, timedelta
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import heatmap
+import loadtest
+import main
+from fake_supabase import FakeSupabase
+
+MONDAY = date(2030, 1, 7)
+
+
+def booking(spot_id, day, start, end, status="confirmed"):
+    return {"spot_id": spot_id, "booking_date": day.isoformat(), "start_time": start, "end_time": end, "status": status}
+
+
+def brute_force(bookings, spot_ids, first, last, bin_minutes):
+    bins = 1440 // bin_minutes
+    minutes = np.zeros((len(spot_ids), 7, 1440))
+    for row in bookings:
+        start = main.parse_time_to_minutes(row["start_time"])
+        end = main.parse_time_to_minutes(row["end_time"])
+        day = date.fromisoformat(row["booking_date"])
+        minutes[spot_ids.index(row["spot_id"]), day.weekday(), start:end] += 1
+    counts = np.zeros(7)
+    day = first
+    while day <= last:
+        counts[day.weekday()] += 1
+        day += timedelta(days=1)
+    binned = minutes.reshape(len(spot_ids), 7, bins, bin_minutes).sum(axis=3)
+    return np.minimum(binned / (counts[None, :, None] * bin_minutes), 1.0)
+
+
+def test_partial_bins_and_weekday_averaging():
+    rows = [
+        booking("a", MONDAY, "9:30am", "11:00am"),
+        booking("a", MONDAY + timedelta(weeks=1), "10:00", "10:15"),
+        booking("b", MONDAY + timedelta(days=2), "11:45pm", "11:59pm"),
+        booking("a", MONDAY, "bad", "10:00"),
+    ]
+    arrays = heatmap.to_arrays(rows, ["a", "b", "c"])
+    assert len(arrays) == 3
+    matrix = heatmap.occupancy(arrays, MONDAY, MONDAY + timedelta(days=13), 60)
+    assert matrix.shape == (3, 7, 24)
+    # Two Mondays in range: 30 of 120 minutes at 9am, 75 of 120 at 10am
+    assert matrix[0, 0, 9] == 0.25
+    assert matrix[0, 0, 10] == 0.625
+    assert abs(matrix[1, 2, 23] - 14 / 120) < 1e-12
+    assert matrix[2].sum() == 0
+
+    quarter = heatmap.occupancy(arrays, MONDAY, MONDAY + timedelta(days=13), 15)
+    assert quarter.shape == (3, 7, 96)
+    assert quarter[0, 0, 38] == 0.5 and quarter[0, 0, 40] == 1.0
+
+
+def test_matches_minute_by_minute_count():
+    rng = random.Random(3)
+    spot_ids = [f"s{i}" for i in range(40)]
+    rows = []
+    for _ in range(2000):
+        start = rng.randrange(0, 1400)
+        end = rng.randrange(start + 1, min(1440, start + 600) + 1)
+        rows.append(booking(
+            rng.choice(spot_ids), MONDAY + timedelta(days=rng.randrange(28)),
+            f"{start // 60}:{start % 60:02d}", f"{end // 60}:{end % 60:02d}" if end < 1440 else "23:59",
+        ))
+    first, last = MONDAY, MONDAY + timedelta(days=27)
+    arrays = heatmap.to_arrays(rows, spot_ids)
+    for bin_minutes in heatmap.RESOLUTIONS:
+        expected = brute_force(rows, spot_ids, first, last, bin_minutes)
+        assert np.allclose(heatmap.occupancy(arrays, first, last, bin_minutes), expected)
+
+
+def test_host_heatmap_endpoint():
+    dataset = loadtest.build_dataset(spots=6, users=2, bookings_per_spot=2)
+    loadtest.install_client(FakeSupabase(dataset))
+    client = TestClient(main.app)
+    host_id = dataset["parking_spots_v2"][0]["host_id"]
+    own = sorted(s["id"] for s in dataset["parking_spots_v2"] if s["host_id"] == host_id)
+    day = loadtest.bench_date()
+    auth = {"Authorization": f"Bearer {main.create_access_token({'user_id': host_id})}"}
+
+    response = client.get("/host/heatmap", headers=auth, params={"weeks": 1, "end": (day + timedelta(days=6)).isoformat()})
+    assert response.status_code == 200
+    body = response.json()
+    assert sorted(body["heatmaps"]) == own
+    grid = body["heatmaps"][own[0]]
+    assert len(grid) == 7 and len(grid[0]) == 24
+    # Generated bookings are 8-9am and 11am-12pm on the Monday
+    assert grid[0][8] == 1.0 and grid[0][11] == 1.0 and grid[0][9] == 0.0
+    assert sum(map(sum, grid[1:])) == 0
+
+    bad = client.get("/host/heatmap", headers=auth, params={"bin_minutes": 30})
+    assert bad.status_code == 400
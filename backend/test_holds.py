@@ -0,0 +1,116 @@
+"""
+Test booking holds: hold, confirm, expiry and restart
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import loadtest
+import main
+from timers import TimerWheel
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+CLOCK = Clock()
+
+
+@pytest.fixture(autouse=True)
+def hold_timers(monkeypatch):
+    """A wheel per test, driven by a manual clock"""
+    wheel = TimerWheel(clock=CLOCK)
+    monkeypatch.setattr(main, "hold_timers", wheel)
+    return wheel
+
+
+@pytest.fixture
+def app(fake_app):
+    client, fake = fake_app(spots=1, users=2, bookings_per_spot=0)
+    auth = {"Authorization": f"Bearer {main.create_access_token({'user_id': 1})}"}
+    return client, fake.tables, auth
+
+
+def slot(start="9:00", end="10:00"):
+    return {"spot_id": "spot-00000", "booking_date": loadtest.bench_date().isoformat(),
+            "start_time": start, "end_time": end}
+
+
+def row(dataset, booking_id):
+    return next(b for b in dataset["bookings_v2"] if b["id"] == booking_id)
+
+
+def expire_now(dataset, hold_timers, booking_id):
+    """Move the hold's expiry into the past and run its timer"""
+    row(dataset, booking_id)["expires_at"] = (datetime.utcnow() - timedelta(seconds=1)).isoformat()
+    CLOCK.now += main.HOLD_TTL_SECONDS + 2 * hold_timers.tick
+    hold_timers.advance()
+
+
+def test_hold_blocks_the_slot_until_confirmed(app, hold_timers):
+    client, dataset, auth = app
+    held = client.post("/bookings/holds", headers=auth, json=slot())
+    assert held.status_code == 201
+    hold = held.json()
+    assert hold["status"] == "pending" and hold["expires_at"] > hold["created_at"]
+    assert hold["id"] in hold_timers
+    assert client.post("/bookings", headers=auth, json=slot("9:30", "10:30")).status_code == 400
+
+    other = {"Authorization": f"Bearer {main.create_access_token({'user_id': 2})}"}
+    assert client.post(f"/bookings/{hold['id']}/confirm", headers=other).status_code == 403
+    confirmed = client.post(f"/bookings/{hold['id']}/confirm", headers=auth)
+    assert confirmed.status_code == 200
+    assert confirmed.json()["status"] == "confirmed" and confirmed.json()["expires_at"] is None
+    assert hold["id"] not in hold_timers
+    assert client.post(f"/bookings/{hold['id']}/confirm", headers=auth).status_code == 400
+
+    # A confirmed booking outlives the hold's deadline
+    expire_now(dataset, hold_timers, hold["id"])
+    assert row(dataset, hold["id"])["status"] == "confirmed"
+
+
+def test_abandoned_hold_expires_and_frees_the_slot(app, hold_timers):
+    client, dataset, auth = app
+    hold = client.post("/bookings/holds", headers=auth, json=slot()).json()
+    url = f"/spots/spot-00000/availability/{slot()['booking_date']}"
+    assert {"start_time": "9:00 AM", "end_time": "10:00 AM"} not in client.get(url).json()["available_slots"]
+
+    expire_now(dataset, hold_timers, hold["id"])
+    assert row(dataset, hold["id"])["status"] == "expired"
+    assert hold["id"] not in hold_timers
+    assert client.post(f"/bookings/{hold['id']}/confirm", headers=auth).status_code == 409
+    assert client.post("/bookings", headers=auth, json=slot()).status_code == 201
+
+
+def test_pending_holds_are_rescheduled_after_a_restart(app, hold_timers):
+    client, dataset, auth = app
+    hold = client.post("/bookings/holds", headers=auth, json=slot()).json()
+    cancelled = client.post("/bookings/holds", headers=auth, json=slot("11:00", "12:00")).json()
+    client.delete(f"/bookings/{cancelled['id']}", headers=auth)
+    assert cancelled["id"] not in hold_timers
+    hold_timers.cancel(hold["id"])
+
+    assert main.schedule_pending_holds() == 1
+    assert hold["id"] in hold_timers
+    expire_now(dataset, hold_timers, hold["id"])
+    assert row(dataset, hold["id"])["status"] == "expired"
+    assert row(dataset, cancelled["id"])["status"] == "cancelled"
+
+
+def test_cancelling_an_expired_hold_is_rejected_without_touching_stats(app, hold_timers):
+    client, dataset, auth = app
+    hold = client.post("/bookings/holds", headers=auth, json=slot()).json()
+    expire_now(dataset, hold_timers, hold["id"])
+    stats = [dict(r) for r in dataset.get("spot_daily_stats_v2", [])]
+    assert [r["booking_count"] for r in stats] == [0]
+
+    response = client.delete(f"/bookings/{hold['id']}", headers=auth)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Booking hold has expired"
+    assert row(dataset, hold["id"])["status"] == "expired"
+    assert [dict(r) for r in dataset.get("spot_daily_stats_v2", [])] == stats
@@ -0,0 +1,121 @@
+"""
+Test the host dashboard aggregates, their incremental upkeep and rebuild
+"""
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+
+import db
+import host_stats
+import loadtest
+import main
+from fake_supabase import FakeSupabase
+from query_trace import query_count
+
+
+def auth(user_id):
+    return {"Authorization": f"Bearer {main.create_access_token({'user_id': user_id})}"}
+
+
+def stats(dataset):
+    return sorted(
+        (row["host_id"], row["spot_id"], row["day"], row["booked_minutes"], row["revenue"], row["booking_count"])
+        for row in dataset.get(host_stats.TABLE, [])
+        if row["booking_count"]
+    )
+
+
+def test_rebuild_pages_through_bookings(monkeypatch):
+    dataset = loadtest.build_dataset(spots=5, users=3, bookings_per_spot=3)
+    dataset["bookings_v2"][0]["status"] = "cancelled"
+    loadtest.install_client(FakeSupabase(dataset))
+    monkeypatch.setattr(db, "PAGE_SIZE", 4)
+
+    assert host_stats.rebuild(db.get_client()) == 5
+    hosts = {spot["id"]: spot["host_id"] for spot in dataset["parking_spots_v2"]}
+    day = loadtest.bench_date().isoformat()
+    first = next(row for row in dataset[host_stats.TABLE] if row["spot_id"] == "spot-00000")
+    assert (first["host_id"], first["day"], first["booked_minutes"], first["booking_count"]) == (
+        hosts["spot-00000"], day, 120, 2
+    )
+    # A second rebuild replaces rather than adds
+    assert host_stats.rebuild(db.get_client()) == 5
+    assert len(dataset[host_stats.TABLE]) == 5
+
+
+def test_bookings_and_cancellations_update_aggregates_incrementally():
+    dataset = loadtest.build_dataset(spots=3, users=3, bookings_per_spot=1)
+    loadtest.install_client(FakeSupabase(dataset))
+    host_stats.rebuild(db.get_client())
+    client = TestClient(main.app)
+    day = loadtest.bench_date().isoformat()
+
+    booked = client.post("/bookings", headers=auth(1), json={
+        "spot_id": "spot-00001", "booking_date": day, "start_time": "1:00pm", "end_time": "2:30pm",
+    })
+    assert booked.status_code == 201
+    row = next(r for r in dataset[host_stats.TABLE] if r["spot_id"] == "spot-00001")
+    assert (row["booked_minutes"], row["booking_count"]) == (150, 2)
+
+    assert client.delete(f"/bookings/{booked.json()['id']}", headers=auth(1)).status_code == 200
+    assert client.delete(f"/bookings/booking-00002-0", headers=auth(dataset["bookings_v2"][2]["user_id"])).status_code == 200
+    incremental = stats(dataset)
+
+    host_stats.rebuild(db.get_client())
+    assert stats(dataset) == incremental
+    assert not any(row[1] == "spot-00002" for row in incremental)
+
+
+def test_dashboard_reports_weekly_revenue_and_occupancy():
+    dataset = loadtest.build_dataset(spots=4, users=2, bookings_per_spot=2)
+    for spot in dataset["parking_spots_v2"]:
+        spot["host_id"] = 1
+    loadtest.install_client(FakeSupabase(dataset))
+    host_stats.rebuild(db.get_client())
+    client = TestClient(main.app)
+    monday = loadtest.bench_date()
+
+    response = client.get("/host/dashboard", headers=auth(1), params={
+        "start": (monday - timedelta(days=3)).isoformat(), "weeks": 2,
+    })
+    assert response.status_code == 200
+    assert query_count(response) == 4
+    body = response.json()
+    assert body["start"] == (monday - timedelta(weeks=1)).isoformat()
+    assert len(body["spots"]) == 4
+    spot = body["spots"][0]
+    # Two one-hour bookings; 11 open hours on each of the 7 generated days
+    open_minutes = 11 * 60 * len(loadtest.DAYS)
+    assert [w["booked_minutes"] for w in spot["weeks"]] == [0, 120]
+    assert spot["weeks"][1]["available_minutes"] == open_minutes
+    assert spot["weeks"][1]["occupancy"] == round(120 / open_minutes, 4)
+    assert spot["revenue"] == round(2 * dataset["parking_spots_v2"][0]["price_per_hour"], 2)
+    assert body["bookings"] == 8
+
+    other_host = client.get("/host/dashboard", headers=auth(2)).json()
+    assert other_host["spots"] == [] and other_host["revenue"] == 0
+    assert client.get("/host/dashboard", headers=auth(1), params={"start": "soon"}).status_code == 400
+
+
+def test_dashboard_pages_through_stats_rows(monkeypatch):
+    dataset = loadtest.build_dataset(spots=3, users=1, bookings_per_spot=1)
+    monday = loadtest.bench_date()
+    # Same spots on several days, so pages break inside a spot as well as between spots
+    for offset in range(1, 4):
+        for booking in list(dataset["bookings_v2"][:3]):
+            dataset["bookings_v2"].append({
+                **booking, "id": f"{booking['id']}-{offset}",
+                "booking_date": (monday + timedelta(days=offset)).isoformat(),
+            })
+    loadtest.install_client(FakeSupabase(dataset))
+    host_stats.rebuild(db.get_client())
+    client = TestClient(main.app)
+    params = {"start": monday.isoformat(), "weeks": 1}
+    whole = client.get("/host/dashboard", headers=auth(1), params=params).json()
+    assert whole["bookings"] == 12
+
+    monkeypatch.setattr(db, "PAGE_SIZE", 5)
+    paged = client.get("/host/dashboard", headers=auth(1), params=params)
+    # User, spots, nine pages of their 42 intervals, then three pages of the 12 (spot, day) rows
+    assert query_count(paged) == 2 + 9 + 3
+    assert paged.json() == whole
@@ -0,0 +1,177 @@
+"""
+Test Idempotency-Key handling on POST /bookings and POST /spots
+"""
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import loadtest
+import main
+from fake_supabase import FakeSupabase
+from idempotency import IdempotencyKeyReused, IdempotencyStore, RequestInProgress, fingerprint
+from query_trace import query_count
+from shared_cache import SharedCache
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "idempotency_store", IdempotencyStore())
+    dataset = loadtest.build_dataset(spots=2, users=2)
+    loadtest.install_client(FakeSupabase(dataset))
+    return TestClient(main.app), dataset
+
+
+def auth(user_id=1):
+    return {"Authorization": f"Bearer {main.create_access_token({'user_id': user_id})}"}
+
+
+def booking_body(start="17:00", end="18:00"):
+    return {
+        "spot_id": "spot-00000",
+        "booking_date": loadtest.bench_date().isoformat(),
+        "start_time": start,
+        "end_time": end,
+    }
+
+
+def test_retry_is_replayed_without_queries(client):
+    client, dataset = client
+    headers = {**auth(), "Idempotency-Key": "abc"}
+    before = len(dataset["bookings_v2"])
+
+    first = client.post("/bookings", headers=headers, json=booking_body())
+    assert first.status_code == 201
+    assert "idempotent-replayed" not in first.headers
+
+    retry = client.post("/bookings", headers=headers, json=booking_body())
+    assert retry.status_code == 201
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    # The scope comes from the verified token, so not even the user is looked up
+    assert query_count(retry) == 0
+    assert len(dataset["bookings_v2"]) == before + 1
+
+    # Keys are per user
+    other = client.post("/bookings", headers={**auth(2), "Idempotency-Key": "abc"}, json=booking_body("19:00", "20:00"))
+    assert other.status_code == 201
+    assert other.json()["id"] != first.json()["id"]
+
+
+def test_key_reused_with_different_body_is_rejected(client):
+    client, _ = client
+    headers = {**auth(), "Idempotency-Key": "abc"}
+    assert client.post("/bookings", headers=headers, json=booking_body()).status_code == 201
+    reused = client.post("/bookings", headers=headers, json=booking_body("19:00", "20:00"))
+    assert reused.status_code == 422
+
+
+def test_client_errors_are_replayed(client):
+    client, _ = client
+    headers = {**auth(), "Idempotency-Key": "bad"}
+    first = client.post("/bookings", headers=headers, json=booking_body("18:00", "17:00"))
+    assert first.status_code == 400
+    retry = client.post("/bookings", headers=headers, json=booking_body("18:00", "17:00"))
+    assert retry.status_code == 400
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+
+
+def test_spot_creation_and_key_validation(client):
+    client, dataset = client
+    body = {
+        "street": "1 Main St", "city": "Vancouver", "province": "BC", "postal_code": "V5K 0A1",
+        "country": "Canada", "lat": 49.28, "lng": -123.12, "price_per_hour": 4.5,
+        "availability_intervals": [{"day": "Monday", "start_time": "08:00", "end_time": "18:00"}],
+    }
+    headers = {**auth(), "Idempotency-Key": "spot-1"}
+    before = len(dataset["parking_spots_v2"])
+    first = client.post("/spots", headers=headers, json=body)
+    retry = client.post("/spots", headers=headers, json=body)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json()["id"] == first.json()["id"]
+    assert query_count(retry) == 0
+    assert len(dataset["parking_spots_v2"]) == before + 1
+
+    too_long = client.post("/spots", headers={**auth(), "Idempotency-Key": "k" * 256}, json=body)
+    assert too_long.status_code == 400
+
+
+def test_concurrent_duplicate_waits_for_the_original():
+    store = IdempotencyStore(wait_seconds=5)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def handler():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 201, {"id": "b1"}
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(store.run("k", "fp", handler)))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=lambda: results.append(store.run("k", "fp", handler)))
+    second.start()
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert len(calls) == 1
+    assert sorted(replayed for _, replayed in results) == [False, True]
+    assert all(response == (201, {"id": "b1"}) for response, _ in results)
+
+
+def test_in_progress_and_mismatch_errors():
+    store = IdempotencyStore(wait_seconds=0.01)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return 201, {}
+
+    thread = threading.Thread(target=lambda: store.run("k", "fp", slow))
+    thread.start()
+    started.wait(5)
+    try:
+        with pytest.raises(RequestInProgress):
+            store.run("k", "fp", lambda: (201, {}))
+        with pytest.raises(IdempotencyKeyReused):
+            store.run("k", "other", lambda: (201, {}))
+    finally:
+        release.set()
+        thread.join(5)
+
+
+def test_server_errors_are_not_stored():
+    store = IdempotencyStore()
+    assert store.run("k", "fp", lambda: (503, {"detail": "down"})) == ((503, {"detail": "down"}), False)
+    with pytest.raises(RuntimeError):
+        store.run("k", "fp", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    assert store.run("k", "fp", lambda: (201, {"id": 1})) == ((201, {"id": 1}), False)
+    assert store.run("k", "fp", lambda: (201, {"id": 2})) == ((201, {"id": 1}), True)
+
+
+def test_lru_bound_and_expiry():
+    store = IdempotencyStore(max_keys=2)
+    for key in ("a", "b", "c"):
+        store.run(key, "fp", lambda: (201, {}))
+    assert len(store) == 2
+    assert store.run("a", "fp", lambda: (201, {"again": True}))[1] is False
+
+    expired = IdempotencyStore(ttl=-1)
+    expired.run("k", "fp", lambda: (201, {"n": 1}))
+    assert expired.run("k", "fp", lambda: (201, {"n": 2})) == ((201, {"n": 2}), False)
+
+
+def test_replayed_by_another_worker_through_shared_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    worker_a = IdempotencyStore(shared=SharedCache(path))
+    worker_b = IdempotencyStore(shared=SharedCache(path))
+    fp = fingerprint({"spot_id": "s1"})
+    worker_a.run("k", fp, lambda: (201, {"id": "b1"}))
+    assert worker_b.run("k", fp, lambda: (201, {"id": "b2"})) == ((201, {"id": "b1"}), True)
+    with pytest.raises(IdempotencyKeyReused):
+        IdempotencyStore(shared=SharedCache(path)).run("k", fingerprint({}), lambda: (201, {}))
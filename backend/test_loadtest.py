@@ -0,0 +1,47 @@
+"""
+Smoke-test the in-process load-test suite and the FakeSupabase stand-in
+"""
+import asyncio
+
+import loadtest
+from fake_supabase import FakeSupabase
+
+
+def test_fake_supabase_filters_and_writes():
+    fake = FakeSupabase({"spots": [
+        {"id": 1, "city": "Vancouver", "price": 5},
+        {"id": 2, "city": "North Vancouver", "price": 12},
+        {"id": 3, "city": "Burnaby", "price": 8},
+    ]})
+
+    rows = fake.table("spots").select("id").ilike("city", "%vancouver%").lte("price", 10).execute().data
+    assert rows == [{"id": 1}]
+
+    fake.table("spots").update({"price": 9}).eq("id", 2).execute()
+    rows = fake.table("spots").select("*").in_("id", [2, 3]).order("price", desc=True).limit(1).execute().data
+    assert rows[0]["id"] == 2
+
+    inserted = fake.table("spots").insert({"city": "Surrey", "price": 4}).execute().data
+    assert inserted[0]["id"] == 4
+
+
+def test_loadtest_report_has_percentiles_per_endpoint():
+    args = loadtest.parse_args(["--latency-ms", "0", "--requests", "20", "--concurrency", "4", "--spots", "10"])
+    report = asyncio.run(loadtest.run(args))
+
+    assert set(report["scenarios"]) == {"search", "availability", "booking_contention"}
+    search = report["scenarios"]["search"]["endpoints"]["GET /spots"]
+    assert search["requests"] == 20
+    assert search["errors"] == 0
+    assert search["p50_ms"] <= search["p95_ms"] <= search["p99_ms"]
+    assert "double_bookings" in report["scenarios"]["booking_contention"]
+
+
+def test_booking_contention_never_double_books():
+    # Enough latency between the conflict query and the insert for requests to interleave
+    args = loadtest.parse_args([
+        "--scenario", "booking_contention", "--latency-ms", "5", "--jitter", "0.5",
+        "--requests", "60", "--concurrency", "16", "--spots", "5", "--hot-spots", "1",
+    ])
+    report = asyncio.run(loadtest.run(args))
+    assert report["scenarios"]["booking_contention"]["double_bookings"] == 0
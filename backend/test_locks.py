@@ -0,0 +1,83 @@
+"""
+Test striped per-spot locks
+"""
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import loadtest
+import main
+from fake_supabase import FakeSupabase
+from locks import LOCK_ACQUISITIONS, LockTimeout, StripedLock
+
+
+def contended() -> float:
+    return LOCK_ACQUISITIONS.value("contended")
+
+
+def test_same_spot_is_serialized_and_contention_counted():
+    locks = StripedLock(stripes=8)
+    inside, overlaps = [0], [0]
+    before = contended()
+
+    def attempt():
+        with locks.hold("spot-1"):
+            inside[0] += 1
+            if inside[0] > 1:
+                overlaps[0] += 1
+            time.sleep(0.005)
+            inside[0] -= 1
+
+    threads = [threading.Thread(target=attempt) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert overlaps[0] == 0
+    assert contended() > before
+
+
+def test_spots_on_different_stripes_proceed_in_parallel():
+    locks = StripedLock(stripes=64)
+    other = next(f"spot-{i}" for i in range(100) if locks.stripe(f"spot-{i}") != locks.stripe("spot-0"))
+    with locks.hold("spot-0"):
+        acquired = threading.Event()
+
+        def attempt():
+            with locks.hold(other):
+                acquired.set()
+
+        thread = threading.Thread(target=attempt)
+        thread.start()
+        assert acquired.wait(1.0)
+        thread.join()
+    assert locks.stripe("spot-0") == StripedLock(stripes=64).stripe("spot-0")
+
+
+def test_waiting_past_the_timeout_raises():
+    locks = StripedLock(stripes=1, timeout=0.01)
+    with locks.hold("spot-1"):
+        with pytest.raises(LockTimeout):
+            with locks.hold("spot-2"):
+                pass
+    with locks.hold("spot-2"):
+        pass
+    assert LOCK_ACQUISITIONS.value("timeout") >= 1
+
+
+def test_booking_stuck_behind_a_held_lock_gets_503(monkeypatch):
+    loadtest.install_client(FakeSupabase(loadtest.build_dataset(spots=1, users=1, bookings_per_spot=0)))
+    locks = StripedLock(timeout=0.01)
+    monkeypatch.setattr(main, "booking_locks", locks)
+    client = TestClient(main.app)
+    auth = {"Authorization": f"Bearer {main.create_access_token({'user_id': 1})}"}
+    body = {"spot_id": "spot-00000", "booking_date": loadtest.bench_date().isoformat(),
+            "start_time": "9:00", "end_time": "10:00"}
+
+    with locks.hold("spot-00000"):
+        response = client.post("/bookings", headers=auth, json=body)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert client.post("/bookings", headers=auth, json=body).status_code == 201
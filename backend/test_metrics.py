@@ -0,0 +1,95 @@
+"""
+Test the Prometheus metrics registry, Supabase query instrumentation and /metrics endpoint
+"""
+from fastapi.testclient import TestClient
+
+from db import InstrumentedClient
+from metrics import Counter, Histogram, Registry, SUPABASE_QUERY_DURATION, SUPABASE_QUERY_ERRORS
+
+
+class FakeBuilder:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def select(self, *args):
+        self.calls.append("select")
+        return self
+
+    def update(self, *args):
+        self.calls.append("update")
+        return self
+
+    def eq(self, *args):
+        self.calls.append("eq")
+        return self
+
+    def execute(self):
+        if self.fail:
+            raise RuntimeError("boom")
+        return self.calls
+
+
+class FakeClient:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def table(self, name):
+        return FakeBuilder(self.fail)
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0)))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5.0, "/a")
+
+    text = registry.render()
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+
+
+def test_counter_escapes_label_values():
+    registry = Registry()
+    counter = registry.register(Counter("events_total", "Events", ("name",)))
+    counter.inc('say "hi"', amount=2)
+    assert 'events_total{name="say \\"hi\\""} 2' in registry.render()
+
+
+def test_instrumented_client_records_table_and_operation():
+    client = InstrumentedClient(FakeClient())
+    before = SUPABASE_QUERY_DURATION.count("widgets", "update")
+
+    result = client.table("widgets").update({"a": 1}).eq("id", 1).execute()
+
+    assert result == ["update", "eq"]
+    assert SUPABASE_QUERY_DURATION.count("widgets", "update") == before + 1
+
+
+def test_instrumented_client_counts_errors():
+    client = InstrumentedClient(FakeClient(fail=True))
+    before = SUPABASE_QUERY_ERRORS.value("widgets", "select")
+    try:
+        client.table("widgets").select("*").execute()
+    except RuntimeError:
+        pass
+    assert SUPABASE_QUERY_ERRORS.value("widgets", "select") == before + 1
+
+
+def test_metrics_endpoint_reports_route_templates():
+    from main import app
+
+    client = TestClient(app)
+    client.get("/")
+    client.get("/no-such-route")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"}' in response.text
+    assert 'route="unmatched",status="404"' in response.text
+    assert 'threadpool_tokens{state="total"}' in response.text
@@ -0,0 +1,43 @@
+"""
+Test the microbenchmark harness's regression check and baseline file handling
+"""
+import microbench
+
+
+def test_compare_flags_only_regressions_beyond_threshold():
+    baseline = {"fast": {"best_ms": 10.0}, "slow": {"best_ms": 10.0}}
+    results = {"fast": {"best_ms": 12.0}, "slow": {"best_ms": 13.0}, "new": {"best_ms": 1.0}}
+    regressions = microbench.compare(results, baseline, threshold=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("slow:")
+
+
+def test_save_and_load_baseline_round_trip(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    microbench.save_baseline(path, {"a": {"best_ms": 1.5, "median_ms": 2.0, "repeat": 3}}, 10.0)
+    microbench.save_baseline(path, {"b": {"best_ms": 3.0, "median_ms": 3.0, "repeat": 3}}, 12.0)
+    assert set(microbench.load_baseline(path)) == {"a", "b"}
+    document = microbench.load_baseline_document(path)
+    assert document["calibration_ms"] == 12.0
+    assert microbench.platform_mismatch(document) == []
+
+
+def test_compare_scales_baseline_by_calibration():
+    baseline = {"x": {"best_ms": 10.0}}
+    # This machine is twice as slow at the calibration loop
+    assert microbench.compare({"x": {"best_ms": 19.0}}, baseline, threshold=0.25, scale=2.0) == []
+    assert microbench.compare({"x": {"best_ms": 26.0}}, baseline, threshold=0.25, scale=2.0)
+
+
+def test_foreign_baseline_is_not_compared(tmp_path, capsys):
+    path = tmp_path / "baseline.json"
+    path.write_text('{"python": "2.7.18", "machine": "sparc", "calibration_ms": 1.0,'
+                    ' "benchmarks": {"parse_time_to_minutes": {"best_ms": 0.0001}}}')
+    assert microbench.main(["--baseline", str(path), "--repeat", "1", "--only", "parse_time"]) == 0
+    assert "different platform" in capsys.readouterr().out
+
+
+def test_every_benchmark_runs():
+    results = microbench.run_benchmarks(list(microbench.BENCHMARKS), repeat=1)
+    assert set(results) == set(microbench.BENCHMARKS)
+    assert all(r["best_ms"] > 0 for r in results.values())
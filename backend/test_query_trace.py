@@ -0,0 +1,79 @@
+"""
+Test per-request query tracing, the Server-Timing header and query budgets
+"""
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import query_trace
+from db import InstrumentedClient
+from query_trace import QueryTraceMiddleware, capture_queries
+
+
+class FakeBuilder:
+    def select(self, *args):
+        return self
+
+    def eq(self, *args):
+        return self
+
+    def execute(self):
+        return []
+
+
+class FakeClient:
+    def table(self, name):
+        return FakeBuilder()
+
+
+client = InstrumentedClient(FakeClient())
+
+app = FastAPI()
+app.add_middleware(QueryTraceMiddleware)
+
+
+@app.get("/items/{item_id}")
+def get_item(item_id: int):
+    # Sync handler: runs in the threadpool, like the real endpoints
+    for _ in range(item_id):
+        client.table("items").select("*").eq("id", item_id).execute()
+    return {"id": item_id}
+
+
+def test_capture_queries_counts_each_execute():
+    with capture_queries() as trace:
+        client.table("items").select("*").execute()
+        client.table("owners").select("*").execute()
+    assert trace.count == 2
+    assert trace.by_table() == {"items.select": 1, "owners.select": 1}
+
+
+def test_queries_outside_a_trace_are_ignored():
+    client.table("items").select("*").execute()
+    with capture_queries() as trace:
+        pass
+    assert trace.count == 0
+
+
+def test_server_timing_header_reports_query_count():
+    response = TestClient(app).get("/items/3")
+    assert response.status_code == 200
+    assert 'desc="3 queries"' in response.headers["server-timing"]
+    assert response.headers["server-timing"].startswith("db;dur=")
+
+
+def test_budget_warning_uses_route_template(monkeypatch, caplog):
+    monkeypatch.setitem(query_trace.ROUTE_QUERY_BUDGETS, "GET /items/{item_id}", 2)
+    with caplog.at_level(logging.WARNING, logger="query_trace"):
+        TestClient(app).get("/items/2")
+        assert not caplog.records
+        TestClient(app).get("/items/3")
+    assert "Query budget exceeded for GET /items/{item_id}: 3 queries (budget 2)" in caplog.text
+
+
+def test_parse_budgets():
+    assert query_trace._parse_budgets("GET /spots=2, POST  /bookings=5,bad") == {
+        "GET /spots": 2,
+        "POST /bookings": 5,
+    }
@@ -0,0 +1,81 @@
+"""
+Test booking prices and POST /quotes/batch
+"""
+import pytest
+
+import db
+import loadtest
+import main
+import quotes
+from catalog import spot_catalog
+from query_trace import query_count
+
+
+@pytest.fixture
+def app(fake_app):
+    client, fake = fake_app(spots=5, users=2, bookings_per_spot=0)
+    fake.tables["parking_spots_v2"][4]["is_active"] = False
+    return client, fake.tables
+
+
+def test_batch_quotes_match_booking_price_with_per_item_errors(app):
+    client, dataset = app
+    day = loadtest.bench_date().isoformat()
+    window = {"booking_date": day, "start_time": "9:00am", "end_time": "10:30am"}
+    items = [{"spot_id": spot["id"], **window} for spot in dataset["parking_spots_v2"]] + [
+        {"spot_id": "missing", **window},
+        {"spot_id": "spot-00000", "booking_date": day, "start_time": "11:00am", "end_time": "2:00pm"},
+        {"spot_id": "spot-00000", "booking_date": day, "start_time": "10:00", "end_time": "9:00"},
+        {"spot_id": "spot-00000", "booking_date": "Monday", "start_time": "9:00", "end_time": "10:00"},
+        {"spot_id": "spot-00000", "booking_date": day, "start_time": "noon", "end_time": "13:00"},
+    ]
+
+    response = client.post("/quotes/batch", json={"items": items})
+    assert response.status_code == 200
+    # One query for the spots and one for their intervals, whatever the batch size
+    assert query_count(response) == 2
+    results = response.json()
+    assert [r["spot_id"] for r in results] == [item["spot_id"] for item in items]
+
+    for spot, result in zip(dataset["parking_spots_v2"][:4], results):
+        assert result["error"] is None
+        assert result["duration_hours"] == 1.5
+        assert result["total_price"] == quotes.booking_price(spot["price_per_hour"], 540, 630)
+    errors = [r["error"] for r in results[4:]]
+    assert errors[0] == "Parking spot is not available"
+    assert errors[1] == "Parking spot not found"
+    assert "outside the spot's available hours" in errors[2]
+    assert errors[3] == "End time must be after start time"
+    assert errors[4] == "Invalid date format. Use YYYY-MM-DD"
+    assert "Invalid time format" in errors[5]
+    assert all(r["total_price"] is None for r in results[4:])
+
+    # The price a quote shows is the price a booking is charged
+    auth = {"Authorization": f"Bearer {main.create_access_token({'user_id': 1})}"}
+    booked = client.post("/bookings", headers=auth, json=items[0])
+    assert booked.json()["total_price"] == results[0]["total_price"]
+
+
+def test_batch_quotes_use_the_catalog_and_enforce_the_limit(app, monkeypatch):
+    client, dataset = app
+    spot_catalog.reload(db.get_client())
+    day = loadtest.bench_date().isoformat()
+    item = {"spot_id": "spot-00001", "booking_date": day, "start_time": "13:00", "end_time": "15:00"}
+
+    response = client.post("/quotes/batch", json={"items": [item] * 3})
+    assert query_count(response) == 0
+    assert [r["total_price"] for r in response.json()] == [2 * dataset["parking_spots_v2"][1]["price_per_hour"]] * 3
+
+    # A spot created since the catalog loaded (e.g. on another worker) is read from the database
+    dataset["parking_spots_v2"].append({**dataset["parking_spots_v2"][1], "id": "spot-new"})
+    dataset["availability_intervals_v2"].extend(
+        {**i, "id": 1000 + n, "spot_id": "spot-new"}
+        for n, i in enumerate(dataset["availability_intervals_v2"]) if i["spot_id"] == "spot-00001"
+    )
+    mixed = client.post("/quotes/batch", json={"items": [item, {**item, "spot_id": "spot-new"}]})
+    assert query_count(mixed) == 2
+    assert [r["error"] for r in mixed.json()] == [None, None]
+    assert mixed.json()[1]["total_price"] == mixed.json()[0]["total_price"]
+
+    monkeypatch.setattr(quotes, "MAX_BATCH", 2)
+    assert client.post("/quotes/batch", json={"items": [item] * 3}).status_code == 400
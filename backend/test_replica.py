@@ -0,0 +1,108 @@
+"""
+Test the local booking replica and availability reads served from it
+"""
+import time
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+import db
+import loadtest
+import main
+import replica
+from catalog import spot_catalog
+from fake_supabase import FakeSupabase
+from query_trace import query_count
+from replica import BookingReplica, booking_replica
+
+
+def test_snapshot_updates_and_polling():
+    dataset = loadtest.build_dataset(spots=2, users=1, bookings_per_spot=2)
+    fake = FakeSupabase(dataset)
+    local = BookingReplica(enabled=True)
+    day = loadtest.bench_date().isoformat()
+    assert local.bookings("spot-00000", day) is None
+
+    local.reload(fake)
+    assert len(local) == 4
+    assert [b["id"] for b in local.bookings("spot-00000", day)] == ["booking-00000-0", "booking-00000-1"]
+    assert local.bookings("spot-00000", "2000-01-01") is None
+
+    # Cancellation drops the row; an update without its key columns is ignored safely
+    local.apply({**dataset["bookings_v2"][0], "status": "cancelled"})
+    local.apply({"id": "booking-00001-0", "status": "confirmed"})
+    assert [b["id"] for b in local.bookings("spot-00000", day)] == ["booking-00000-1"]
+    assert local.bookings("spot-00001", day) and len(local) == 2
+
+    # Rows written elsewhere arrive with the next poll, including one stamped just
+    # before the newest row already seen
+    newest = max(b["created_at"] for b in dataset["bookings_v2"])
+    late = (datetime.fromisoformat(newest) - timedelta(seconds=1)).isoformat()
+    dataset["bookings_v2"].append({
+        "id": "booking-late", "spot_id": "spot-00000", "user_id": 1, "booking_date": day,
+        "start_time": "18:00", "end_time": "19:00", "start_minute": 1080, "end_minute": 1140,
+        "total_price": 1.0, "status": "confirmed", "created_at": late,
+    })
+    local.poll(fake)
+    assert "booking-late" in [b["id"] for b in local.bookings("spot-00000", day)]
+
+
+def test_stale_replica_falls_back_to_the_database():
+    local = BookingReplica(enabled=True)
+    local.load([], loadtest.bench_date().isoformat())
+    assert local.bookings("spot-00000", loadtest.bench_date().isoformat()) == []
+    local.synced_at = time.monotonic() - replica.MAX_STALENESS_SECONDS - 1
+    assert local.bookings("spot-00000", loadtest.bench_date().isoformat()) is None
+    local.mark_synced()
+    assert local.bookings("spot-00000", loadtest.bench_date().isoformat()) == []
+
+
+def test_availability_is_served_locally_and_follows_writes(monkeypatch):
+    dataset = loadtest.build_dataset(spots=3, users=1, bookings_per_spot=2)
+    loadtest.install_client(FakeSupabase(dataset))
+    client = TestClient(main.app)
+    auth = {"Authorization": f"Bearer {main.create_access_token({'user_id': 1})}"}
+    day = loadtest.bench_date().isoformat()
+    url = f"/spots/spot-00000/availability/{day}"
+    from_database = client.get(url).json()
+
+    monkeypatch.setattr(booking_replica, "enabled", True)
+    spot_catalog.reload(db.get_client())
+    booking_replica.reload(db.get_client())
+    try:
+        local = client.get(url)
+        assert query_count(local) == 0
+        assert local.json() == from_database
+
+        batch = client.post("/availability/batch", json={"spot_ids": ["spot-00000", "spot-00001"], "dates": [day]})
+        assert query_count(batch) == 0
+        assert batch.json()[0]["availability"] == from_database
+
+        booked = client.post("/bookings", headers=auth, json={
+            "spot_id": "spot-00000", "booking_date": day, "start_time": "15:00", "end_time": "16:00",
+        })
+        assert booked.status_code == 201
+        slots = client.get(url).json()["available_slots"]
+        assert {"start_time": "3:00 PM", "end_time": "4:00 PM"} not in slots
+        assert slots != from_database["available_slots"]
+
+        client.delete(f"/bookings/{booked.json()['id']}", headers=auth)
+        assert client.get(url).json() == from_database
+
+        # Too stale: back to the database
+        booking_replica.synced_at = time.monotonic() - replica.MAX_STALENESS_SECONDS - 1
+        assert query_count(client.get(url)) == 1
+
+        # A spot the catalog hasn't seen yet (created on another worker) is read from the database
+        dataset["parking_spots_v2"].append({**dataset["parking_spots_v2"][0], "id": "spot-elsewhere"})
+        dataset["availability_intervals_v2"].extend(
+            {**i, "id": 1000 + n, "spot_id": "spot-elsewhere"}
+            for n, i in enumerate(dataset["availability_intervals_v2"]) if i["spot_id"] == "spot-00001"
+        )
+        booking_replica.mark_synced()
+        elsewhere = client.get(f"/spots/spot-elsewhere/availability/{day}")
+        assert elsewhere.status_code == 200
+        assert elsewhere.json()["operating_hours"] == from_database["operating_hours"]
+    finally:
+        booking_replica.clear()
+        spot_catalog.clear()
@@ -0,0 +1,105 @@
+"""
+Test how weekly hours are stored when a spot is created
+"""
+import pytest
+
+import loadtest
+import main
+import schedule
+from query_trace import query_count
+
+SPOT = {
+    "street": "1 Test St", "city": "Testville", "province": "ON", "postal_code": "A1A 1A1",
+    "country": "Canada", "lat": 43.0, "lng": -79.0, "price_per_hour": 6.0,
+}
+
+
+@pytest.fixture
+def app(fake_app):
+    client, fake = fake_app(spots=1, users=1)
+    auth = {"Authorization": f"Bearer {main.create_access_token({'user_id': 1})}"}
+    return client, fake.tables, auth
+
+
+def test_created_spot_stores_merged_intervals_with_minutes(app):
+    client, dataset, auth = app
+    created = client.post("/spots", headers=auth, json={**SPOT, "availability_intervals": [
+        {"day": "Monday", "start_time": "9:00am", "end_time": "12:00pm"},
+        {"day": "Monday", "start_time": "12:00pm", "end_time": "3:00pm"},
+        {"day": "Monday", "start_time": "10:00", "end_time": "11:00"},
+    ]})
+    assert created.status_code == 201
+    spot_id = created.json()["id"]
+    assert created.json()["availability_intervals"] == [
+        {"day": "Monday", "start_time": "9:00 AM", "end_time": "3:00 PM"}
+    ]
+    rows = [i for i in dataset["availability_intervals_v2"] if i["spot_id"] == spot_id]
+    assert [(r["start_minute"], r["end_minute"]) for r in rows] == [(540, 900)]
+
+    # A booking across the old fragment boundary fits the merged interval
+    booked = client.post("/bookings", headers=auth, json={
+        "spot_id": spot_id, "booking_date": loadtest.bench_date().isoformat(),
+        "start_time": "11:00am", "end_time": "1:00pm",
+    })
+    assert booked.status_code == 201
+
+
+def test_invalid_intervals_are_rejected_before_anything_is_written(app):
+    client, dataset, auth = app
+    before = len(dataset["parking_spots_v2"])
+    response = client.post("/spots", headers=auth, json={**SPOT, "availability_intervals": [
+        {"day": "Monday", "start_time": "5:00pm", "end_time": "9:00am"},
+    ]})
+    assert response.status_code == 400
+    assert len(dataset["parking_spots_v2"]) == before
+
+
+def test_schedule_round_trip_and_fallback():
+    intervals = [
+        {"day": "Tuesday", "start_time": "9:00 AM", "end_time": "5:00 PM"},
+        {"day": "Monday", "start_minute": 0, "end_minute": 60},
+        {"day": "Sunday", "start_time": "10:00 PM", "end_time": "11:59 PM"},
+    ]
+    text = schedule.encode(intervals)
+    assert text.startswith("v1:")
+    decoded = schedule.decode(text)
+    assert [(i["day"], i["start_minute"], i["end_minute"]) for i in decoded] == [
+        ("Monday", 0, 60), ("Tuesday", 540, 1020), ("Sunday", 1320, 1439),
+    ]
+    assert decoded[1]["start_time"] == "9:00 AM"
+    assert schedule.decode(schedule.encode([])) == []
+
+    assert schedule.spot_intervals({"id": "s", "schedule": text})[0]["spot_id"] == "s"
+    # Unknown versions, damaged payloads and missing columns send readers to the interval rows
+    for value in ("v9:AAAA", "v1:not base64!", "v1:AAE=", None):
+        assert schedule.spot_intervals({"id": "s", "schedule": value}) is None
+    assert schedule.spot_intervals({"id": "s"}) is None
+
+
+def test_reads_of_a_created_spot_skip_the_interval_table(app):
+    client, dataset, auth = app
+    created = client.post("/spots", headers=auth, json={**SPOT, "availability_intervals": [
+        {"day": "Monday", "start_time": "9:00am", "end_time": "5:00pm"},
+        {"day": "Wednesday", "start_time": "8:00", "end_time": "10:00"},
+    ]})
+    spot_id = created.json()["id"]
+    row = next(s for s in dataset["parking_spots_v2"] if s["id"] == spot_id)
+    assert schedule.spot_intervals(row) == [
+        {k: v for k, v in i.items() if k != "id"}
+        for i in dataset["availability_intervals_v2"] if i["spot_id"] == spot_id
+    ]
+
+    day = loadtest.bench_date().isoformat()
+    detail = client.get(f"/spots/{spot_id}")
+    assert query_count(detail) == 1
+    assert detail.json()["availability_intervals"] == created.json()["availability_intervals"]
+    availability = client.get(f"/spots/{spot_id}/availability/{day}")
+    # Spot and bookings; no interval query
+    assert query_count(availability) == 2
+    assert availability.json()["operating_hours"][0]["start_time"] == "9:00 AM"
+
+    # Spots written before the column existed still read their interval rows
+    legacy = dataset["parking_spots_v2"][0]
+    assert "schedule" not in legacy
+    assert query_count(client.get(f"/spots/{legacy['id']}/availability/{day}")) == 3
+    assert client.get(f"/spots/{legacy['id']}").json()["availability_intervals"]
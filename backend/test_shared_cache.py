@@ -0,0 +1,125 @@
+"""
+Test the SQLite-backed cache shared between worker processes
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import loadtest
+import main
+from fake_supabase import FakeSupabase
+from query_trace import query_count
+from shared_cache import SharedCache
+
+
+def test_workers_share_values_and_invalidation(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    worker_a, worker_b = SharedCache(path), SharedCache(path)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"slots": len(calls)}
+
+    scopes = ("spot:s1", "avail:s1:2030-01-07")
+    assert worker_a.get_or_compute("availability:s1", scopes, compute) == {"slots": 1}
+    assert worker_b.get_or_compute("availability:s1", scopes, compute) == {"slots": 1}
+    assert len(calls) == 1
+
+    worker_a.bump("avail:s1:2030-01-07")
+    assert worker_b.get("availability:s1", scopes) is None
+    assert worker_b.get_or_compute("availability:s1", scopes, compute) == {"slots": 2}
+
+
+def test_value_computed_during_a_write_is_not_served(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+
+    def compute_racing_a_write():
+        cache.bump("spot:s1")
+        return "stale"
+
+    assert cache.get_or_compute("spot:s1", ("spot:s1",), compute_racing_a_write) == "stale"
+    assert cache.get("spot:s1", ("spot:s1",)) is None
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"), ttl=-1)
+    cache.get_or_compute("k", (), lambda: 1)
+    assert cache.get("k", ()) is None
+
+
+def test_bump_from_another_process_invalidates(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SharedCache(path)
+    cache.get_or_compute("spot:s1", ("spot:s1",), lambda: "v1")
+    subprocess.run(
+        [sys.executable, "-c", f"from shared_cache import SharedCache; SharedCache({path!r}).bump('spot:s1')"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        check=True,
+    )
+    assert cache.get("spot:s1", ("spot:s1",)) is None
+
+
+def test_availability_served_from_shared_cache_until_booked(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "shared_cache", SharedCache(str(tmp_path / "cache.sqlite3")))
+    loadtest.install_client(FakeSupabase(loadtest.build_dataset(spots=2, users=2)))
+    client = TestClient(main.app)
+    auth = {"Authorization": f"Bearer {main.create_access_token({'user_id': 1})}"}
+    day = loadtest.bench_date().isoformat()
+    url = f"/spots/spot-00000/availability/{day}"
+
+    first = client.get(url)
+    assert query_count(first) == 3
+    second = client.get(url)
+    assert query_count(second) == 0
+    assert second.json() == first.json()
+    assert query_count(client.get("/spots/spot-00000")) == 2
+    assert query_count(client.get("/spots/spot-00000")) == 0
+    assert client.get("/spots/missing").status_code == 404
+
+    booked = client.post("/bookings", headers=auth, json={
+        "spot_id": "spot-00000", "booking_date": day, "start_time": "17:00", "end_time": "18:00",
+    })
+    assert booked.status_code == 201
+    third = client.get(url)
+    assert query_count(third) == 3
+    assert third.json() != first.json()
+
+
+def test_change_feed_invalidation_runs_off_the_event_loop(tmp_path, monkeypatch):
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(main, "shared_cache", cache)
+    writers = []
+    bump = cache.bump
+
+    def slow_bump(*scopes):
+        writers.append(threading.current_thread())
+        time.sleep(0.05)
+        bump(*scopes)
+    monkeypatch.setattr(cache, "bump", slow_bump)
+    booking = {"id": "b1", "spot_id": "spot-00000", "booking_date": "2030-01-07", "status": "confirmed"}
+    scopes = ("avail:spot-00000:2030-01-07",)
+    cache.get_or_compute("availability", scopes, lambda: "before")
+
+    async def deliver():
+        loop_thread = threading.current_thread()
+        started = time.perf_counter()
+        main.booking_row_changed("INSERT", booking, None)
+        returned = time.perf_counter() - started
+        await asyncio.gather(*main._pending_bumps)
+        return loop_thread, returned
+
+    loop_thread, returned = asyncio.run(deliver())
+    assert returned < 0.05
+    assert writers and loop_thread not in writers
+    assert cache.get("availability", scopes) is None
+
+    # Request threads (no running loop) still invalidate before they return
+    writers.clear()
+    main.availability_changed("spot-00000", "2030-01-08")
+    assert writers == [threading.current_thread()]
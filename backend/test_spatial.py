@@ -0,0 +1,129 @@
+"""
+Test the grid spatial index, best-k ranking and GET /spots/ranked
+"""
+import random
+
+from fastapi.testclient import TestClient
+
+import db
+import loadtest
+import main
+from catalog import spot_catalog
+from fake_supabase import FakeSupabase
+from query_trace import query_count
+from spatial import GridIndex, haversine_km
+
+
+def random_spots(count, seed=1):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"s{i}",
+            "lat": 49.0 + rng.random() * 0.5,
+            "lng": -123.3 + rng.random() * 0.5,
+            "price_per_hour": round(rng.uniform(2, 20), 2),
+            "is_active": rng.random() < 0.9,
+        }
+        for i in range(count)
+    ]
+
+
+def test_best_matches_brute_force_and_prunes():
+    spots = random_spots(3000)
+    index = GridIndex(cell_km=1.0)
+    index.rebuild(spots)
+    rng = random.Random(2)
+    blocked = {s["id"] for s in spots if rng.random() < 0.3}
+
+    for weight in (0.0, 0.5, 3.0):
+        lat, lng = 49.2, -123.1
+        scored = []
+        batches = []
+
+        def score(spot, distance):
+            scored.append(spot["id"])
+            return distance + weight * spot["price_per_hour"]
+
+        def accept(batch):
+            batches.append(len(batch))
+            return {s["id"] for s in batch} - blocked
+
+        got = index.best(lat, lng, 10, score, min_extra=weight * 2.0, accept=accept, max_km=30)
+
+        expected = sorted(
+            (haversine_km(lat, lng, s["lat"], s["lng"]) + weight * s["price_per_hour"], s["id"])
+            for s in spots if s["is_active"] and s["id"] not in blocked
+        )[:10]
+        assert [spot["id"] for _, _, spot in got] == [spot_id for _, spot_id in expected]
+        assert [round(v, 9) for v, _, _ in got] == [round(v, 9) for v, _ in expected]
+        # Sublinear: rings stop once no unseen cell can beat the current top 10
+        if weight <= 0.5:
+            assert len(scored) < len(spots) / 3
+        assert sum(batches) < len(spots) / 5
+
+
+def test_max_km_and_index_updates():
+    index = GridIndex(cell_km=1.0)
+    index.rebuild([
+        {"id": "near", "lat": 49.0, "lng": -123.0, "price_per_hour": 5, "is_active": True},
+        {"id": "far", "lat": 49.5, "lng": -123.0, "price_per_hour": 1, "is_active": True},
+    ])
+    every = lambda batch: {s["id"] for s in batch}
+    plain = lambda spot, distance: distance
+    assert [s["id"] for _, _, s in index.best(49.0, -123.0, 5, plain, 0, every, max_km=10)] == ["near"]
+
+    index.upsert({"id": "near", "lat": 49.0, "lng": -123.0, "price_per_hour": 5, "is_active": False})
+    index.remove("far")
+    assert index.best(49.0, -123.0, 5, plain, 0, every) == []
+
+
+def test_max_ring_follows_the_cached_bounds_through_updates():
+    index = GridIndex(cell_km=1.0)
+    spots = random_spots(200, seed=3)
+    index.rebuild(spots)
+    rng = random.Random(4)
+    centers = [index.cell_of(49.0 + rng.random() * 0.6, -123.4 + rng.random() * 0.6) for _ in range(5)]
+
+    def scanned(center):
+        return max((max(abs(i - center[0]), abs(j - center[1])) for i, j in index._cells), default=-1)
+
+    for step in range(300):
+        spot = rng.choice(spots)
+        if rng.random() < 0.6:
+            index.remove(spot["id"])
+        else:
+            index.upsert({**spot, "lat": 48.8 + rng.random() * 0.9, "is_active": True})
+        if step % 10 == 0:
+            assert [index._max_ring(c) for c in centers] == [scanned(c) for c in centers]
+    for spot in spots:
+        index.remove(spot["id"])
+    assert index._max_ring(centers[0]) == -1
+
+
+def test_ranked_endpoint_returns_free_spots_with_few_queries():
+    dataset = loadtest.build_dataset(spots=300, users=2, bookings_per_spot=2)
+    fake = FakeSupabase(dataset)
+    loadtest.install_client(fake)
+    client = TestClient(main.app)
+    day = loadtest.bench_date().isoformat()
+    params = {"lat": 49.5, "lng": -122.5, "date": day, "start_time": "9:00am", "end_time": "10:00am"}
+
+    assert client.get("/spots/ranked", params=params).status_code == 503
+
+    spot_catalog.reload(db.get_client())
+    response = client.get("/spots/ranked", params=params)
+    assert response.status_code == 200
+    assert query_count(response) <= 2
+
+    results = response.json()
+    assert len(results) == 10
+    assert [r["score"] for r in results] == sorted(r["score"] for r in results)
+    booked = {
+        b["spot_id"] for b in dataset["bookings_v2"]
+        if b["booking_date"] == day and b["start_time"] < "10" and b["end_time"] > "9"
+    }
+    assert not booked & {r["spot"]["id"] for r in results}
+
+    bad = dict(params, end_time="8:00am")
+    assert client.get("/spots/ranked", params=bad).status_code == 400
+    loadtest.install_client(fake)
@@ -0,0 +1,57 @@
+"""
+Test the hashed timing wheel with a manual clock
+"""
+from timers import TimerWheel
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_timers_fire_once_in_order_never_early():
+    clock = Clock()
+    wheel = TimerWheel(tick=1.0, slots=8, clock=clock)
+    fired = []
+    for key, delay in [("a", 2.5), ("b", 1), ("c", 20), ("d", 0)]:
+        wheel.schedule(key, delay, lambda key=key: fired.append(key))
+    assert len(wheel) == 4
+
+    assert wheel.advance(clock.now + 0.5) == 0
+    assert wheel.advance(clock.now + 1) == 2
+    assert sorted(fired) == ["b", "d"]
+    wheel.advance(clock.now + 2.9)
+    assert "a" not in fired
+    wheel.advance(clock.now + 3)
+    assert fired[-1] == "a"
+
+    # "c" shares a slot with earlier laps of the wheel but waits for its own
+    wheel.advance(clock.now + 19)
+    assert "c" not in fired
+    wheel.advance(clock.now + 20)
+    assert fired[-1] == "c" and len(wheel) == 0
+
+
+def test_cancel_reschedule_and_catch_up_after_a_pause():
+    clock = Clock()
+    wheel = TimerWheel(tick=1.0, slots=4, clock=clock)
+    fired = []
+    wheel.schedule("x", 2, lambda: fired.append("x"))
+    assert wheel.cancel("x") and not wheel.cancel("x")
+    wheel.schedule("y", 2, lambda: fired.append("y-old"))
+    wheel.schedule("y", 3, lambda: fired.append("y"))
+    for i in range(50):
+        wheel.schedule(i, i % 7, lambda i=i: fired.append(i))
+
+    def boom():
+        raise RuntimeError("callback failure")
+    wheel.schedule("boom", 1, boom)
+
+    # Far more than one lap later: everything due fires exactly once
+    assert wheel.advance(clock.now + 100) == 52
+    assert "y-old" not in fired and "y" in fired and "x" not in fired
+    assert sorted(k for k in fired if isinstance(k, int)) == list(range(50))
+    assert len(wheel) == 0
@@ -0,0 +1,116 @@
+"""
+Hashed timing wheel for many one-shot timers (booking hold expiry).
+
+Time is cut into ticks of TICK seconds. A timer due at tick t sits in slot
+t % slots, keyed by its id, so schedule() and cancel() are O(1) whatever the
+number of pending timers. Every tick the background task looks at the one
+slot whose turn it is and fires the timers that are due; timers for a later
+lap of the wheel stay where they are. One task drives every timer: no
+per-timer sleeps, no periodic scans of the database.
+
+Callbacks run in a worker thread (they usually make a database call) and
+must not raise; failures are logged and the timer is dropped.
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TICK = 1.0
+SLOTS = 512
+
+
+class TimerWheel:
+    def __init__(self, tick: float = TICK, slots: int = SLOTS, clock: Callable[[], float] = time.monotonic):
+        self.tick = tick
+        self._clock = clock
+        self._origin = clock()
+        self._lock = threading.Lock()
+        self._slots: List[Dict[Hashable, Tuple[int, Callable[[], None]]]] = [{} for _ in range(slots)]
+        self._where: Dict[Hashable, int] = {}
+        # Last tick whose slot has been processed
+        self._current = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._where
+
+    def _tick_at(self, moment: float) -> int:
+        return int((moment - self._origin) / self.tick)
+
+    def schedule(self, key: Hashable, delay: float, callback: Callable[[], None]) -> None:
+        """Run callback() about delay seconds from now (never early); replaces key's timer"""
+        with self._lock:
+            self._cancel(key)
+            due = math.ceil((self._clock() + max(0.0, delay) - self._origin) / self.tick)
+            due = max(due, self._current + 1)
+            slot = due % len(self._slots)
+            self._slots[slot][key] = (due, callback)
+            self._where[key] = slot
+
+    def _cancel(self, key: Hashable) -> bool:
+        slot = self._where.pop(key, None)
+        if slot is None:
+            return False
+        del self._slots[slot][key]
+        return True
+
+    def cancel(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._cancel(key)
+
+    def advance(self, now: Optional[float] = None) -> int:
+        """Fire every timer due by now; returns how many fired"""
+        target = self._tick_at(self._clock() if now is None else now)
+        due: List[Callable[[], None]] = []
+        with self._lock:
+            if target <= self._current:
+                return 0
+            # After a long pause one lap covers every slot
+            for step in range(1, min(target - self._current, len(self._slots)) + 1):
+                slot = self._slots[(self._current + step) % len(self._slots)]
+                for key, (at, callback) in list(slot.items()):
+                    if at <= target:
+                        del slot[key]
+                        del self._where[key]
+                        due.append(callback)
+            self._current = target
+        for callback in due:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning("Timer callback failed: %s", e)
+        return len(due)
+
+    # ---------------------------------------------------------------
+    # Background task
+    # ---------------------------------------------------------------
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            if self._where:
+                await asyncio.to_thread(self.advance)
+            else:
+                # Nothing pending: just move the cursor without a thread hop
+                self.advance()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,97 @@
+"""
+Data versions and ETags for conditional GETs.
+
+Every write that changes what a spot or a (spot, date) availability looks like
+bumps a counter here; the ETag is derived from those counters and the resource
+key, so a matching If-None-Match can be answered with 304 before any query runs.
+
+Versions live in this process, so they are only trusted while this worker sees
+every write (single worker, or the realtime change feed is connected; see
+change_feed.py). Otherwise callers fall back to content_etag() of the response
+they just built. The epoch makes version ETags from other workers or a previous
+process never match, and ETAG_MAX_AGE_SECONDS bounds how long a version can be
+revalidated if a write bypassed the API entirely.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+ETAG_MAX_AGE_SECONDS = int(os.getenv("ETAG_MAX_AGE_SECONDS", "10"))
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+def content_etag(payload: Any) -> str:
+    """ETag of a JSON-serializable response body; identical on every worker"""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return f'W/"c{hashlib.sha1(body.encode("utf-8")).hexdigest()[:16]}"'
+
+
+class DataVersions:
+    def __init__(self, max_age_seconds: int = ETAG_MAX_AGE_SECONDS):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._spots: Dict[str, int] = {}
+        self._availability: Dict[Tuple[str, str], int] = {}
+
+    def spot_version(self, spot_id: str) -> int:
+        return self._spots.get(spot_id, 0)
+
+    def availability_version(self, spot_id: str, date: str) -> int:
+        return self._availability.get((spot_id, date), 0)
+
+    def bump_spot(self, spot_id: str) -> None:
+        """Spot fields or weekly hours changed; also invalidates every date of that spot"""
+        with self._lock:
+            self._spots[spot_id] = self._spots.get(spot_id, 0) + 1
+
+    def bump_availability(self, spot_id: str, date: str) -> None:
+        """A booking for this spot and date was created or cancelled"""
+        with self._lock:
+            key = (spot_id, date)
+            self._availability[key] = self._availability.get(key, 0) + 1
+
+    def _age_bucket(self) -> int:
+        return int(time.time() // self.max_age_seconds) if self.max_age_seconds > 0 else 0
+
+    def spot_etag(self, spot_id: str) -> str:
+        return (
+            f'W/"{self.epoch}.{self._age_bucket()}.{_digest(spot_id)}'
+            f'.s{self.spot_version(spot_id)}"'
+        )
+
+    def availability_etag(self, spot_id: str, date: str) -> str:
+        return (
+            f'W/"{self.epoch}.{self._age_bucket()}.{_digest(spot_id, date)}'
+            f'.s{self.spot_version(spot_id)}.a{self.availability_version(spot_id, date)}"'
+        )
+
+
+def etag_matches(if_none_match: Optional[str], etag: str, exists: bool = False) -> bool:
+    """
+    Weak comparison of an If-None-Match header against the current ETag.
+    "*" matches any current representation, so it only counts once the caller
+    has confirmed the resource exists (exists=True).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return exists
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+data_versions = DataVersions()